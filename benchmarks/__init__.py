@@ -0,0 +1,6 @@
+"""Benchmarks for view_accessories.
+
+These are not tests. Run them from the top of the source tree, e.g.::
+
+    DJANGO_SETTINGS_MODULE=test_app.settings python -m benchmarks.json_views
+"""
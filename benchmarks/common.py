@@ -0,0 +1,36 @@
+"""Helpers shared by the benchmarks."""
+from __future__ import print_function, unicode_literals
+
+import os
+import timeit
+
+import django
+
+__all__ = ('setup', 'teardown', 'run')
+
+
+def setup():
+    """Set up Django and create (and return the name of) a test database.
+
+    The benchmarks run against the test_app's test database so that they
+    never touch a real one.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_app.settings')
+    django.setup()
+
+    from django.db import connection
+
+    return connection.creation.create_test_db(verbosity=0)
+
+
+def teardown(old_name):
+    from django.db import connection
+
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def run(name, func, number=100, repeat=5):
+    """Time *func* and print the best time per call of *repeat* runs."""
+    best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    print('%-40s %10.3f ms' % (name, best * 1000))
+    return best
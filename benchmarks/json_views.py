@@ -0,0 +1,67 @@
+"""Compare json_list_view to the list_view + json.dumps boilerplate."""
+from __future__ import print_function, unicode_literals
+
+import json
+
+from .common import run, setup, teardown
+
+
+def main(rows=2000, page_size=500):
+    old_name = setup()
+
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+
+    from test_app.models import Widget
+    from view_accessories import jsonview
+    from view_accessories.list import list_view
+
+    Widget.objects.bulk_create(
+        Widget(text='Widget %s' % i) for i in range(rows))
+
+    @list_view(model=Widget)
+    def boilerplate(request, widgets):
+        body = json.dumps([{'id': w.pk, 'text': w.text} for w in widgets])
+        return HttpResponse(body, content_type='application/json')
+
+    @list_view(model=Widget, paginate=True, page_size=page_size)
+    def boilerplate_page(request, widgets, pagination):
+        body = json.dumps({
+            'objects': [{'id': w.pk, 'text': w.text}
+                        for w in pagination['objects']],
+            'page': pagination['page'].number,
+        })
+        return HttpResponse(body, content_type='application/json')
+
+    @jsonview.json_list_view(model=Widget, fields=['id', 'text'])
+    def json_list(request, widgets):
+        pass
+
+    @jsonview.json_list_view(model=Widget, fields=['id', 'text'],
+                             paginate=True, page_size=page_size)
+    def json_page(request, widgets, pagination):
+        pass
+
+    request = RequestFactory().get('/')
+
+    def consume(view):
+        def call():
+            response = view(request)
+            if response.streaming:
+                return b''.join(response.streaming_content)
+            return response.content
+        return call
+
+    print('%s widgets, %s per page, encoder: %s' % (
+        rows, page_size, 'orjson' if jsonview.orjson else 'json'))
+    try:
+        run('list_view + json.dumps', consume(boilerplate), number=20)
+        run('json_list_view', consume(json_list), number=20)
+        run('list_view + json.dumps (paginated)', consume(boilerplate_page))
+        run('json_list_view (paginated)', consume(json_page))
+    finally:
+        teardown(old_name)
+
+
+if __name__ == '__main__':
+    main()
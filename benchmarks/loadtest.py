@@ -0,0 +1,283 @@
+"""Load test the test_app's views under a threaded server.
+
+Microbenchmarks  time one request at a time.  This  instead serves the
+test_app  from a threaded  WSGI server (or,  with --asgi,  uvicorn)  in
+this process and has many client threads send it a mix of detail, list,
+paginated,  form and redirect requests for a while,  so that contention
+(for  locks, connections, the GIL) shows. It then reports the throughput,
+the  50th, 95th  and 99th percentile  latencies and the database queries
+per request, overall and for each kind of request. E.g.::
+
+    DJANGO_SETTINGS_MODULE=test_app.settings python -m benchmarks.loadtest \\
+        --threads 32 --duration 20 --mix detail=50,paginated=50
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import bisect
+import random
+import socket
+import string
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.utils.six.moves import http_client, socketserver
+from django.utils.six.moves.urllib.parse import urlencode
+
+from .common import setup, teardown
+
+DEFAULT_MIX = ('detail=35,json_detail=10,list=10,paginated=20,form_get=10,'
+               'form_post=5,redirect=10')
+SCENARIO_HEADER = 'X-Loadtest-Scenario'
+PAGE_SIZE = 5  # that of test_app.views.my_template_list_view
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def scenarios(pks):
+    """Return the request makers, by name, for the widgets *pks*.
+
+    Each  takes a random.Random and a CSRF token and returns the method,
+    path, body and headers of a request.
+    """
+    pages = max(1, -(-len(pks) // PAGE_SIZE))
+
+    def get(path):
+        return lambda rng, token: ('GET', path(rng), None, {})
+
+    def form_post(rng, token):
+        body = urlencode({'text': 'load test %d' % rng.randint(0, 999)})
+        return ('POST', '/form1/', body, {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Cookie': 'csrftoken=%s' % token,
+            'X-CSRFToken': token,
+        })
+
+    return {
+        'detail': get(lambda rng: '/widget/%d/' % rng.choice(pks)),
+        'json_detail': get(lambda rng: '/widget4/%d/' % rng.choice(pks)),
+        'list': get(lambda rng: '/widgets1/'),
+        'paginated': get(
+            lambda rng: '/widgets3/?page=%d' % rng.randint(1, pages)),
+        'form_get': get(lambda rng: '/form1/'),
+        'form_post': form_post,
+        'redirect': get(lambda rng: '/redirect/?from=%d' % rng.randint(0, 9)),
+    }
+
+
+def parse_mix(mix, known):
+    """Return the (name, weight) pairs of a "name=weight,..." *mix*."""
+    pairs = []
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in known:
+            raise SystemExit('Unknown request kind %r (known: %s)' % (
+                name, ', '.join(sorted(known))))
+        pairs.append((name, int(weight or 1)))
+    return pairs
+
+
+def count_queries(app, counts, lock):
+    """Wrap the WSGI *app* to count the queries of each kind of request.
+
+    *counts*  maps the kind of request (from the X-Loadtest-Scenario
+    header) to a [requests, queries] list.
+    """
+    from view_accessories.testing import capture_queries
+
+    def counted(environ, start_response):
+        with capture_queries() as queries:
+            result = app(environ, start_response)
+            try:
+                body = b''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        name = environ.get('HTTP_X_LOADTEST_SCENARIO')
+        with lock:
+            totals = counts.setdefault(name, [0, 0])
+            totals[0] += 1
+            totals[1] += len(queries)
+        return [body]
+    return counted
+
+
+def serve_wsgi(counts):
+    """Serve the test_app in a thread. Return its port and a stop function."""
+    from django.core.wsgi import get_wsgi_application
+
+    app = count_queries(get_wsgi_application(), counts, threading.Lock())
+    server = make_server('127.0.0.1', 0, app, server_class=ThreadingWSGIServer,
+                         handler_class=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+    return server.server_port, stop
+
+
+def serve_asgi(counts):
+    """Serve the test_app with uvicorn in a thread, as *serve_wsgi*.
+
+    Queries are not counted:  Django runs the views in other threads than
+    the server's.
+    """
+    try:
+        import uvicorn
+        from django.core.asgi import get_asgi_application
+    except ImportError:
+        raise SystemExit('--asgi needs Django 3.0 or later and uvicorn')
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    config = uvicorn.Config(get_asgi_application(), lifespan='off',
+                            log_level='warning')
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]})
+    thread.daemon = True
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return sock.getsockname()[1], stop
+
+
+def client(port, makers, mix, deadline, seed, results):
+    """Send requests until *deadline*, appending the results to *results*.
+
+    Each result is (kind of request, seconds, status or None on error).
+    """
+    rng = random.Random(seed)
+    token = ''.join(rng.choice(string.ascii_letters + string.digits)
+                    for _ in range(32))
+    names = [name for name, _ in mix]
+    cumulative = []
+    total = 0
+    for _, weight in mix:
+        total += weight
+        cumulative.append(total)
+
+    while _clock() < deadline:
+        name = names[bisect.bisect(cumulative, rng.random() * total)]
+        method, path, body, headers = makers[name](rng, token)
+        headers[SCENARIO_HEADER] = name
+        start = _clock()
+        connection = http_client.HTTPConnection('127.0.0.1', port, timeout=30)
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (socket.error, http_client.HTTPException):
+            status = None
+        finally:
+            connection.close()
+        results.append((name, _clock() - start, status))
+
+
+def percentile(latencies, fraction):
+    """Return the *fraction* percentile of the sorted *latencies*."""
+    if not latencies:
+        return float('nan')
+    index = max(0, int(round(fraction * len(latencies) + 0.5)) - 1)
+    return latencies[min(index, len(latencies) - 1)]
+
+
+def report(results, counts, elapsed, names):
+    print('%-12s %8s %7s %9s %8s %8s %8s %8s' % (
+        'requests', 'count', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms',
+        'queries'))
+    for name in ['all'] + sorted(names):
+        rows = [row for row in results if name == 'all' or row[0] == name]
+        if not rows:
+            continue
+        latencies = sorted(row[1] for row in rows)
+        errors = sum(1 for row in rows if row[2] is None or row[2] >= 400)
+        if name == 'all':
+            served = [sum(values) for values in zip(*counts.values())]
+        else:
+            served = counts.get(name)
+        queries = ('%8.2f' % (served[1] / served[0])) if served else 'n/a'
+        print('%-12s %8d %7d %9.1f %8.2f %8.2f %8.2f %8s' % (
+            name, len(rows), errors, len(rows) / elapsed,
+            percentile(latencies, 0.5) * 1000,
+            percentile(latencies, 0.95) * 1000,
+            percentile(latencies, 0.99) * 1000, queries))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--threads', type=int, default=16,
+                        help='client threads (16)')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds to send requests for (10)')
+    parser.add_argument('--rows', type=int, default=200,
+                        help='widgets in the database (200)')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help='kinds of requests and their weights (%s)' %
+                        DEFAULT_MIX)
+    parser.add_argument('--asgi', action='store_true',
+                        help='serve with uvicorn instead of wsgiref')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args(argv)
+
+    old_name = setup()
+
+    from django.test.utils import override_settings
+
+    from test_app.models import Widget
+
+    overrides = override_settings(DEBUG=False, ALLOWED_HOSTS=['*'])
+    overrides.enable()
+    try:
+        Widget.objects.bulk_create(
+            Widget(text='Widget %s' % i) for i in range(options.rows))
+        pks = list(Widget.objects.values_list('pk', flat=True))
+        makers = scenarios(pks)
+        mix = parse_mix(options.mix, makers)
+
+        counts = {}
+        port, stop = (serve_asgi if options.asgi else serve_wsgi)(counts)
+        results = []
+        start = _clock()
+        deadline = start + options.duration
+        threads = [threading.Thread(target=client,
+                                    args=(port, makers, mix, deadline,
+                                          options.seed + number, results))
+                   for number in range(options.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = _clock() - start
+        stop()
+
+        print('%s server, %d client threads, %.1f seconds, %d widgets' % (
+            'ASGI' if options.asgi else 'WSGI', options.threads, elapsed,
+            options.rows))
+        report(results, counts, elapsed, [name for name, _ in mix])
+    finally:
+        overrides.disable()
+        teardown(old_name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Compare resolving paths with routes() to Django's url() patterns."""
+from __future__ import print_function, unicode_literals
+
+from .common import run, setup, teardown
+
+# A route and the equivalent Django URL pattern, for each section
+SHAPES = (
+    ('section%d/', r'^section%d/$'),
+    ('section%d/<int:id>/', r'^section%d/(?P<id>[0-9]+)/$'),
+    ('section%d/<slug:slug>/edit/',
+     r'^section%d/(?P<slug>[-a-zA-Z0-9_]+)/edit/$'),
+)
+
+
+def main(sizes=(1000, 10000)):
+    old_name = setup()
+
+    from django.conf.urls import url
+    from django.http import HttpResponse
+
+    from view_accessories.routing import Router
+
+    try:
+        from django.urls import URLResolver, Resolver404
+        from django.urls.resolvers import RegexPattern
+    except ImportError:  # Django < 2.0
+        from django.core.urlresolvers import (RegexURLResolver as URLResolver,
+                                              Resolver404)
+        RegexPattern = None
+
+    def resolver(urlpatterns):
+        if RegexPattern is None:
+            return URLResolver(r'^/', urlpatterns)
+        return URLResolver(RegexPattern(r'^/'), urlpatterns)
+
+    def view(request, **kwargs):
+        return HttpResponse()
+
+    def resolve(root, path):
+        def call():
+            try:
+                root.resolve(path)
+            except Resolver404:
+                pass
+        return call
+
+    try:
+        for size in sizes:
+            router = Router()
+            urlpatterns = []
+            sections = size // len(SHAPES)
+            for section in range(sections):
+                for route, regex in SHAPES:
+                    router.add(route % section, view)
+                    urlpatterns.append(url(regex % section, view))
+            routed = resolver(router.urls)
+            regexes = resolver(urlpatterns)
+
+            print('%s routes' % len(urlpatterns))
+            paths = (
+                ('first', '/section0/'),
+                ('middle', '/section%d/1/' % (sections // 2)),
+                ('last', '/section%d/a-slug/edit/' % (sections - 1)),
+                ('miss', '/nowhere/'),
+            )
+            for name, path in paths:
+                run('url() patterns, %s' % name, resolve(regexes, path))
+                run('routes(), %s' % name, resolve(routed, path))
+    finally:
+        teardown(old_name)
+
+
+if __name__ == '__main__':
+    main()
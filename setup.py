@@ -10,7 +10,9 @@ setup(
     author_email='marduk@python.net',
     license='BSD',
     install_requires=['django>=1.11.29,<2.0'],
-    packages=['view_accessories'],
+    packages=['view_accessories', 'view_accessories.management',
+              'view_accessories.management.commands',
+              'view_accessories.migrations'],
     version=__version__,
     classifiers=[
         'Development Status :: 3 - Alpha',
@@ -0,0 +1,2 @@
+def widget(request):
+    return {'widget': 'from context processor'}
@@ -36,10 +36,12 @@ INSTALLED_APPS = (
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'view_accessories',
     'test_app',
 )
 
 MIDDLEWARE_CLASSES = (
+    'view_accessories.middleware.MethodGateMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,7 +62,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # A file (not :memory:) so that worker threads share the test data
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
+    },
+    # Stands in for a read replica in the routing tests
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db_replica.sqlite3')},
+    },
 }
 
 # Internationalization
@@ -2,6 +2,8 @@ from __future__ import unicode_literals
 
 from django.conf.urls import patterns, url
 
+from view_accessories.routing import routes
+
 urlpatterns = patterns(
     'test_app.views',
     url('^my_view/(.+)/$', 'my_view'),
@@ -15,6 +17,8 @@ urlpatterns = patterns(
     url('^widgets2/$', 'stacked_list_view'),
     url('^widgets3/$', 'my_template_list_view'),
     url('^widgets4/$', 'login_required_view'),
+    url('^widgets5/$', 'my_json_list_view'),
+    url('^widget4/(?P<id>\d+)/$', 'my_json_detail_view'),
     url('^form1/$', 'form1'),
     url('^form2/(?P<id>\d+)/$', 'form2'),
     url('^create1/$', 'create_form'),
@@ -25,3 +29,5 @@ urlpatterns = patterns(
     url('^delete2/(?P<id>\d+)/$', 'delete2'),
     url('^$', 'index'),
 )
+
+urlpatterns += routes('test_app.views')
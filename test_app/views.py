@@ -9,6 +9,7 @@ from view_accessories import __version__
 from view_accessories import detail
 from view_accessories import edit
 from view_accessories import generic
+from view_accessories import jsonview
 from view_accessories import list as lists
 
 from .forms import TestForm
@@ -56,9 +57,9 @@ def detail_view_with_template2(request, widget):
     pass
 
 
-@lists.list_view(model=Widget)
+@lists.list_view(model=Widget, values_list=['text'])
 def my_list_view(request, widgets):
-    body = json.dumps([i.text for i in widgets])
+    body = json.dumps([text for (text,) in widgets])
     body = body.encode('utf-8')
     response = HttpResponse(body)
     response.content_type = 'application/json; encoding=utf-8'
@@ -78,11 +79,34 @@ def my_template_list_view(request, widgets, pagination):
     return {'widgets': widgets, 'desc': True}
 
 
+@jsonview.json_list_view(model=Widget, fields=['id', 'text'], paginate=True,
+                         page_size=5)
+def my_json_list_view(request, widgets, pagination):
+    pass
+
+
+@jsonview.json_detail_view(model=Widget, fields=['id', 'text'])
+def my_json_detail_view(request, widget):
+    pass
+
+
 # Test with django's decorators
 login_required_view = login_required(
     login_url='/accounts/login/')(my_list_view)
 
 
+@jsonview.json_detail_view(model=Widget, fields=['id', 'text'],
+                           route='routed/widget/<int:id>/')
+def routed_detail_view(request, widget):
+    pass
+
+
+@login_required(login_url='/accounts/login/')
+@generic.view(route='routed/private/<slug:name>/')
+def routed_private_view(request, name):
+    return HttpResponse(name, content_type='text/plain')
+
+
 @generic.template_view(template_name='test_app/form.html')
 @edit.form_view(form=TestForm, methods=['GET', 'POST'])
 def form1(request, form):
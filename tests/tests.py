@@ -1,22 +1,82 @@
 from __future__ import unicode_literals
 
+import datetime
+import decimal
+import json
+import logging
 import os
+import pstats
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from unittest import skipIf
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_app.settings')
 
+import django
 from django import forms, http
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.urlresolvers import reverse
+from django.db import connection, connections, transaction
 from django.forms.models import ModelForm
-from django.test import RequestFactory, TestCase
+from django.test import (RequestFactory, TestCase, TransactionTestCase,
+                         override_settings)
+from django.utils import six
+from django.utils.encoding import force_bytes
+from django.utils.timezone import utc
 
+from test_app.forms import TestForm
 from test_app.models import Widget
-from view_accessories.detail import detail_view
-from view_accessories.edit import create_view, form_view, update_view
-from view_accessories.generic import redirect_view, view
+from view_accessories import (diagnostics, edit, generic, jsonview,
+                              list as lists, middleware, redirects)
+from view_accessories.cache import cached_response, coalesce, view_cache_key
+from view_accessories.db import STICKY_COOKIE, MergedQuerySet
+from view_accessories.diagnostics import profile_token
+from view_accessories.detail import (detail_view, lazy_object_or_404,
+                                     template_detail_view)
+from view_accessories.edit import (create_view, delete_view, form_view,
+                                   template_create_view, update_view)
+from view_accessories.explain import explain_views
+from view_accessories.generic import (ContextTimeout, independent,
+                                      redirect_view, template_view, view)
+from view_accessories.index import LookupIndex
+from view_accessories.jsonview import json_detail_view, json_list_view
+from view_accessories.limits import (Limiter, QueryBudgetExceeded,
+                                     StatementTimeout, stats)
 from view_accessories.list import list_view, paginate_queryset
+from view_accessories.middleware import MethodGateMiddleware
+from view_accessories.models import Redirect
+from view_accessories.redirects import redirect_table_view, redirects_changed
+from view_accessories.registry import (decorator_chain, lookup,
+                                       methods_allowed_by_all,
+                                       registered_views)
+from view_accessories.routing import Router
+from view_accessories.testing import (QuerySnapshot, assert_max_queries,
+                                      query_shape)
+from view_accessories.warmup import warmup
 
 
 factory = RequestFactory()
+snapshot = QuerySnapshot(os.path.join(
+    os.path.dirname(__file__), 'snapshots',
+    'queries-django-%d.%d.json' % django.VERSION[:2]))
+
+# Free-threaded ("no GIL") Pythons get more threads by default
+FREE_THREADED = not getattr(sys, '_is_gil_enabled', lambda: True)()
+STRESS_THREADS = int(os.environ.get('VIEW_ACCESSORIES_STRESS_THREADS',
+                                    64 if FREE_THREADED else 16))
 
 
 class ViewTest(TestCase):
@@ -66,6 +126,648 @@ class ViewTest(TestCase):
         self.assertEqual(response.content.decode('utf-8'), '69')
 
 
+class MethodGate(TestCase):
+    """MethodGateMiddleware"""
+    def test_registered(self):
+        # Given the decorated view
+        @view(methods=['GET', 'POST'])
+        def my_view(request):
+            pass
+
+        # Then its methods are registered
+        self.assertEqual(lookup(my_view)['methods'], ('GET', 'POST'))
+
+    def test_method_not_allowed(self):
+        # Given the POST-only view
+        url = reverse('test_app.views.post_only')
+
+        # When the middleware gets a GET request
+        response = MethodGateMiddleware().process_request(factory.get(url))
+
+        # Then it short-circuits with a 405
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['allow'], 'POST')
+
+        # But lets a POST through
+        self.assertEqual(
+            MethodGateMiddleware().process_request(factory.post(url)), None)
+
+    def test_options(self):
+        # Given the detail view
+        url = reverse('test_app.views.my_detail_view', args=[99999])
+
+        # When we request OPTIONS through the whole stack
+        with self.assertNumQueries(0):
+            response = self.client.options(url)
+
+        # Then we get the methods without touching the session
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('GET', response['allow'])
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_unregistered_view(self):
+        # Given a URL that does not resolve to a decorated view
+        request = factory.get('/no/such/url/')
+
+        # Then the middleware lets it through
+        self.assertEqual(MethodGateMiddleware().process_request(request),
+                         None)
+
+    def test_methods_allowed_by_all(self):
+        # Given a GET-only view
+        @view(methods=['GET'])
+        def my_view(request):
+            pass
+
+        # Then no other method is allowed by all views
+        self.assertTrue(methods_allowed_by_all() <= frozenset(['GET']))
+
+    def test_not_resolved(self):
+        # Given all views allow GET, and a URLconf that cannot be imported
+        request = factory.get('/widget/1/')
+        request.urlconf = 'test_app.no_such_urls'
+        allowed_by_all = middleware.methods_allowed_by_all
+        middleware.methods_allowed_by_all = lambda: frozenset(['GET'])
+
+        # When the middleware gets a GET request
+        try:
+            response = MethodGateMiddleware().process_request(request)
+        finally:
+            middleware.methods_allowed_by_all = allowed_by_all
+
+        # Then it lets it through without resolving its URL
+        self.assertEqual(response, None)
+
+
+class MaxConcurrency(TestCase):
+    def blocking_view(self, limiter):
+        """Return a view that blocks until self.release is set"""
+        self.release = threading.Event()
+
+        @view(max_concurrency=limiter)
+        def my_view(request):
+            self.release.wait(5)
+            return http.HttpResponse('done')
+        return my_view
+
+    def call_in_thread(self, my_view, limiter, running=1, waiting=0):
+        """Call my_view in a thread until it is running (or waiting)"""
+        responses = []
+        thread = threading.Thread(
+            target=lambda: responses.append(my_view(factory.get('/'))))
+        thread.start()
+        for i in range(500):
+            if (limiter.running, limiter.waiting) == (running, waiting):
+                break
+            time.sleep(0.01)
+        return thread, responses
+
+    def test_sheds_load(self):
+        # Given the view limited to 1 execution and no queue
+        limiter = Limiter(1, queue=0, retry_after=3)
+        my_view = self.blocking_view(limiter)
+
+        # When it is busy
+        thread, responses = self.call_in_thread(my_view, limiter)
+
+        # Then another request gets a 503
+        response = my_view(factory.get('/'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '3')
+
+        # And the busy one finishes normally
+        self.release.set()
+        thread.join()
+        self.assertEqual(responses[0].content, b'done')
+        self.assertEqual(limiter.stats()['admitted'], 1)
+        self.assertEqual(limiter.stats()['rejected'], 1)
+
+    def test_queues(self):
+        # Given the view limited to 1 execution with a queue
+        limiter = Limiter(1, queue=1, wait=5)
+        my_view = self.blocking_view(limiter)
+
+        # When it is busy and another request is waiting
+        thread1, responses1 = self.call_in_thread(my_view, limiter)
+        thread2, responses2 = self.call_in_thread(my_view, limiter,
+                                                  waiting=1)
+
+        # Then a third request is shed
+        self.assertEqual(my_view(factory.get('/')).status_code, 503)
+
+        # And the waiting request runs after the first
+        self.release.set()
+        thread1.join()
+        thread2.join()
+        self.assertEqual(responses2[0].status_code, 200)
+        self.assertEqual(limiter.stats()['queued'], 1)
+        self.assertEqual(limiter.stats()['peak'], 1)
+
+    def test_inherited(self):
+        # Given the template_list_view with max_concurrency
+        @lists.template_list_view(model=Widget, max_concurrency=2)
+        def my_limited_view(request, widgets):
+            pass
+
+        # Then its limit is registered and its counters exposed
+        self.assertEqual(lookup(my_limited_view)['limiter'].max_concurrency, 2)
+        self.assertEqual(stats()['tests.tests.my_limited_view']['admitted'],
+                         0)
+
+
+class QueryLimits(TestCase):
+    def test_query_budget(self):
+        # Given the view with a query budget of 2 queries
+        @view(query_budget=2)
+        def my_view(request, queries):
+            for i in range(queries):
+                Widget.objects.count()
+            return http.HttpResponse('done')
+
+        # When it runs 2 queries
+        # Then it's fine
+        self.assertEqual(my_view(factory.get('/'), 2).content, b'done')
+
+        # When it runs 3 queries
+        # Then it is aborted with an error naming the view
+        with self.assertRaises(QueryBudgetExceeded) as context:
+            my_view(factory.get('/'), 3)
+        self.assertIn('tests.tests.my_view', str(context.exception))
+
+    def test_inherited(self):
+        # Given the list_view with a query budget of 1 query
+        @list_view(model=Widget, query_budget=1, paginate=True, page_size=5)
+        def my_view(request, widgets, pagination):
+            return pagination['paginator'].count
+
+        # Then the page can be fetched but not counted
+        with self.assertRaises(QueryBudgetExceeded):
+            my_view(factory.get('/'))
+
+    def test_statement_timeout(self):
+        # Given the view running a slow query with a statement timeout
+        @view(statement_timeout=0.1)
+        def my_view(request):
+            cursor = connection.cursor()
+            cursor.execute(
+                'WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL '
+                'SELECT x + 1 FROM c WHERE x < 1000000000) '
+                'SELECT count(*) FROM c')
+            return http.HttpResponse(cursor.fetchone())
+
+        # When we call it
+        # Then the query is interrupted
+        start = time.time()
+        with self.assertRaises(StatementTimeout):
+            my_view(factory.get('/'))
+        self.assertLess(time.time() - start, 5)
+
+        # And the connection is unwrapped afterwards
+        self.assertNotIn('make_cursor', connection.__dict__)
+
+
+class QueryRegressions(TestCase):
+    """The queries each decorator runs"""
+    def setUp(self):
+        self.widgets = [Widget.objects.create(text='widget %d' % i)
+                        for i in range(3)]
+
+    def assert_queries(self, name, count, call):
+        with assert_max_queries(count) as queries:
+            response = call()
+        self.assertEqual(len(queries), count)
+        snapshot.assert_matches(name, queries)
+        return response
+
+    def test_view(self):
+        @view
+        def test_view(request):
+            return http.HttpResponse()
+
+        self.assert_queries('view', 0, lambda: test_view(factory.get('/')))
+
+    def test_detail_view(self):
+        @detail_view(Widget)
+        def test_view(request, widget):
+            return http.HttpResponse(widget.text)
+
+        self.assert_queries('detail_view', 1, lambda: test_view(
+            factory.get('/'), id=self.widgets[0].pk))
+
+    def test_detail_view_unused(self):
+        # The object is not looked up if the view does not use it
+        @detail_view(Widget)
+        def test_view(request, widget):
+            return http.HttpResponse()
+
+        self.assert_queries('detail_view_unused', 0, lambda: test_view(
+            factory.get('/'), id=self.widgets[0].pk))
+
+    def test_list_view(self):
+        @list_view(model=Widget)
+        def test_view(request, widgets):
+            return http.HttpResponse(len(list(widgets)))
+
+        self.assert_queries('list_view', 1,
+                            lambda: test_view(factory.get('/')))
+
+    def test_list_view_queryset(self):
+        queryset = Widget.objects.order_by('-pk')
+
+        @list_view(queryset=queryset)
+        def test_view(request, widgets):
+            return http.HttpResponse(len(list(widgets)))
+
+        self.assert_queries('list_view_queryset', 1,
+                            lambda: test_view(factory.get('/')))
+
+    def test_list_view_paginated(self):
+        @list_view(model=Widget, paginate=True, page_size=2)
+        def test_view(request, widgets, pagination):
+            return http.HttpResponse(len(pagination.objects))
+
+        self.assert_queries('list_view_paginated', 1,
+                            lambda: test_view(factory.get('/?page=2')))
+
+    def test_list_view_not_allow_empty(self):
+        @list_view(model=Widget, allow_empty=False)
+        def test_view(request, widgets):
+            return http.HttpResponse(len(list(widgets)))
+
+        self.assert_queries('list_view_not_allow_empty', 2,
+                            lambda: test_view(factory.get('/')))
+
+    def test_list_view_not_allow_empty_paginated(self):
+        @list_view(model=Widget, allow_empty=False, paginate=True,
+                   page_size=2)
+        def test_view(request, widgets, pagination):
+            return http.HttpResponse(len(pagination.objects))
+
+        self.assert_queries('list_view_not_allow_empty_paginated', 2,
+                            lambda: test_view(factory.get('/')))
+
+    def test_form_view(self):
+        @form_view(form=TestForm)
+        def test_view(request, form):
+            return http.HttpResponse(form.is_valid())
+
+        self.assert_queries('form_view', 0, lambda: test_view(
+            factory.post('/', {'text': 'Albert'})))
+
+    def test_create_view(self):
+        @create_view(model=Widget, fields=['text'], success_url='/')
+        def test_view(request, form):
+            return http.HttpResponse()
+
+        response = self.assert_queries('create_view', 1, lambda: test_view(
+            factory.post('/', {'text': 'created'})))
+        self.assertEqual(response.status_code, 302)
+
+    def test_update_view_get(self):
+        @update_view(model=Widget, fields=['text'])
+        def test_view(request, widget, form):
+            return http.HttpResponse(form.as_p())
+
+        self.assert_queries('update_view_get', 1, lambda: test_view(
+            factory.get('/'), id=self.widgets[0].pk))
+
+    def test_update_view_get_unused(self):
+        # Neither the form nor the object are built if the view returns
+        # before using them
+        @update_view(model=Widget, fields=['text'])
+        def test_view(request, widget, form):
+            return http.HttpResponse()
+
+        self.assert_queries('update_view_get_unused', 0, lambda: test_view(
+            factory.get('/'), id=self.widgets[0].pk))
+
+    def test_update_view_post(self):
+        @update_view(model=Widget, fields=['text'], success_url='/')
+        def test_view(request, widget, form):
+            return http.HttpResponse()
+
+        response = self.assert_queries(
+            'update_view_post', 2, lambda: test_view(
+                factory.post('/', {'text': 'updated'}), id=self.widgets[0].pk))
+        self.assertEqual(response.status_code, 302)
+
+    def test_delete_view(self):
+        @delete_view(model=Widget, success_url='/')
+        def test_view(request, widget):
+            return http.HttpResponse()
+
+        response = self.assert_queries('delete_view', 2, lambda: test_view(
+            factory.post('/'), id=self.widgets[0].pk))
+        self.assertEqual(response.status_code, 302)
+
+    def test_assert_max_queries(self):
+        # When a block runs more queries than expected
+        # Then it fails, listing them
+        with self.assertRaises(AssertionError) as context:
+            with assert_max_queries(1):
+                list(Widget.objects.all())
+                Widget.objects.count()
+        self.assertIn('2 queries run, at most 1 expected',
+                      str(context.exception))
+
+    def test_snapshot_mismatch(self):
+        # Given a recorded snapshot
+        path = os.path.join(tempfile.mkdtemp(), 'queries.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with assert_max_queries(1) as queries:
+            list(Widget.objects.all())
+        QuerySnapshot(path, update=True).assert_matches('widgets', queries)
+        my_snapshot = QuerySnapshot(path, update=False)
+        my_snapshot.assert_matches('widgets', queries)
+
+        # When the queries change
+        with assert_max_queries(2) as queries:
+            list(Widget.objects.all())
+            Widget.objects.count()
+
+        # Then they no longer match
+        with self.assertRaises(AssertionError) as context:
+            my_snapshot.assert_matches('widgets', queries)
+        self.assertIn('COUNT', str(context.exception))
+
+    def test_snapshot_missing(self):
+        # Given no recorded snapshot
+        path = os.path.join(tempfile.mkdtemp(), 'queries.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        my_snapshot = QuerySnapshot(path, update=False)
+
+        # When queries are compared to it
+        with assert_max_queries(1) as queries:
+            list(Widget.objects.all())
+
+        # Then it fails, without recording anything
+        with self.assertRaises(AssertionError) as context:
+            my_snapshot.assert_matches('widgets', queries)
+        self.assertIn('no snapshot', str(context.exception))
+        self.assertFalse(os.path.exists(path))
+
+    def test_query_shape(self):
+        self.assertEqual(
+            query_shape('SELECT "id"\n  FROM "t" WHERE "id" IN (%s, %s, %s)'),
+            'SELECT "id" FROM "t" WHERE "id" IN (...)')
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@skipIf(diagnostics.tracemalloc is None, 'tracemalloc is not available')
+class AllocationTracing(TestCase):
+    def setUp(self):
+        self.widget = Widget.objects.create(text='traced widget')
+        self.url = reverse('test_app.views.detail_view_with_template2',
+                           args=[self.widget.pk])
+        self.handler = RecordingHandler()
+        diagnostics.allocations_logger.addHandler(self.handler)
+        diagnostics.allocations_logger.setLevel(logging.INFO)
+        diagnostics.reset_allocation_stats()
+
+    def tearDown(self):
+        diagnostics.allocations_logger.removeHandler(self.handler)
+        diagnostics.allocations_logger.setLevel(logging.NOTSET)
+        diagnostics.reset_allocation_stats()
+
+    @override_settings(VIEW_ACCESSORIES_ALLOCATION_SAMPLE_RATE=1)
+    def test_traced(self):
+        # When a traced request is made
+        self.client.get(self.url)
+
+        # Then its allocations are logged
+        record = self.handler.records[0].allocations
+        self.assertEqual(record['view'],
+                         'test_app.views.detail_view_with_template2')
+        self.assertEqual(record['decorators'],
+                         ['detail_view', 'template_view'])
+        self.assertTrue(record['top'])
+        self.assertEqual(set(record['top'][0]),
+                         set(['file', 'line', 'size', 'count']))
+
+        # And added up per view
+        stats = diagnostics.allocation_stats()
+        totals = stats['test_app.views.detail_view_with_template2']
+        self.assertEqual(totals['requests'], 1)
+        self.assertEqual(totals['retained'], record['retained'])
+
+    @override_settings(VIEW_ACCESSORIES_ALLOCATION_SAMPLE_RATE=1)
+    def test_concurrent(self):
+        # Given two traced views, each blocking until released
+        events = dict((name, threading.Event())
+                      for name in ('first', 'second', 'release_first',
+                                   'release_second'))
+
+        @view
+        def first_view(request):
+            events['first'].set()
+            events['release_first'].wait(5)
+            return http.HttpResponse('first')
+
+        @view
+        def second_view(request):
+            events['second'].set()
+            events['release_second'].wait(5)
+            return http.HttpResponse('second')
+
+        # When the first request to start tracing ends before the second
+        responses = []
+
+        def get(view_func):
+            responses.append(view_func(factory.get('/')))
+
+        threads = [threading.Thread(target=get, args=(view_func,))
+                   for view_func in (first_view, second_view)]
+        threads[0].start()
+        events['first'].wait(5)
+        threads[1].start()
+        events['second'].wait(5)
+        events['release_first'].set()
+        threads[0].join()
+        events['release_second'].set()
+        threads[1].join()
+
+        # Then both are traced, and tracing stops after the last one
+        self.assertEqual([response.content for response in responses],
+                         [b'first', b'second'])
+        self.assertEqual(len(self.handler.records), 2)
+        self.assertFalse(diagnostics.tracemalloc.is_tracing())
+
+    @override_settings(VIEW_ACCESSORIES_ALLOCATION_SAMPLE_RATE=1)
+    def test_failure(self):
+        # Given allocations that cannot be recorded
+        def fail(*args):
+            raise ValueError('test_failure')
+
+        record_allocations = diagnostics._record_allocations
+        diagnostics._record_allocations = fail
+        errors = RecordingHandler()
+        diagnostics.logger.addHandler(errors)
+
+        # When a traced request is made
+        try:
+            response = self.client.get(self.url)
+        finally:
+            diagnostics._record_allocations = record_allocations
+            diagnostics.logger.removeHandler(errors)
+
+        # Then it is answered all the same, and the error logged
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(errors.records), 1)
+        self.assertFalse(diagnostics.tracemalloc.is_tracing())
+
+    def test_command(self):
+        # When the command replays requests to a view
+        out = six.StringIO()
+        call_command('trace_allocations', self.url, requests=3, top=5,
+                     stdout=out)
+
+        # Then it reports the view's allocations
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith(
+            'test_app.views.detail_view_with_template2: 3 requests retained'))
+        self.assertTrue(1 < len(lines) <= 6)
+
+    def test_command_not_a_view(self):
+        # When the command is given a URL that is not found
+        # Then it fails
+        with self.assertRaises(CommandError):
+            call_command('trace_allocations', '/no/such/url/',
+                         stdout=six.StringIO())
+
+
+class Profiling(TestCase):
+    def setUp(self):
+        self.widget = Widget.objects.create(text='profiled widget')
+        self.url = reverse('test_app.views.detail_view_with_template2',
+                           args=[self.widget.pk])
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_sampled(self):
+        # Given all requests are sampled
+        with self.settings(VIEW_ACCESSORIES_PROFILE_DIR=self.directory,
+                           VIEW_ACCESSORIES_PROFILE_SAMPLE_RATE=1):
+            # When a request is made
+            response = self.client.get(self.url)
+
+        # Then it is profiled
+        self.assertEqual(response.status_code, 200)
+        filenames = os.listdir(self.directory)
+        self.assertEqual(len(filenames), 1)
+        self.assertTrue(filenames[0].startswith(
+            'test_app.views.detail_view_with_template2.'
+            'detail_view+template_view.'))
+        self.assertTrue(filenames[0].endswith('.prof'))
+        stats = pstats.Stats(os.path.join(self.directory, filenames[0]))
+        self.assertTrue(stats.total_calls)
+
+    def test_token(self):
+        # Given profiling is enabled but not sampled
+        with self.settings(VIEW_ACCESSORIES_PROFILE_DIR=self.directory):
+            # When requests are made with and without good tokens
+            self.client.get(self.url)
+            self.client.get(self.url,
+                            HTTP_X_VIEW_ACCESSORIES_PROFILE='bogus')
+            self.client.get(self.url,
+                            HTTP_X_VIEW_ACCESSORIES_PROFILE=profile_token(
+                                'test_app.views.some_other_view'))
+            self.client.get(self.url,
+                            HTTP_X_VIEW_ACCESSORIES_PROFILE=profile_token())
+
+        # Then only the one with a token for the view is profiled
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_collapsed(self):
+        # Given profiles are written as collapsed stacks
+        with self.settings(VIEW_ACCESSORIES_PROFILE_DIR=self.directory,
+                           VIEW_ACCESSORIES_PROFILE_SAMPLE_RATE=1,
+                           VIEW_ACCESSORIES_PROFILE_FORMAT='collapsed'):
+            # When a request is made
+            self.client.get(self.url)
+
+        # Then the stacks are rooted at the view and its decorators
+        filename, = os.listdir(self.directory)
+        self.assertTrue(filename.endswith('.collapsed'))
+        with open(os.path.join(self.directory, filename)) as collapsed:
+            lines = collapsed.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, microseconds = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith(
+                'test_app.views.detail_view_with_template2 '
+                '[detail_view+template_view];'))
+            self.assertGreater(int(microseconds), 0)
+
+
+class SlowRequests(TestCase):
+    def setUp(self):
+        self.widget = Widget.objects.create(text='slow widget')
+        self.url = reverse('test_app.views.detail_view_with_template2',
+                           args=[self.widget.pk])
+        self.handler = RecordingHandler()
+        diagnostics.slow_logger.addHandler(self.handler)
+        diagnostics._armed.clear()
+
+    def tearDown(self):
+        diagnostics.slow_logger.removeHandler(self.handler)
+        diagnostics._armed.clear()
+
+    @override_settings(VIEW_ACCESSORIES_SLOW_REQUEST_THRESHOLD=0)
+    def test_slow_request(self):
+        # When a request is slower than the threshold
+        self.client.get(self.url)
+
+        # Then it is logged with the view and where it spent its time
+        record = self.handler.records[0].slow_request
+        self.assertEqual(record['view'],
+                         'test_app.views.detail_view_with_template2')
+        self.assertEqual(record['decorators'],
+                         ['detail_view', 'template_view'])
+        self.assertEqual(record['kwargs'],
+                         {'id': repr(six.text_type(self.widget.pk))})
+        self.assertGreater(record['render_time'], 0)
+
+        # But the queries were not captured
+        self.assertEqual(record['queries'], None)
+
+        # When the next request is slow too
+        self.client.get(self.url)
+
+        # Then its queries were captured
+        queries = self.handler.records[1].slow_request['queries']
+        self.assertEqual(len(queries), 1)
+        self.assertIn('test_app_widget', queries[0]['sql'])
+        self.assertEqual(queries[0]['alias'], 'default')
+
+    @override_settings(VIEW_ACCESSORIES_SLOW_REQUEST_THRESHOLD=0,
+                       VIEW_ACCESSORIES_SLOW_REQUEST_SAMPLE_RATE=1)
+    def test_sampled(self):
+        # When a sampled request is slow
+        self.client.get(self.url)
+
+        # Then its queries were captured
+        self.assertEqual(len(self.handler.records[0].slow_request['queries']),
+                         1)
+
+    @override_settings(VIEW_ACCESSORIES_SLOW_REQUEST_THRESHOLD=60)
+    def test_fast_request(self):
+        # When a request is faster than the threshold
+        self.client.get(self.url)
+
+        # Then nothing is logged
+        self.assertEqual(self.handler.records, [])
+
+
 class TemplateView(TestCase):
     """Test for template views"""
     def test_template_view(self):
@@ -84,6 +786,619 @@ class TemplateView(TestCase):
                          'test_app/my_template_view.html')
 
 
+class IndependentContext(TransactionTestCase):
+    """independent() context values"""
+    def test_evaluated_concurrently(self):
+        # Given two callables that can only finish when run concurrently
+        first_started = threading.Event()
+        second_started = threading.Event()
+
+        def first():
+            first_started.set()
+            return second_started.wait(5)
+
+        def second():
+            second_started.set()
+            return first_started.wait(5)
+
+        # And the template view using them as independent values
+        @template_view(template_name='test_app/my_template_view.html')
+        def my_view(request):
+            return {'widget': independent(first),
+                    'other': independent(second)}
+
+        # When we call the view
+        response = my_view(factory.get('/'))
+
+        # Then both were evaluated concurrently
+        self.assertContains(response, '<h1>True</h1>')
+
+    def test_querysets(self):
+        # Given the widget
+        Widget.objects.create(text='test_querysets')
+
+        # And the template view with an independent queryset
+        @template_view(template_name='test_app/my_template_view.html')
+        def my_view(request):
+            return {'widget': independent(
+                        Widget.objects.values_list('text', flat=True)),
+                    'other': independent(lambda: 'other')}
+
+        # When we call the view
+        response = my_view(factory.get('/'))
+
+        # Then the queryset was evaluated for the template
+        self.assertContains(response, 'test_querysets')
+
+    def test_timeout(self):
+        # Given the template view with a slow independent value
+        done = threading.Event()
+
+        @template_view(template_name='test_app/my_template_view.html',
+                       timeout=0.1)
+        def my_view(request):
+            return {'widget': independent(lambda: done.wait(5)),
+                    'other': independent(lambda: 'other')}
+
+        # When we call the view
+        # Then it times out
+        with self.assertRaises(ContextTimeout):
+            my_view(factory.get('/'))
+        done.set()
+
+    def test_timeout_single_value(self):
+        # Given the template view with just one, slow, independent value
+        done = threading.Event()
+
+        @template_view(template_name='test_app/my_template_view.html',
+                       timeout=0.1)
+        def my_view(request):
+            return {'widget': independent(lambda: done.wait(5))}
+
+        # When we call the view
+        # Then it times out too
+        with self.assertRaises(ContextTimeout):
+            my_view(factory.get('/'))
+        done.set()
+
+    def test_persistent_connections(self):
+        # Given persistent database connections
+        settings_dict = connections.databases['default']
+        settings_dict['CONN_MAX_AGE'] = 60
+
+        # And the template view with values that note the connection they
+        # use, all run by the same worker
+        used = []
+
+        def note_connection():
+            connections['default'].ensure_connection()
+            used.append(connections['default'].connection)
+
+        @template_view(template_name='test_app/my_template_view.html',
+                       max_workers=1)
+        def my_view(request):
+            return {'widget': independent(note_connection),
+                    'other': independent(note_connection)}
+
+        try:
+            # When we call the view twice
+            my_view(factory.get('/'))
+            my_view(factory.get('/'))
+        finally:
+            settings_dict['CONN_MAX_AGE'] = 0
+            generic._get_pool(1).apply(connections.close_all)
+
+        # Then the worker kept using the same connection
+        self.assertEqual(len(used), 4)
+        self.assertTrue(all(used_connection is used[0]
+                            for used_connection in used))
+
+
+class ThreadSafety(TransactionTestCase):
+    """The decorators called from many threads at once
+
+    Set  VIEW_ACCESSORIES_STRESS_THREADS to change the number of threads,
+    e.g. to run these on a free-threaded Python.
+    """
+    def setUp(self):
+        self.widgets = [Widget.objects.create(text='widget %d' % i)
+                        for i in range(STRESS_THREADS)]
+
+    def hammer(self, call, iterations=10):
+        """Call call(thread number, iteration) from all threads at once"""
+        start = threading.Event()
+        errors = []
+
+        def run(number):
+            start.wait(5)
+            try:
+                for iteration in range(iterations):
+                    call(number, iteration)
+            except Exception as error:
+                errors.append((number, error))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(number,))
+                   for number in range(STRESS_THREADS)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_shared_queryset(self):
+        # Given the paginated list view of a queryset made at import time
+        queryset = Widget.objects.order_by('pk')
+
+        @list_view(queryset=queryset, paginate=True, page_size=1)
+        def my_view(request, widgets, pagination):
+            return http.HttpResponse(pagination.objects[0].text)
+
+        # When each thread requests its own page
+        def call(number, iteration):
+            response = my_view(factory.get('/?page=%d' % (number + 1)))
+            assert response.content == force_bytes(self.widgets[number].text)
+
+        # Then each gets its own widgets
+        self.hammer(call)
+
+        # And the shared queryset was never evaluated
+        self.assertEqual(queryset._result_cache, None)
+
+    def test_detail_view(self):
+        # Given the detail view
+        @detail_view(Widget)
+        def my_view(request, widget):
+            return http.HttpResponse(widget.text)
+
+        # When each thread requests its own widget
+        def call(number, iteration):
+            widget = self.widgets[number]
+            response = my_view(factory.get('/'), id=widget.pk)
+            assert response.content == force_bytes(widget.text)
+
+        # Then each gets it
+        self.hammer(call)
+
+    def test_form_view(self):
+        # Given the form view
+        @form_view(form=TestForm)
+        def my_view(request, form):
+            assert form.is_valid()
+            return http.HttpResponse(form.cleaned_data['text'])
+
+        # When each thread posts its own data
+        def call(number, iteration):
+            text = 'thread %d %d' % (number, iteration)
+            response = my_view(factory.post('/', {'text': text}))
+            assert response.content == force_bytes(text)
+
+        # Then each gets its own form
+        self.hammer(call)
+
+    def test_create_view(self):
+        # Given the create view, before its first request
+        form_classes = set()
+
+        @create_view(model=Widget, fields=['text'], success_url='/')
+        def my_view(request, form):
+            form_classes.add(type(form))
+
+        # When all threads post to it at once
+        def call(number, iteration):
+            response = my_view(factory.post('/', {'text': 'created'}))
+            assert response.status_code == 302
+
+        self.hammer(call, iterations=2)
+
+        # Then every widget was created with the same form class
+        self.assertEqual(Widget.objects.filter(text='created').count(),
+                         STRESS_THREADS * 2)
+        self.assertEqual(len(form_classes), 1)
+
+    def test_update_view(self):
+        # Given the update view
+        @update_view(model=Widget, fields=['text'], success_url='/')
+        def my_view(request, widget, form):
+            pass
+
+        # When each thread updates its own widget
+        def call(number, iteration):
+            response = my_view(factory.post('/', {'text': 'updated %d' %
+                                                  number}),
+                               id=self.widgets[number].pk)
+            assert response.status_code == 302
+
+        self.hammer(call, iterations=2)
+
+        # Then each widget got its own update
+        for number, widget in enumerate(self.widgets):
+            self.assertEqual(Widget.objects.get(pk=widget.pk).text,
+                             'updated %d' % number)
+
+    def test_limiter(self):
+        # Given the view limited to 4 executions and a long queue
+        limiter = Limiter(4, queue=STRESS_THREADS, wait=30)
+
+        @view(max_concurrency=limiter)
+        def my_view(request):
+            time.sleep(0.001)
+            return http.HttpResponse()
+
+        # When all threads call it at once
+        self.hammer(lambda number, iteration: my_view(factory.get('/')))
+
+        # Then the limit held and its counters add up
+        stats = limiter.stats()
+        self.assertLessEqual(stats['peak'], 4)
+        self.assertEqual(stats['admitted'], STRESS_THREADS * 10)
+        self.assertEqual((stats['running'], stats['waiting'],
+                          stats['rejected']), (0, 0, 0))
+
+
+class Coalesce(TestCase):
+    """template_view(coalesce=...)"""
+    def tearDown(self):
+        cache.clear()
+
+    def test_concurrent_requests_share_response(self):
+        # Given the coalescing template view that blocks until released
+        calls = []
+        entered = threading.Event()
+        release = threading.Event()
+
+        @template_view(template_name='test_app/my_template_view.html',
+                       coalesce=True)
+        def my_view(request):
+            calls.append(request)
+            entered.set()
+            release.wait(5)
+            return {'widget': 'coalesced'}
+
+        # When one request is being computed
+        responses = []
+
+        def get():
+            responses.append(my_view(factory.get('/coalesce/')))
+
+        threads = [threading.Thread(target=get)]
+        threads[0].start()
+        entered.wait(5)
+
+        # And identical requests arrive in the meantime
+        for i in range(4):
+            thread = threading.Thread(target=get)
+            thread.start()
+            threads.append(thread)
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        # Then the view was only called once
+        self.assertEqual(len(calls), 1)
+
+        # And every request got the response
+        self.assertEqual(len(responses), 5)
+        for response in responses:
+            self.assertContains(response, '<h1>coalesced</h1>')
+
+    def test_streamed_response_not_shared(self):
+        # Given a streamed response that is computed slowly
+        entered = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(None)
+            entered.set()
+            release.wait(5)
+            return http.StreamingHttpResponse(())
+
+        # When another caller coalesces with it
+        responses = []
+        thread = threading.Thread(
+            target=lambda: responses.append(coalesce('streamed', compute)))
+        thread.start()
+        entered.wait(5)
+        other = threading.Thread(
+            target=lambda: responses.append(coalesce('streamed', compute)))
+        other.start()
+        time.sleep(0.1)
+        release.set()
+        thread.join()
+        other.join()
+
+        # Then it computes its own response instead of copying it
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(all(response.streaming for response in responses))
+
+    def test_not_coalesced_after_response(self):
+        # Given the coalescing template view
+        calls = []
+
+        @template_view(template_name='test_app/my_template_view.html',
+                       coalesce=True)
+        def my_view(request):
+            calls.append(request)
+            return {'widget': 'coalesced'}
+
+        # When we call it twice in a row
+        my_view(factory.get('/'))
+        my_view(factory.get('/'))
+
+        # Then each request is computed
+        self.assertEqual(len(calls), 2)
+
+    def test_cross_process(self):
+        # Given the template view coalescing through the cache
+        @template_view(template_name='test_app/my_template_view.html',
+                       coalesce='default')
+        def my_view(request):
+            return {'widget': 'this process'}
+
+        # And another process computing the same request
+        request = factory.get('/')
+        key = view_cache_key(request, '%s.my_view' % __name__)
+        cache.set('%s.lock' % key, 'other')
+        cache.set('%s.other' % key, http.HttpResponse('other process'))
+
+        # When we call the view
+        response = my_view(request)
+
+        # Then we get the other process's response
+        self.assertContains(response, 'other process')
+
+
+class StaleWhileRevalidate(TestCase):
+    """template_view(cache_timeout=..., stale_while_revalidate=...)"""
+    def tearDown(self):
+        cache.clear()
+
+    def test_cached(self):
+        # Given the cached template view
+        calls = []
+
+        @template_view(template_name='test_app/my_template_view.html',
+                       cache_timeout=60)
+        def my_view(request):
+            calls.append(request)
+            return {'widget': len(calls)}
+
+        # When we call it twice
+        my_view(factory.get('/'))
+        response = my_view(factory.get('/'))
+
+        # Then the second response came from the cache
+        self.assertEqual(len(calls), 1)
+        self.assertContains(response, '<h1>1</h1>')
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_stale_while_revalidate(self):
+        # Given the template view that goes stale immediately
+        calls = []
+
+        @template_view(template_name='test_app/my_template_view.html',
+                       cache_timeout=0, stale_while_revalidate=60)
+        def my_view(request):
+            calls.append(request)
+            return {'widget': len(calls)}
+
+        response = my_view(factory.get('/'))
+        self.assertIn('max-age=0', response['Cache-Control'])
+        self.assertIn('stale-while-revalidate=60', response['Cache-Control'])
+
+        # When we call it again
+        response = my_view(factory.get('/'))
+
+        # Then we get the stale response
+        self.assertContains(response, '<h1>1</h1>')
+
+        # And it is revalidated in the background
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            response = my_view(factory.get('/'))
+            if '<h1>2</h1>' in response.content.decode('utf-8'):
+                break
+            time.sleep(0.01)
+        self.assertContains(response, '<h1>2</h1>')
+
+        # (wait for any revalidation still running)
+        key = view_cache_key(factory.get('/'), '%s.my_view' % __name__)
+        while cache.get('%s.revalidate' % key) and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_post_not_cached(self):
+        # Given the cached template view
+        calls = []
+
+        @template_view(template_name='test_app/my_template_view.html',
+                       cache_timeout=60)
+        def my_view(request):
+            calls.append(request)
+            return {'widget': len(calls)}
+
+        # When we POST to it twice
+        my_view(factory.post('/'))
+        my_view(factory.post('/'))
+
+        # Then neither response was cached
+        self.assertEqual(len(calls), 2)
+
+    def test_not_cached_not_advertised(self):
+        # Given responses that are not cached: a 404 and one with a cookie
+        def not_found():
+            return http.HttpResponseNotFound()
+
+        def with_cookie():
+            response = http.HttpResponse()
+            response.set_cookie('name', 'value')
+            return response
+
+        # When they are computed by cached_response
+        responses = [cached_response(key, compute, timeout=60, stale=60)
+                     for key, compute in (('not_found', not_found),
+                                          ('with_cookie', with_cookie))]
+
+        # Then they do not tell downstream caches to cache them either
+        for response in responses:
+            self.assertFalse(response.has_header('Cache-Control'))
+
+
+class HeadRequests(TestCase):
+    """HEAD requests to template views"""
+    def tearDown(self):
+        cache.clear()
+
+    def test_not_rendered(self):
+        # Given the template view with a template that does not exist
+        calls = []
+
+        @template_view(template_name='test_app/does_not_exist.html')
+        def my_view(request):
+            calls.append(request)
+            return {}
+
+        # When we HEAD it
+        response = my_view(factory.head('/'))
+
+        # Then the view is called but the template is not rendered
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(response.has_header('Content-Length'))
+
+    def test_cached_headers(self):
+        # Given the cached template view
+        calls = []
+
+        @template_view(template_name='test_app/my_template_view.html',
+                       cache_timeout=60)
+        def my_view(request):
+            calls.append(request)
+            return {'widget': 'cached'}
+
+        # And its cached GET response
+        response = my_view(factory.get('/'))
+
+        # When we HEAD it
+        head = my_view(factory.head('/'))
+
+        # Then we get the cached headers without calling the view again
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(head.content, b'')
+        self.assertEqual(head['Content-Length'], str(len(response.content)))
+        self.assertEqual(head['ETag'], response['ETag'])
+        self.assertEqual(head['Last-Modified'], response['Last-Modified'])
+
+    def test_template_composites(self):
+        # Given the widget
+        widget = Widget.objects.create(text='test_template_composites')
+
+        # When we HEAD a template_detail_view
+        url = reverse('test_app.views.detail_view_with_template2',
+                      args=[widget.pk])
+        response = self.client.head(url)
+
+        # Then nothing is rendered
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.templates, [])
+
+    def test_missing_object(self):
+        # Given template_detail_views and an id no widget has
+        for name in ('detail_view_with_template',
+                     'detail_view_with_template2'):
+            url = reverse('test_app.views.%s' % name, args=[99999])
+
+            # When we HEAD it
+            response = self.client.head(url)
+
+            # Then we get a 404, as with GET
+            self.assertEqual(response.status_code, 404)
+
+    def test_lazy_context(self):
+        # Given the template view putting a missing object in its context
+        @template_view(template_name='test_app/my_template_view.html')
+        def my_view(request):
+            return {'widget': lazy_object_or_404(Widget, pk=99999)}
+
+        # When we HEAD it
+        # Then it raises Http404, as a GET would
+        with self.assertRaises(http.Http404):
+            my_view(factory.head('/'))
+
+    def test_coalesced_template_list_view(self):
+        # Given the coalescing template list view, blocking until released
+        release = threading.Event()
+
+        @lists.template_list_view(
+            model=Widget, template_name='test_app/my_template_view.html',
+            coalesce=True)
+        def my_view(request, widgets):
+            release.wait(5)
+            return {}
+
+        # When concurrent HEAD requests arrive
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(
+            my_view(factory.head('/')))) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        # Then they are all answered
+        self.assertEqual([response.status_code for response in responses],
+                         [200] * 4)
+
+
+@override_settings(TEMPLATE_CONTEXT_PROCESSORS=[
+    'test_app.context_processors.widget'])
+class ContextProcessors(TestCase):
+    """template_view(context_processors=...)"""
+    def test_default(self):
+        # Given the template view
+        @template_view(template_name='test_app/my_template_view.html')
+        def my_view(request):
+            return {}
+
+        # When we call it
+        response = my_view(factory.get('/'))
+
+        # Then the configured context processors are used
+        self.assertContains(response, 'from context processor')
+
+    def test_no_context_processors(self):
+        # Given the template view without context processors
+        @template_view(template_name='test_app/my_template_view.html',
+                       context_processors=False)
+        def my_view(request):
+            return {}
+
+        # When we call it
+        response = my_view(factory.get('/'))
+
+        # Then the configured context processors are not used
+        self.assertNotContains(response, 'from context processor')
+
+    def test_allowlist(self):
+        # Given the template view with an explicit context processor
+        @template_view(template_name='test_app/my_template_view.html',
+                       context_processors=[
+                           'test_app.context_processors.widget'])
+        def my_view(request):
+            return {}
+
+        # When we call it
+        response = my_view(factory.get('/'))
+
+        # Then that context processor is used
+        self.assertContains(response, 'from context processor')
+
+
 class RedirectView(TestCase):
     def test_redirect(self):
         """Redirect view"""
@@ -149,6 +1464,35 @@ class DetailView(TestCase):
         # Then it works
         self.assertContains(response, 'This is a test')
 
+    def test_lazy_object(self):
+        # Given the detail view that does not use the object
+        @detail_view(model=Widget)
+        def my_view(request, widget):
+            return widget
+
+        # When we call it with a bogus id
+        with self.assertNumQueries(0):
+            widget = my_view(factory.get('/'), id=99999)
+
+        # Then the lookup happens, and 404s, when the object is used
+        with self.assertRaises(http.Http404):
+            widget.text
+
+    def test_method_checked_before_lookup(self):
+        # Given the GET-only detail view
+        @detail_view(model=Widget, methods=['GET'])
+        def my_view(request, widget):
+            return http.HttpResponse(widget.text)
+
+        # When we POST or OPTIONS to it
+        # Then no queries are made
+        with self.assertNumQueries(0):
+            response = my_view(factory.post('/'), id=99999)
+            self.assertEqual(response.status_code, 405)
+
+            response = my_view(factory.options('/'), id=99999)
+            self.assertEqual(response['allow'], 'GET')
+
     def test_detail_view_404(self):
         """detail_view throws 404"""
         # When we go to the detail_view decorated view of a bogus widget
@@ -244,6 +1588,35 @@ class ListView(TestCase):
         # Then it filters me widgets
         self.assertEqual(response.count(), 4)
 
+    def test_values(self):
+        # Given the widgets
+        for i in range(3):
+            Widget.objects.create(text='Widget%s' % i)
+
+        # When we define a list_view with values
+        @list_view(model=Widget, values=['text'])
+        def my_list_view(request, widgets):
+            return list(widgets)
+
+        # Then the view gets dicts of just those values
+        self.assertEqual(my_list_view(factory.get('/')),
+                         [{'text': 'Widget%s' % i} for i in range(3)])
+
+    def test_values_list_with_pagination(self):
+        # Given the widgets
+        for i in range(7):
+            Widget.objects.create(text='Widget%s' % i)
+
+        # When we define a paginated list_view with values_list
+        @list_view(model=Widget, values_list=['text'], paginate=True,
+                   page_size=5)
+        def my_list_view(request, widgets, pagination):
+            return pagination
+
+        # Then the page has tuples of those values
+        pagination = my_list_view(factory.get('/?page=2'))
+        self.assertEqual(pagination['objects'], [('Widget5',), ('Widget6',)])
+
     def test_list_view_without_allow_empty(self):
         """404 on allow_empty=False"""
         # When we define a list_view with a queryset with allow_empty=False
@@ -310,6 +1683,25 @@ class TemplateListView(TestCase):
         self.assertContains(response, 'TemplateListView_0')
         self.assertNotContains(response, 'TemplateListView_3')
 
+    def test_no_views_registered_per_request(self):
+        # Given the template_list_view view
+        Widget.objects.create(text='TemplateListView')
+        view = reverse('test_app.views.my_template_list_view')
+
+        # When we request it, counting the views being registered
+        registered = []
+        register = generic.register
+        generic.register = lambda view_func, **info: registered.append(
+            view_func) or register(view_func, **info)
+        try:
+            response = self.client.get(view)
+        finally:
+            generic.register = register
+
+        # Then it was rendered without decorating (and registering) views
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(registered, [])
+
 
 class Pagination(TestCase):
     def setUp(self):
@@ -329,7 +1721,7 @@ class Pagination(TestCase):
         pagination = paginate_queryset(request, queryset, 'page', 5)
 
         # Then we get a pagination with the pertinant data
-        self.assertEqual(type(pagination), dict)
+        self.assertTrue(isinstance(pagination, lists.Pagination))
         self.assertEqual(len(pagination['objects']), 5)
         self.assertEqual(pagination['page'].number, 2)
         self.assertTrue(pagination['has_other_pages'])
@@ -350,7 +1742,7 @@ class Pagination(TestCase):
         response, pagination = my_view(request)
 
         # We have a "pagination" accessory
-        self.assertTrue(isinstance(pagination, dict))
+        self.assertTrue(isinstance(pagination, lists.Pagination))
 
         # Our page has 3 objects
         self.assertEqual(len(response.content.decode('utf-8').split('\n')), 3)
@@ -375,6 +1767,74 @@ class Pagination(TestCase):
         with self.assertRaises(http.Http404):
             paginate_queryset(request, queryset, 'page', 5)
 
+    def test_no_count_for_next_previous(self):
+        # Given the request for the second page
+        request = factory.get('/?page=2')
+
+        # When we only use the objects and next/previous links
+        with self.assertNumQueries(1):
+            pagination = paginate_queryset(request, self.widgets, 'page', 5)
+            self.assertEqual(len(pagination.objects), 5)
+            self.assertTrue(pagination.has_next)
+            self.assertTrue(pagination.has_previous)
+            self.assertTrue(pagination['has_other_pages'])
+
+        # Then the objects were fetched but never counted
+        with self.assertNumQueries(1):
+            self.assertEqual(pagination.count, 23)
+            self.assertEqual(pagination.num_pages, 5)
+            self.assertEqual(pagination['page'].number, 2)
+
+    def test_dict_compatible(self):
+        # Given the pagination
+        request = factory.get('/?page=last')
+        pagination = paginate_queryset(request, self.widgets, 'page', 5)
+
+        # Then it can be used as a dict
+        self.assertEqual(sorted(pagination.keys()),
+                         ['has_other_pages', 'objects', 'page', 'paginator'])
+        self.assertEqual(dict(pagination)['objects'], pagination.objects)
+        self.assertEqual(pagination.get('bogus'), None)
+        self.assertIn('objects', pagination)
+        self.assertTrue(isinstance(pagination, Mapping))
+
+        # And it has no __dict__ (on Python 2 too)
+        self.assertFalse(hasattr(pagination, '__dict__'))
+
+        # And on the last page there is no next page
+        self.assertEqual(len(pagination['objects']), 3)
+        self.assertFalse(pagination.has_next)
+        self.assertFalse(pagination['page'].has_next())
+
+    def test_orphans(self):
+        # Given the queryset with 23 objects and 3 orphans allowed
+        request = factory.get('/?page=4')
+
+        # When we get the fourth page
+        pagination = paginate_queryset(request, self.widgets, 'page', 5,
+                                       orphans=3)
+
+        # Then it takes the orphans
+        self.assertEqual(len(pagination['objects']), 8)
+        self.assertFalse(pagination.has_next)
+
+        # And there is no fifth page
+        request = factory.get('/?page=5')
+        with self.assertRaises(http.Http404):
+            paginate_queryset(request, self.widgets, 'page', 5, orphans=3)
+
+    def test_values(self):
+        # Given the request
+        request = factory.get('/')
+
+        # When we paginate the queryset with values_list
+        pagination = paginate_queryset(request, self.widgets, 'page', 2,
+                                       values_list=['text'])
+
+        # Then the objects are tuples
+        self.assertEqual(pagination['objects'],
+                         [('Widget 0',), ('Widget 1',)])
+
     def test_page_size_from_request(self):
         # Given the queryset
         queryset = self.widgets
@@ -390,6 +1850,773 @@ class Pagination(TestCase):
         self.assertEqual(pagination['page'].number, 3)
 
 
+class JSONListView(TestCase):
+    def setUp(self):
+        self.widgets = [Widget.objects.create(text='Widget%s' % i)
+                        for i in range(7)]
+
+    def test_json_list_view(self):
+        # When we call the paginated json_list_view
+        view = reverse('test_app.views.my_json_list_view')
+        response = self.client.get(view + '?page=2')
+
+        # Then we get the page of widgets with the pagination data
+        self.assertEqual(response['content-type'], 'application/json')
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(
+            data['objects'],
+            [{'id': w.pk, 'text': w.text} for w in self.widgets[5:]])
+        self.assertEqual(data['pagination'], {
+            'page': 2,
+            'has_next': False,
+            'has_previous': True,
+            'next_page': None,
+            'previous_page': 1,
+        })
+
+    def test_streams_in_chunks(self):
+        # Given the unpaginated json_list_view with a small chunk_size
+        @json_list_view(model=Widget, fields=['text'], chunk_size=3)
+        def my_view(request, widgets):
+            pass
+
+        # When we call it
+        response = my_view(factory.get('/'))
+
+        # Then the list is streamed 3 widgets at a time
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(
+            json.loads(b''.join(chunks).decode('utf-8')),
+            [{'text': w.text} for w in self.widgets])
+
+    def test_streamed_page(self):
+        # Given the paginated json_list_view with a small chunk_size
+        @json_list_view(model=Widget, fields=['text'], paginate=True,
+                        page_size=5, chunk_size=2)
+        def my_view(request, widgets, pagination):
+            pass
+
+        # When we call it
+        response = my_view(factory.get('/'))
+
+        # Then the page is streamed but is the same JSON
+        data = json.loads(b''.join(response.streaming_content).decode('utf-8'))
+        self.assertEqual(data['objects'],
+                         [{'text': w.text} for w in self.widgets[:5]])
+        self.assertEqual(data['pagination']['next_page'], 2)
+
+    def test_encoder_and_return_value(self):
+        # Given the json_list_view with a custom encoder
+        @json_list_view(model=Widget, encoder=lambda obj: repr(len(obj)))
+        def my_view(request, widgets):
+            return [1, 2, 3]
+
+        # When we call it
+        response = my_view(factory.get('/'))
+
+        # Then what the view returned is encoded with that encoder
+        self.assertEqual(response.content, b'3')
+
+    def test_query_budget(self):
+        # Given the unpaginated json_list_views that may not query
+        @json_list_view(model=Widget, fields=['text'], query_budget=0)
+        def my_view(request, widgets):
+            pass
+
+        @json_list_view(model=Widget, fields=['text'], query_budget=0,
+                        chunk_size=3)
+        def my_streamed_view(request, widgets):
+            pass
+
+        # When we call them
+        # Then they break the budget before anything is streamed
+        for view_func in (my_view, my_streamed_view):
+            with self.assertRaises(QueryBudgetExceeded):
+                view_func(factory.get('/'))
+
+    def test_encode(self):
+        # Given values that json and orjson encode differently by default
+        now = datetime.datetime(2020, 1, 2, 3, 4, 5, 678901, tzinfo=utc)
+        values = [now, now.date(), now.time(), decimal.Decimal('1.5'),
+                  uuid.UUID(int=1)]
+
+        # When we encode them
+        data = json.loads(jsonview.encode(values).decode('utf-8'))
+
+        # Then they are encoded as with DjangoJSONEncoder
+        self.assertEqual(data, [DjangoJSONEncoder().default(value)
+                                for value in values])
+
+
+class JSONDetailView(TestCase):
+    def test_json_detail_view(self):
+        # Given the widget
+        widget = Widget.objects.create(text='test_json_detail_view')
+
+        # When we call the json_detail_view
+        view = reverse('test_app.views.my_json_detail_view', args=[widget.pk])
+        response = self.client.get(view)
+
+        # Then we get the widget's fields
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+                         {'id': widget.pk, 'text': widget.text})
+
+    def test_404(self):
+        # Given the json_detail_view
+        @json_detail_view(Widget)
+        def my_view(request, widget):
+            pass
+
+        # When we call it for a non-existent widget
+        # Then we get a 404
+        with self.assertRaises(http.Http404):
+            my_view(factory.get('/'), id=9999)
+
+
+class CompositeViews(TestCase):
+    """Decorators made of others, e.g. template_detail_view"""
+    def setUp(self):
+        self.widget = Widget.objects.create(text='composite')
+        self.watched = []
+        self.watch = generic.watch
+
+        def watch(view_func, name, *args):
+            self.watched.append(name)
+            return self.watch(view_func, name, *args)
+        generic.watch = watch
+
+    def tearDown(self):
+        generic.watch = self.watch
+
+    def registered(self, name):
+        return [info['decorator'] for view_func, info in registered_views()
+                if view_func.__name__ == name]
+
+    def test_detail(self):
+        # Given the template detail view
+        @template_detail_view(Widget, max_concurrency=2)
+        def composite_detail(request, widget):
+            pass
+
+        # Then it is registered as one view
+        self.assertEqual(self.registered('composite_detail'),
+                         ['detail_view'])
+        self.assertEqual(decorator_chain(composite_detail),
+                         ['detail_view', 'template_view'])
+
+        # When we call it
+        response = composite_detail(factory.get('/'), id=self.widget.pk)
+
+        # Then the request is watched once
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.watched, ['tests.tests.composite_detail'])
+
+    def test_create(self):
+        # Given the template create view
+        @template_create_view(Widget, fields=['text'])
+        def composite_create(request, form):
+            pass
+
+        # When we call it
+        response = composite_create(factory.get('/'))
+
+        # Then it is (still) registered as one view
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.registered('composite_create'),
+                         ['create_view'])
+
+        # And the request was watched once
+        self.assertEqual(self.watched, ['tests.tests.composite_create'])
+
+
+class Warmup(TestCase):
+    def setUp(self):
+        edit._form_classes.clear()
+
+    def test_warmup(self):
+        # Given decorated views
+        @update_view(model=Widget, fields=['text'])
+        @template_view(template_name='test_app/widget_update_form.html')
+        def my_view(request, widget, form):
+            pass
+
+        # When warming up
+        result = warmup()
+
+        # Then the views' form classes are made
+        self.assertIn((Widget, ('text',)), edit._form_classes)
+        self.assertGreaterEqual(result['views'], 1)
+        self.assertGreaterEqual(result['templates'], 1)
+        self.assertGreaterEqual(result['models'], 1)
+
+        # And used by the views
+        form_classes = []
+
+        @update_view(model=Widget, fields=['text'])
+        def other_view(request, widget, form):
+            form_classes.append(form.__class__)
+            return http.HttpResponse()
+
+        widget = Widget.objects.create(text='warm')
+        other_view(factory.get('/'), id=widget.pk)
+        self.assertIs(form_classes[0], edit._form_classes[Widget, ('text',)])
+
+    def test_problems(self):
+        # Given a view with a missing template
+        @template_view(template_name='test_app/no_such_template.html')
+        def my_view(request):
+            pass
+
+        # When warming up
+        result = warmup()
+
+        # Then the problem is reported
+        self.assertTrue(any('no_such_template' in problem
+                            for problem in result['problems']))
+
+    def test_command(self):
+        # When the warmup command is run
+        out = six.StringIO()
+        call_command('warmup', stdout=out, stderr=six.StringIO())
+
+        # Then it reports what it warmed up
+        self.assertIn('Warmed up', out.getvalue())
+
+
+class ExplainViews(TestCase):
+    def test_lookup_without_index(self):
+        # Given a detail view looking widgets up by their text
+        @detail_view(Widget, field='text')
+        def widget_by_text(request, widget):
+            pass
+
+        # When explaining the views
+        reports = dict((report['view'], report) for report in explain_views())
+
+        # Then its lookup is a sequential scan of an unindexed field
+        report = reports['tests.tests.widget_by_text']
+        self.assertEqual(report['decorators'], ['detail_view'])
+        [query] = report['queries']
+        self.assertEqual(query['name'], 'lookup')
+        self.assertIn('"text" = %s', query['sql'])
+        self.assertEqual(query['problems'], [
+            'No index on test_app_widget.text, the lookup field',
+            'Sequential scan of test_app_widget'])
+
+        # And looking them up by pk is fine
+        report = reports['test_app.views.my_detail_view']
+        self.assertEqual(report['queries'][0]['problems'], [])
+
+    def test_sort_without_index(self):
+        # Given a paginated list view sorted by an unindexed field
+        @list_view(queryset=Widget.objects.order_by('text'), paginate=True,
+                   page_size=5, allow_empty=False)
+        def widgets_by_text(request, widgets, pagination):
+            pass
+
+        # When explaining the views
+        reports = dict((report['view'], report) for report in explain_views())
+
+        # Then the page's query sorts without an index
+        queries = reports['tests.tests.widgets_by_text']['queries']
+        self.assertEqual([query['name'] for query in queries],
+                         ['exists', 'page', 'count'])
+        self.assertIn('LIMIT 6', queries[1]['sql'])
+        self.assertEqual(len(queries[1]['problems']), 1)
+        self.assertTrue(
+            queries[1]['problems'][0].startswith('Sort without an index'))
+
+        # And the unfiltered scans to count are not problems
+        self.assertEqual(queries[2]['problems'], [])
+
+    def test_command(self):
+        # Given a view with problems
+        @detail_view(Widget, field='text')
+        def widget_by_text(request, widget):
+            pass
+
+        # When the explain_views command is run
+        out = six.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('explain_views', '--fail', verbosity=2, stdout=out)
+
+        # Then it reports the views' queries and problems
+        self.assertIn('tests.tests.widget_by_text [detail_view]',
+                      out.getvalue())
+        self.assertIn('SEARCH test_app_widget USING INTEGER PRIMARY KEY',
+                      out.getvalue())
+        self.assertIn('lookup: No index on test_app_widget.text',
+                      out.getvalue())
+
+
+class LookupIndexes(TestCase):
+    def test_detail_view(self):
+        # Given a detail view looking widgets up by text, with an index
+        widget = Widget.objects.create(text='slug')
+
+        @detail_view(Widget, field='text', kwarg='text', index=True)
+        def my_view(request, widget):
+            return widget.pk
+
+        # When the view is called twice
+        with assert_max_queries(1) as first:
+            self.assertEqual(my_view(factory.get('/'), text='slug'),
+                             widget.pk)
+        with assert_max_queries(1) as second:
+            self.assertEqual(my_view(factory.get('/'), text='slug'),
+                             widget.pk)
+
+        # Then the second call looks the widget up by its pk (and text)
+        self.assertNotIn('"id"', first[0]['sql'].split('WHERE')[1])
+        self.assertIn('"id"', second[0]['sql'].split('WHERE')[1])
+
+    def test_stale_entries(self):
+        # Given an index of widgets by text
+        index = LookupIndex(Widget, 'text')
+        widget = Widget.objects.create(text='old')
+        self.assertEqual(index.get(Widget.objects.all(), 'old'), widget)
+
+        # When the widget's text is changed behind the index's back
+        Widget.objects.filter(pk=widget.pk).update(text='new')
+        other = Widget.objects.create(text='other')
+        Widget.objects.filter(pk=other.pk).update(text='old')
+
+        # Then the index notices and finds the right widgets
+        self.assertEqual(index.get(Widget.objects.all(), 'old'), other)
+        self.assertEqual(index.get(Widget.objects.all(), 'new'), widget)
+        with self.assertRaises(http.Http404):
+            index.get_or_404(Widget.objects.all(), 'missing')
+
+    def test_signals(self):
+        # Given an index of widgets by text
+        index = LookupIndex(Widget, 'text')
+
+        # When a widget is saved
+        widget = Widget.objects.create(text='saved')
+
+        # Then the index has its pk
+        with assert_max_queries(0):
+            self.assertEqual(index.pk_for('saved'), widget.pk)
+
+        # And forgets it when it is deleted
+        widget.delete()
+        self.assertEqual(len(index), 0)
+        self.assertIsNone(index.pk_for('saved'))
+
+    def test_max_size(self):
+        # Given an index of at most two widgets
+        index = LookupIndex(Widget, 'text', max_size=2)
+        for text in ('a', 'b', 'c'):
+            Widget.objects.create(text=text)
+
+        # When three are looked up, "a" twice
+        for text in ('a', 'b', 'a', 'c'):
+            index.pk_for(text)
+
+        # Then the least recently used is evicted
+        self.assertEqual(len(index), 2)
+        with assert_max_queries(0):
+            index.pk_for('a')
+            index.pk_for('c')
+        with assert_max_queries(1):
+            index.pk_for('b')
+
+    def test_cache_backed(self):
+        # Given two indexes sharing the cache
+        cache.clear()
+        index = LookupIndex(Widget, 'text', cache_alias='default')
+        other = LookupIndex(Widget, 'text', cache_alias='default')
+        widget = Widget.objects.create(text='cached')
+
+        # When one looks a widget up
+        index.pk_for('cached')
+
+        # Then the other has it too
+        with assert_max_queries(0):
+            self.assertEqual(other.pk_for('cached'), widget.pk)
+        self.assertEqual(len(other), 0)
+
+    def test_pk(self):
+        # An index of pks by pk makes no sense
+        with self.assertRaises(ImproperlyConfigured):
+            LookupIndex(Widget, 'pk')
+
+
+class RedirectTables(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        Redirect.objects.bulk_create([
+            Redirect(source='/old/', target='/new/'),
+            Redirect(source='/gone/', target=''),
+            Redirect(source='/blog/*', target='/articles/*'),
+            Redirect(source='/blog/special/*', target='/special/'),
+            Redirect(source='/blog/exact/', target='/exact/'),
+        ])
+
+    def test_redirects(self):
+        # Given a redirect table view
+        @redirect_table_view(permanent=False)
+        def my_view(request, target):
+            return target
+
+        # When paths are requested
+        def get(path):
+            response = my_view(factory.get(path))
+            return response.status_code, response.get('Location')
+
+        # Then they are redirected as in the table, without queries after
+        # the table is loaded
+        self.assertEqual(get('/old/'), (302, '/new/'))
+        with assert_max_queries(0):
+            self.assertEqual(get('/gone/'), (410, None))
+            self.assertEqual(get('/blog/2014/post/'),
+                             (302, '/articles/2014/post/'))
+            self.assertEqual(get('/blog/special/post/'), (302, '/special/'))
+            self.assertEqual(get('/blog/exact/'), (302, '/exact/'))
+            self.assertEqual(get('/blog/'), (302, '/articles/'))
+            with self.assertRaises(http.Http404):
+                get('/blog')
+            with self.assertRaises(http.Http404):
+                get('/new/')
+
+    def test_query_string(self):
+        # Given a redirect table view keeping the query string
+        @redirect_table_view(query_string=True)
+        def my_view(request, target):
+            return target + 'page/'
+
+        # When an old path is requested
+        response = my_view(factory.get('/old/?a=1'))
+
+        # Then it is redirected permanently, as the view says
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], '/new/page/?a=1')
+
+    def test_reloads(self):
+        # Given a redirect table view
+        @redirect_table_view(check_interval=3600)
+        def my_view(request, target):
+            return target
+
+        self.assertEqual(my_view(factory.get('/old/'))['Location'], '/new/')
+
+        # When a redirect is saved
+        redirect = Redirect.objects.get(source='/old/')
+        redirect.target = '/newer/'
+        redirect.save()
+
+        # Then the table is reloaded
+        self.assertEqual(my_view(factory.get('/old/'))['Location'],
+                         '/newer/')
+
+        # And after bulk changes when told so, by views checking the
+        # version (as in other processes)
+        @redirect_table_view(check_interval=0)
+        def other_view(request, target):
+            return target
+
+        self.assertEqual(other_view(factory.get('/old/'))['Location'],
+                         '/newer/')
+        Redirect.objects.filter(source='/old/').update(target='/newest/')
+        redirects_changed()
+        self.assertEqual(other_view(factory.get('/old/'))['Location'],
+                         '/newest/')
+        self.assertEqual(len(lookup(other_view)['redirect_table']), 5)
+
+    @skipIf(django.VERSION < (1, 9), 'on_commit() needs Django 1.9')
+    def test_changed_on_commit(self):
+        # Given a redirect table view, counting version changes
+        @redirect_table_view
+        def my_view(request, target):
+            return target
+
+        my_view(factory.get('/old/'))
+        changes = []
+        bump = redirects.redirects_changed
+        redirects.redirects_changed = lambda *args: changes.append(args)
+
+        # When a redirect is saved in a transaction
+        try:
+            with transaction.atomic():
+                Redirect.objects.create(source='/older/', target='/new/')
+
+                # Then the version only changes once it is committed
+                self.assertEqual(changes, [])
+        finally:
+            redirects.redirects_changed = bump
+        self.assertEqual(len(changes), 1)
+
+
+class Routing(TestCase):
+    def test_router(self):
+        # Given a router with routes of all shapes
+        router = Router()
+        router.add('widget/<int:id>/', 'detail', 'd')
+        router.add('widget/new/', 'new', 'n')
+        router.add('widget/<slug:name>/edit/', 'edit', 'e')
+        router.add('page-<int:number>/', 'page', 'p')
+        router.add('files/<path:name>', 'files', 'f')
+
+        # When paths are matched
+        # Then converters convert, and static segments win
+        self.assertEqual(router.match('widget/12/'),
+                         ('detail', {'id': 12}, 'd'))
+        self.assertEqual(router.match('widget/new/'), ('new', {}, 'n'))
+        self.assertEqual(router.match('widget/new/edit/'),
+                         ('edit', {'name': 'new'}, 'e'))
+        self.assertEqual(router.match('page-3/'),
+                         ('page', {'number': 3}, 'p'))
+        self.assertEqual(router.match('files/a/b.txt'),
+                         ('files', {'name': 'a/b.txt'}, 'f'))
+        self.assertIsNone(router.match('widget/x/'))
+        self.assertIsNone(router.match('widget/12'))
+        self.assertIsNone(router.match('page-x/'))
+        self.assertIsNone(router.match('files/'))
+
+    def test_duplicate_route(self):
+        # Given a router
+        router = Router()
+        router.add('widget/<int:id>/', 'detail', 'd')
+
+        # When another view is given the same route
+        # Then it is refused
+        with self.assertRaises(ImproperlyConfigured):
+            router.add('widget/<int:id>/', 'other', 'o')
+
+    def test_routes(self):
+        # Given a widget and the routes of test_app.views in the URLconf
+        widget = Widget.objects.create(text='routed widget')
+
+        # When its routed view is reversed and requested
+        url = reverse('test_app.views.routed_detail_view',
+                      kwargs={'id': widget.id})
+        response = self.client.get(url)
+
+        # Then it is found by the router
+        self.assertEqual(url, '/routed/widget/%d/' % widget.id)
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+                         {'id': widget.id, 'text': 'routed widget'})
+        self.assertEqual(
+            self.client.get('/routed/widget/x/').status_code, 404)
+
+    def test_routes_decorated(self):
+        # Given a routed view further decorated with login_required
+        # When it is requested
+        response = self.client.get('/routed/private/secret/')
+
+        # Then login_required applies
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/accounts/login/', response['Location'])
+
+
+@override_settings(VIEW_ACCESSORIES_REPLICAS=['replica'])
+class ReadReplicas(TestCase):
+    multi_db = True
+
+    def test_using_alias(self):
+        # Given the widget that is only on the replica
+        widget = Widget.objects.using('replica').create(text='replicated')
+
+        # When we define a detail_view using the replica
+        @detail_view(Widget, using='replica')
+        def my_view(request, widget):
+            return widget.text
+
+        # Then the view gets the widget from there
+        self.assertEqual(my_view(factory.get('/'), id=widget.pk), 'replicated')
+
+    def test_auto_reads_from_replica(self):
+        # Given the widgets on the primary and the replica
+        Widget.objects.create(text='primary')
+        Widget.objects.using('replica').create(text='replica')
+
+        # And the list_view using "auto"
+        @list_view(model=Widget, using='auto', values_list=['text'])
+        def my_view(request, widgets):
+            return list(widgets)
+
+        # When we GET the view
+        # Then it reads from the replica
+        self.assertEqual(my_view(factory.get('/')), [('replica',)])
+
+        # When we POST to the view
+        # Then it reads from the primary
+        self.assertEqual(my_view(factory.post('/')), [('primary',)])
+
+    def test_auto_writes_to_primary_and_sticks(self):
+        # Given the create_view using "auto"
+        @create_view(model=Widget, fields=['text'], success_url='/',
+                     using='auto')
+        def my_view(request, form):
+            pass
+
+        # When we POST to it
+        response = my_view(factory.post('/', {'text': 'new widget'}))
+
+        # Then the widget is created on the primary
+        self.assertTrue(Widget.objects.filter(text='new widget').exists())
+        self.assertFalse(
+            Widget.objects.using('replica').filter(text='new widget').exists())
+
+        # And the client is stuck to the primary
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        # So that its next GET reads from the primary
+        @list_view(model=Widget, using='auto', values_list=['text'])
+        def list_widgets(request, widgets):
+            return list(widgets)
+
+        request = factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        self.assertEqual(list_widgets(request), [('new widget',)])
+        self.assertEqual(list_widgets(factory.get('/')), [])
+
+    def test_delete_from_replica(self):
+        # Given the widget on the replica
+        widget = Widget.objects.using('replica').create(text='replicated')
+
+        # And the delete_view using the replica
+        @delete_view(model=Widget, using='replica')
+        def my_view(request, widget):
+            pass
+
+        # When we POST to it
+        my_view(factory.post('/'), id=widget.pk)
+
+        # Then the widget is deleted from the replica
+        self.assertFalse(Widget.objects.using('replica').exists())
+
+
+def by_parity(pk):
+    """Shard resolver for the tests: even pks on default, odd on replica"""
+    return 'default' if int(pk) % 2 == 0 else 'replica'
+
+
+class Sharding(TestCase):
+    multi_db = True
+
+    def setUp(self):
+        for pk in range(1, 11):
+            Widget.objects.using(by_parity(pk)).create(
+                pk=pk, text='Widget%02d' % pk)
+
+    def test_detail_view(self):
+        # Given the detail_view with a shard resolver
+        @detail_view(Widget, shard=by_parity)
+        def my_view(request, widget):
+            return widget.text
+
+        # Then it finds the widgets on either shard
+        self.assertEqual(my_view(factory.get('/'), id='3'), 'Widget03')
+        self.assertEqual(my_view(factory.get('/'), id='4'), 'Widget04')
+
+    def test_update_view(self):
+        # Given the update_view with a shard resolver
+        @update_view(model=Widget, fields=['text'], shard=by_parity)
+        def my_view(request, widget, form):
+            pass
+
+        # When we POST to it
+        my_view(factory.post('/', {'text': 'updated'}), id='5')
+
+        # Then the widget is updated on its shard
+        self.assertEqual(Widget.objects.using('replica').get(pk=5).text,
+                         'updated')
+        self.assertFalse(Widget.objects.filter(pk=5).exists())
+
+    def test_list_view_fans_out(self):
+        # Given the paginated list_view without a shard key
+        @list_view(queryset=Widget.objects.order_by('-text'), shard=by_parity,
+                   shards=['default', 'replica'], values_list=['text'],
+                   paginate=True, page_size=4)
+        def my_view(request, widgets, pagination):
+            return widgets.count(), pagination['objects']
+
+        # When we get the second page
+        count, objects = my_view(factory.get('/?page=2'))
+
+        # Then the widgets of both shards are merged in order
+        self.assertEqual(count, 10)
+        self.assertEqual(objects, [('Widget06',), ('Widget05',),
+                                   ('Widget04',), ('Widget03',)])
+
+    def test_merged_flat_values_list(self):
+        # Given a flat values_list merged across both shards
+        widgets = MergedQuerySet(Widget.objects.order_by('-text'),
+                                 ['default', 'replica'])
+        texts = widgets.values_list('text', flat=True)
+
+        # Then the values are merged in order
+        self.assertEqual(list(texts[:3]),
+                         ['Widget10', 'Widget09', 'Widget08'])
+
+    def test_merged_flat_queryset(self):
+        # Given an already flat values_list merged across both shards
+        texts = MergedQuerySet(
+            Widget.objects.values_list('text', flat=True).order_by('text'),
+            ['default', 'replica'])
+
+        # Then the values are merged in order
+        self.assertEqual(list(texts[:3]),
+                         ['Widget01', 'Widget02', 'Widget03'])
+
+    def test_merged_ordering_not_in_values(self):
+        # Given values merged across both shards but ordered by another
+        # field
+        texts = MergedQuerySet(Widget.objects.order_by('-pk'),
+                               ['default', 'replica']).values_list('text')
+
+        # When we list them
+        # Then that is an error
+        with self.assertRaises(ImproperlyConfigured):
+            list(texts)
+
+    @override_settings(VIEW_ACCESSORIES_SHARDS=['default', 'replica'])
+    def test_list_view_default_shards(self):
+        # Given the list_view without shards
+        @list_view(model=Widget, shard=by_parity)
+        def my_view(request, widgets):
+            return widgets.count()
+
+        # Then it fans out across the shards of the settings
+        self.assertEqual(my_view(factory.get('/')), 10)
+
+    def test_list_view_no_shards(self):
+        # Given the list_view without shards, nor a setting for them
+        @list_view(model=Widget, shard=by_parity)
+        def my_view(request, widgets):
+            return widgets.count()
+
+        # When we call it
+        # Then it does not guess them
+        with self.assertRaises(ImproperlyConfigured):
+            my_view(factory.get('/'))
+
+    @override_settings(VIEW_ACCESSORIES_REPLICAS=['replica'])
+    def test_list_view_replica_shard(self):
+        # Given the list_view with a replica among its shards
+        @list_view(model=Widget, shard=by_parity,
+                   shards=['default', 'replica'])
+        def my_view(request, widgets):
+            return widgets.count()
+
+        # When we call it
+        # Then that is an error
+        with self.assertRaises(ImproperlyConfigured):
+            my_view(factory.get('/'))
+
+    def test_list_view_with_shard_key(self):
+        # Given the list_view with a shard key
+        @list_view(model=Widget, shard=by_parity, shard_kwarg='key')
+        def my_view(request, widgets, key):
+            return sorted(widget.pk for widget in widgets)
+
+        # Then it only lists the widgets on that shard
+        self.assertEqual(my_view(factory.get('/'), key=1), [1, 3, 5, 7, 9])
+
+
 class WithDjangoDecorators(TestCase):
     def test_login_required(self):
         """Django's login_required"""
@@ -510,6 +2737,23 @@ class CreateView(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response['location'], 'https://www.google.com/')
 
+    def test_form_class_made_once(self):
+        # Given the create_view
+        form_classes = []
+
+        @create_view(model=Widget, fields=['text'])
+        def test_view(request, form):
+            form_classes.append(form.__class__)
+            return http.HttpResponse()
+
+        # When I request it twice
+        test_view(factory.get('/'))
+        test_view(factory.get('/'))
+
+        # Then the same form class is used
+        self.assertEqual(len(form_classes), 2)
+        self.assertIs(form_classes[0], form_classes[1])
+
     def test_create_view_with_invalid(self):
         # Given the create_view
         view = reverse('test_app.views.create_form')
@@ -0,0 +1,216 @@
+"""Response caching helpers.
+
+These  are used by *generic.template_view*  (and the decorators built on
+it) but can also be used on their own by third-party view decorators.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+from django import http
+from django.core.cache import caches
+from django.db import connections
+from django.utils.cache import patch_cache_control
+from django.utils.encoding import force_bytes
+from django.utils.http import http_date, quote_etag
+
+__all__ = ('view_cache_key', 'coalesce', 'cached_response',
+           'get_cached_response', 'headers_only')
+
+COALESCE_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def view_cache_key(request, prefix, method=None):
+    """Return the cache key for *request* to the view named *prefix*.
+
+    The key is made of the *prefix* (usually the dotted name of the view
+    function),  the request  method  (or *method*)  and  a hash  of  the
+    absolute request URI.
+    """
+    url = hashlib.md5(force_bytes(request.build_absolute_uri()))
+    return 'view_accessories.%s.%s.%s' % (prefix, method or request.method,
+                                          url.hexdigest())
+
+
+def coalesce(key, compute, cache_alias=None, timeout=COALESCE_TIMEOUT):
+    """Call *compute* once for all concurrent callers sharing *key*.
+
+    The first caller (the "leader")  calls *compute*, which shall return
+    an  HttpResponse.   Callers  arriving  while  the  leader  is  still
+    computing  wait for  it and  get a copy  of its  response instead of
+    computing  their own.  If  the leader  fails  or takes  longer  than
+    *timeout*   seconds   then   the   waiting  callers  call  *compute*
+    themselves. So they do if the response is streamed, since a streamed
+    response cannot be copied.
+
+    Coordination is in-process. If *cache_alias* is given then the cache
+    backend by that name is also used as a lock so that callers in other
+    processes sharing the cache coalesce as well.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        flight.done.wait(timeout)
+        if flight.response is None or flight.response.streaming:
+            return compute()
+        return _copy_response(flight.response)
+
+    try:
+        if cache_alias:
+            flight.response = _coalesce_in_cache(key, compute,
+                                                 caches[cache_alias], timeout)
+        else:
+            flight.response = compute()
+        return flight.response
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def cached_response(key, compute, cache_alias='default', timeout=60,
+                    stale=0):
+    """Return the cached response for *key*, calling *compute* on a miss.
+
+    *compute* shall return an HttpResponse.  Successful (200)  responses
+    are cached for *timeout* seconds (the "soft" TTL).  After that,  and
+    for  another *stale* seconds  (up to the "hard" TTL),  the now-stale
+    response  is still returned while  a single background thread  calls
+    *compute*   again  and  refreshes  the  cache,   as  with  the  HTTP
+    *stale-while-revalidate*  Cache-Control extension.  Cached responses
+    get a matching Cache-Control header.
+    """
+    cache = caches[cache_alias]
+    entry = cache.get(key)
+    if entry is not None:
+        expires, response = entry
+        remaining = expires - time.time()
+        if remaining < 0 and stale:
+            if cache.add('%s.revalidate' % key, 1, stale):
+                thread = threading.Thread(
+                    target=_revalidate,
+                    args=(key, compute, cache, timeout, stale))
+                thread.daemon = True
+                thread.start()
+        if remaining >= 0 or stale:
+            _patch_cache_control(response, max(int(remaining), 0), stale)
+            return response
+
+    response = compute()
+    _store(key, response, cache, timeout, stale)
+    return response
+
+
+def get_cached_response(key, cache_alias='default'):
+    """Return the response cached by *cached_response* for *key* or None.
+
+    Stale responses are returned too, but are never revalidated.
+    """
+    entry = caches[cache_alias].get(key)
+    if entry is None:
+        return None
+    return entry[1]
+
+
+def headers_only(response):
+    """Return a copy of *response* with its headers but without a body.
+
+    The copy's Content-Length is that of *response*. This is used to answer
+    HEAD requests.
+    """
+    head = http.HttpResponse(status=response.status_code)
+    for header, value in response.items():
+        head[header] = value
+    head['Content-Length'] = str(len(response.content))
+    return head
+
+
+def _patch_cache_control(response, max_age, stale):
+    if stale:
+        patch_cache_control(response, max_age=max_age,
+                            stale_while_revalidate=stale)
+    else:
+        patch_cache_control(response, max_age=max_age)
+
+
+def _store(key, response, cache, timeout, stale):
+    if response.status_code == 200 and not response.cookies:
+        _patch_cache_control(response, timeout, stale)
+        if not response.has_header('ETag'):
+            response['ETag'] = quote_etag(
+                hashlib.md5(response.content).hexdigest())
+        if not response.has_header('Last-Modified'):
+            response['Last-Modified'] = http_date()
+        cache.set(key, (time.time() + timeout, response), timeout + stale)
+
+
+def _revalidate(key, compute, cache, timeout, stale):
+    try:
+        _store(key, compute(), cache, timeout, stale)
+    except Exception:
+        logger.exception('Error revalidating %s', key)
+    finally:
+        cache.delete('%s.revalidate' % key)
+        connections.close_all()
+
+
+class _Flight(object):
+    __slots__ = ('done', 'response')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+
+
+def _coalesce_in_cache(key, compute, cache, timeout):
+    lock_key = '%s.lock' % key
+    token = uuid.uuid4().hex
+    deadline = time.time() + timeout
+
+    while True:
+        if cache.add(lock_key, token, timeout):
+            try:
+                response = compute()
+                cache.set('%s.%s' % (key, token), response, timeout)
+                return response
+            finally:
+                cache.delete(lock_key)
+
+        leader = cache.get(lock_key)
+        while leader is not None and time.time() < deadline:
+            response = cache.get('%s.%s' % (key, leader))
+            if response is not None:
+                return response
+            time.sleep(POLL_INTERVAL)
+            if cache.get(lock_key) != leader:
+                response = cache.get('%s.%s' % (key, leader))
+                if response is not None:
+                    return response
+                break
+
+        if time.time() >= deadline:
+            return compute()
+
+
+def _copy_response(response):
+    copy = http.HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        copy[header] = value
+    for name, morsel in response.cookies.items():
+        copy.cookies[name] = morsel.value
+        copy.cookies[name].update(morsel)
+    return copy
@@ -0,0 +1,412 @@
+"""Database routing for the view decorators.
+
+The list,  detail and edit decorators take a *using* argument.  If it is
+None  (the default)  then queries  go wherever Django's database routers
+send them. If it is a database alias then all of the decorator's queries
+use that database. If it is "auto" then reads go to a replica and writes
+go to the primary ("default") database, as follows.
+
+Safe  (GET and HEAD)  requests read from one  of the databases listed in
+the VIEW_ACCESSORIES_REPLICAS setting (chosen at random,  or the primary
+if  the setting  is empty).  Other requests read  from and  write to the
+primary.  After  a  write the  client  is "stuck"  to  the  primary  for
+VIEW_ACCESSORIES_STICKY_SECONDS seconds (5 by default)  so that it reads
+its own writes, e.g. after the redirect following a POST, even while the
+replicas  lag behind.  The stickiness is a cookie (or a session key when
+the  view does not return a response,  e.g.  when  *template_view* is on
+top).
+
+Models  partitioned across databases by key are supported by the *shard*
+argument of the decorators: a function that takes the lookup value (e.g.
+the  "id" URL argument)  and returns the alias of the database it is on.
+Lookups  and writes of the instance then use that  database.  List views
+without  a shard  key fan  out across all  the *shards*  (by default the
+aliases  in the VIEW_ACCESSORIES_SHARDS setting)  and merge the  results
+(see *MergedQuerySet*). Replicas are copies of the primary,  not shards,
+and cannot be among them.
+"""
+from __future__ import unicode_literals
+
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.forms.models import BaseModelForm
+from django.http.response import HttpResponseBase
+
+__all__ = ('AUTO', 'db_for_read', 'db_for_write', 'read_queryset',
+           'save_form', 'stick', 'is_sticky', 'lookup_queryset',
+           'shard_queryset', 'MergedQuerySet', 'execute_wrapper')
+
+AUTO = 'auto'
+SAFE_METHODS = ('GET', 'HEAD')
+STICKY_COOKIE = 'view_accessories_primary'
+
+
+def db_for_read(request, using):
+    """Return the database alias *request* shall read from (or None)."""
+    if using != AUTO:
+        return using
+    if request.method not in SAFE_METHODS or is_sticky(request):
+        return DEFAULT_DB_ALIAS
+    replicas = getattr(settings, 'VIEW_ACCESSORIES_REPLICAS', ())
+    if not replicas:
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+def db_for_write(request, using):
+    """Return the database alias *request* shall write to (or None)."""
+    if using == AUTO:
+        return DEFAULT_DB_ALIAS
+    return using
+
+
+def read_queryset(request, queryset, using):
+    """Return *queryset* using the database *request* shall read from.
+
+    *queryset*  can also be a model or a manager,  and is returned as is
+    if *using* is None.
+    """
+    alias = db_for_read(request, using)
+    if alias is None:
+        return queryset
+    if hasattr(queryset, '_default_manager'):
+        queryset = queryset._default_manager
+    return queryset.using(alias)
+
+
+def save_form(form, alias):
+    """Save *form* to the database *alias* and return what it saved.
+
+    Only model forms can be routed:  other forms just get their *save()*
+    called.
+    """
+    if alias is None or not isinstance(form, BaseModelForm):
+        return form.save()
+    obj = form.save(commit=False)
+    obj.save(using=alias)
+    form.save_m2m()
+    return obj
+
+
+def stick(request, response):
+    """Stick the client of *request* to the primary database for a while.
+
+    The  marker is  set as  a cookie  on *response* if it is a response,
+    else in the request's session if there is one.
+    """
+    seconds = getattr(settings, 'VIEW_ACCESSORIES_STICKY_SECONDS', 5)
+    if isinstance(response, HttpResponseBase):
+        response.set_cookie(STICKY_COOKIE, '1', max_age=seconds)
+    elif hasattr(request, 'session'):
+        request.session[STICKY_COOKIE] = time.time() + seconds
+
+
+def is_sticky(request):
+    """Return whether the client of *request* is stuck to the primary."""
+    if STICKY_COOKIE in request.COOKIES:
+        return True
+    session = getattr(request, 'session', None)
+    if session is None:
+        return False
+    return session.get(STICKY_COOKIE, 0) > time.time()
+
+
+def lookup_queryset(request, model, using, shard=None, lookup=None):
+    """Return the queryset to look up the *model* instance *lookup* in.
+
+    If *shard* is given then it is called with *lookup* and shall return
+    the alias of the database the instance is on.  Otherwise this is the
+    same as *read_queryset*.
+    """
+    if shard is not None:
+        return model._default_manager.using(shard(lookup))
+    return read_queryset(request, model._default_manager.all(), using)
+
+
+def shard_queryset(queryset, shard, key=None, shards=None):
+    """Return *queryset* routed to the shard(s) it shall read from.
+
+    If   *key*  is  not   None  then  the  queryset  uses  the  database
+    *shard(key)*.  Otherwise it is a *MergedQuerySet* over all  *shards*
+    (or the VIEW_ACCESSORIES_SHARDS setting if *shards* is None). Raises
+    *ImproperlyConfigured* if there are no shards,  or if any of them is
+    one of the VIEW_ACCESSORIES_REPLICAS.
+    """
+    if hasattr(queryset, '_default_manager'):
+        queryset = queryset._default_manager.all()
+    if key is not None:
+        return queryset.using(shard(key))
+    return MergedQuerySet(queryset, _shards(shards))
+
+
+def _shards(shards):
+    if shards is None:
+        shards = getattr(settings, 'VIEW_ACCESSORIES_SHARDS', ())
+    if not shards:
+        raise ImproperlyConfigured(
+            'No shards to fan out across: pass shards or set '
+            'VIEW_ACCESSORIES_SHARDS')
+    replicas = getattr(settings, 'VIEW_ACCESSORIES_REPLICAS', ())
+    for alias in shards:
+        if alias in replicas:
+            # Its rows are the primary's, and would be listed twice
+            raise ImproperlyConfigured(
+                'The replica %r cannot be a shard' % alias)
+    return shards
+
+
+class MergedQuerySet(object):
+    """A queryset fanned out across several databases.
+
+    This  supports what the  list  view decorators and pagination  need:
+    iteration,  slicing,  *count()*, *exists()* and the chaining methods
+    below.  Each database is queried separately and the results are then
+    merged  in  the  order  of  the  queryset's  *order_by()*  (or,   if
+    unordered, just concatenated in the order of *aliases*).
+
+    Slicing fetches at most the end of the slice from each database,  so
+    deep pages get expensive,  as with any fan-out. When ordering values
+    or values_list rows the ordering fields must be among the values, or
+    *ImproperlyConfigured* is raised.
+    """
+    def __init__(self, queryset, aliases):
+        self.queryset = queryset
+        self.aliases = tuple(aliases)
+        self._result_cache = None
+
+    @property
+    def model(self):
+        return self.queryset.model
+
+    @property
+    def ordered(self):
+        return self.queryset.ordered
+
+    def _chain(self, method, *args, **kwargs):
+        return MergedQuerySet(
+            getattr(self.queryset, method)(*args, **kwargs), self.aliases)
+
+    def _clone(self):
+        return self._chain('all')
+
+    def all(self):
+        return self._chain('all')
+
+    def filter(self, *args, **kwargs):
+        return self._chain('filter', *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._chain('exclude', *args, **kwargs)
+
+    def order_by(self, *fields):
+        return self._chain('order_by', *fields)
+
+    def values(self, *fields):
+        return self._chain('values', *fields)
+
+    def values_list(self, *fields, **kwargs):
+        return self._chain('values_list', *fields, **kwargs)
+
+    def using(self, alias):
+        return self.queryset.using(alias)
+
+    def count(self):
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        return sum(self.queryset.using(alias).count()
+                   for alias in self.aliases)
+
+    def exists(self):
+        return any(self.queryset.using(alias).exists()
+                   for alias in self.aliases)
+
+    def iterator(self):
+        return iter(self._fetch(None))
+
+    def __iter__(self):
+        return iter(self._results())
+
+    def __len__(self):
+        return len(self._results())
+
+    def __bool__(self):
+        return self.exists()
+
+    __nonzero__ = __bool__  # Python 2
+
+    def __getitem__(self, index):
+        if self._result_cache is not None:
+            return self._result_cache[index]
+        if isinstance(index, slice):
+            if index.step or (index.start or 0) < 0 or (
+                    index.stop is not None and index.stop < 0):
+                return self._results()[index]
+            return self._fetch(index.stop)[index.start:]
+        return self._fetch(index + 1)[index]
+
+    def __repr__(self):
+        return '<MergedQuerySet on %s>' % ', '.join(self.aliases)
+
+    def _results(self):
+        if self._result_cache is None:
+            self._result_cache = self._fetch(None)
+        return self._result_cache
+
+    def _fetch(self, stop):
+        # Made first so that a bad ordering fails before any query runs
+        keys = [(self._sort_key(field.lstrip('-')), field.startswith('-'))
+                for field in self._ordering()]
+        rows = []
+        for alias in self.aliases:
+            queryset = self.queryset.using(alias)
+            if stop is not None:
+                queryset = queryset[:stop]
+            rows.extend(queryset)
+        # Stable sorts from the last ordering field to the first
+        for key, descending in reversed(keys):
+            rows.sort(key=key, reverse=descending)
+        return rows if stop is None else rows[:stop]
+
+    def _ordering(self):
+        query = self.queryset.query
+        if query.order_by:
+            return [field for field in query.order_by if field != '?']
+        if query.default_ordering:
+            return list(self.model._meta.ordering)
+        return []
+
+    def _sort_key(self, field):
+        kind, names = _row_shape(self.queryset)
+        if kind == _MODELS:
+            return lambda row: getattr(row, field)
+        if field == 'pk':
+            field = self.model._meta.pk.attname
+        if field not in names:
+            raise ImproperlyConfigured(
+                "Cannot merge rows ordered by %r: it is not one of the "
+                "values (%s)" % (field, ', '.join(names)))
+        if kind == _FLAT:
+            return lambda row: row
+        if kind == _DICTS:
+            return lambda row: row[field]
+        index = names.index(field)
+        return lambda row: row[index]
+
+
+# What the rows of a queryset are
+_MODELS, _DICTS, _TUPLES, _FLAT = range(4)
+
+
+def _row_shape(queryset):
+    """Return the kind of rows *queryset* yields and their value names."""
+    iterable = getattr(queryset, '_iterable_class', None)  # Django >= 1.9
+    if iterable is not None:
+        kind = _ROW_KINDS.get(iterable.__name__, _MODELS)
+    elif hasattr(queryset, 'flat'):
+        kind = _FLAT if queryset.flat else _TUPLES
+    elif hasattr(queryset, '_fields'):
+        kind = _DICTS
+    else:
+        kind = _MODELS
+    if kind == _MODELS:
+        return kind, []
+
+    query = queryset.query
+    names = list(queryset._fields or [
+        field.attname for field in queryset.model._meta.concrete_fields])
+    names.extend(name for name in list(query.extra_select) +
+                 list(query.annotation_select) if name not in names)
+    return kind, names
+
+
+_ROW_KINDS = {
+    'ValuesIterable': _DICTS,
+    'ValuesListIterable': _TUPLES,
+    'NamedValuesListIterable': _TUPLES,
+    'FlatValuesListIterable': _FLAT,
+}
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """Install *wrapper* on all database connections of this thread.
+
+    This   is  Django's  *connection.execute_wrapper()*  (see  "Database
+    instrumentation"  in the Django documentation)  for all databases at
+    once.  *wrapper* is called as *wrapper(execute, sql,  params,  many,
+    context)* for every query and shall call *execute(sql, params, many,
+    context)*.  On Django versions without execute wrappers the  cursors
+    are wrapped instead, to the same effect.
+    """
+    uninstalls = [_install_wrapper(connections[alias], wrapper)
+                  for alias in connections]
+    try:
+        yield
+    finally:
+        for uninstall in reversed(uninstalls):
+            uninstall()
+
+
+def _install_wrapper(connection, wrapper):
+    if hasattr(connection, 'execute_wrappers'):  # Django >= 2.0
+        connection.execute_wrappers.append(wrapper)
+        return lambda: connection.execute_wrappers.remove(wrapper)
+
+    saved = {}
+    for name in ('make_cursor', 'make_debug_cursor'):
+        if name in connection.__dict__:
+            saved[name] = connection.__dict__[name]
+        setattr(connection, name,
+                _cursor_maker(getattr(connection, name), wrapper, connection))
+
+    def uninstall():
+        for name in ('make_cursor', 'make_debug_cursor'):
+            if name in saved:
+                setattr(connection, name, saved[name])
+            else:
+                delattr(connection, name)
+    return uninstall
+
+
+def _cursor_maker(make_cursor, wrapper, connection):
+    return lambda cursor: _WrappedCursor(make_cursor(cursor), wrapper,
+                                         connection)
+
+
+class _WrappedCursor(object):
+    """A cursor calling an execute wrapper, for Django < 2.0."""
+    def __init__(self, cursor, wrapper, connection):
+        self.cursor = cursor
+        self.wrapper = wrapper
+        self.connection = connection
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def execute(self, sql, params=None):
+        return self._execute(sql, params, False)
+
+    def executemany(self, sql, param_list):
+        return self._execute(sql, param_list, True)
+
+    def _execute(self, sql, params, many):
+        def execute(sql, params, many, context):
+            if many:
+                return self.cursor.executemany(sql, params)
+            return self.cursor.execute(sql, params)
+        context = {'connection': self.connection, 'cursor': self}
+        return self.wrapper(execute, sql, params, many, context)
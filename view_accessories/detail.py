@@ -7,13 +7,19 @@ from __future__ import unicode_literals
 from functools import wraps
 
 from django.shortcuts import get_object_or_404
+from django.utils.functional import SimpleLazyObject
 
-from .generic import template_view, view
+from .db import lookup_queryset
+from .generic import template_layer, view
+from .index import LookupIndex
+from .registry import register
 
-__all__ = ('detail_view', 'template_detail_view')
+__all__ = ('detail_view', 'template_detail_view', 'lazy_object_or_404')
 
 
-def detail_view(model, field='pk', kwarg='id', methods=None):
+def detail_view(model, field='pk', kwarg='id', methods=None, using=None,
+                shard=None, index=None, max_concurrency=None,
+                query_budget=None, statement_timeout=None, route=None):
     """A detail view.
 
     Note  unlike Django's  DetailView this  does not  return a  rendered
@@ -30,6 +36,11 @@ def detail_view(model, field='pk', kwarg='id', methods=None):
     If  *field* is  specified, then  the model  will be  queried by  the
     specified field instead of the default primary key.
 
+    If  *index* is given then the primary keys  of the objects looked up
+    by  *field* are remembered  in  it,  an *index.LookupIndex*  (or  if
+    *index* is True, one kept in memory), and the objects are afterwards
+    looked up by their primary key (see *view_accessories.index*).
+
     A quick example::
 
         from .models import Book
@@ -42,23 +53,51 @@ def detail_view(model, field='pk', kwarg='id', methods=None):
 
         (r'^book/(?P<id>\d+)/', 'some_app.views.book_detail')
 
-    In addition it accepts the *methods* argument as all view decorators.
+    The  object is passed lazily (see *lazy_object_or_404*):  it is only
+    queried when the decorated view first uses it,  so views that return
+    early (e.g. from a cache) never query the database.
+
+    If  *using* is given  then the decorator's queries use that database
+    (or,  if  "auto",  a  replica  for  safe  requests and  the  primary
+    otherwise). See *view_accessories.db*.
+
+    If  *shard* is  given then  it is called  with the  lookup value and
+    shall  return the  alias of  the  database the  object  is on  (this
+    overrides *using*).
+
+    In   addition   it   accepts   the   *methods*,   *max_concurrency*,
+    *query_budget*,  *statement_timeout*  and  *route*  arguments as all
+    view decorators.
     """
     def decorate(func):
+        my_index = LookupIndex(model, field) if index is True else index
+
         @wraps(func)
         def wrapper(request, *args, **kwargs):
             lookup = kwargs.pop(kwarg)
-            obj = get_object_or_404(model, **{field: lookup})
-            obj_name = obj._meta.model_name
-            kwargs[obj_name] = obj
-            return view(methods=methods)(func)(request, *args, **kwargs)
-        return wrapper
+            queryset = lookup_queryset(request, model, using, shard, lookup)
+            if my_index is None:
+                obj = lazy_object_or_404(queryset, **{field: lookup})
+            else:
+                obj = SimpleLazyObject(
+                    lambda: my_index.get_or_404(queryset, lookup))
+            kwargs[model._meta.model_name] = obj
+            return func(request, *args, **kwargs)
+        myview = view(wrapper, methods=methods,
+                      max_concurrency=max_concurrency,
+                      query_budget=query_budget,
+                      statement_timeout=statement_timeout, route=route)
+        return register(myview, decorator='detail_view', wrapped=func,
+                        model=model, field=field)
     return decorate
 
 
 def template_detail_view(model, field='pk', kwarg='id', template_name=None,
                          content_type=None, template_name_suffix='_detail',
-                         methods=None):
+                         methods=None, context_processors=None, using=None,
+                         shard=None, index=None, max_concurrency=None,
+                         query_budget=None, statement_timeout=None,
+                         route=None):
     """A detail view that renders a template.
 
     This   is  probably   the   view  decorator   that   you  want.   It
@@ -71,12 +110,14 @@ def template_detail_view(model, field='pk', kwarg='id', template_name=None,
     *template_name_suffix* is  passed instead, it will  default to, e.g.
     **some_app/book_customsuffix.html**.
 
-    The   *model*   argument   is   the  same   as   in   *detail_view*.
-    The   *content_type*   argument   is   self-explanatory   (same   as
-    *generic.template_view*).
+    The *model*, *using*,  *shard* and *index* arguments are the same as
+    in  *detail_view*.  The  *content_type* argument is self-explanatory
+    (same as *generic.template_view*).
 
-    In  addition  it   accepts  the  *methods*  argument   as  all  view
-    decorators.
+    In   addition   it   accepts   the   *methods*,   *max_concurrency*,
+    *query_budget*,  *statement_timeout*  and  *route*  arguments as all
+    view   decorators   and   the   *context_processors*   argument   of
+    *generic.template_view*.
 
     A quick example::
 
@@ -86,23 +127,34 @@ def template_detail_view(model, field='pk', kwarg='id', template_name=None,
         def book_detail(request, book): pass
     """
     def decorate(func):
-        @wraps(func)
-        def wrapper(request, *args, **kwargs):
-            lookup = kwargs.pop(kwarg)
-            obj = get_object_or_404(model, **{field: lookup})
-            obj_name = obj._meta.model_name
-            kwargs[obj_name] = obj
-
-            my_template_name = template_name
-            if not my_template_name:
-                my_template_name = '%s/%s%s.html' % (
-                    obj._meta.app_label,
-                    obj._meta.model_name,
-                    template_name_suffix)
-
-            return template_view(
-                template_name=my_template_name,
-                content_type=content_type,
-                methods=methods)(func)(request, *args, **kwargs)
-        return wrapper
+        my_template_name = template_name
+        if not my_template_name:
+            my_template_name = '%s/%s%s.html' % (
+                model._meta.app_label,
+                model._meta.model_name,
+                template_name_suffix)
+
+        myview = template_layer(func, template_name=my_template_name,
+                                content_type=content_type,
+                                context_processors=context_processors)
+        return detail_view(model, field=field, kwarg=kwarg, methods=methods,
+                           using=using, shard=shard, index=index,
+                           max_concurrency=max_concurrency,
+                           query_budget=query_budget,
+                           statement_timeout=statement_timeout,
+                           route=route)(myview)
     return decorate
+
+
+def lazy_object_or_404(model, **lookup):
+    """Return a lazy *get_object_or_404(model, **lookup)*.
+
+    The returned object is a proxy for the model instance.  The database
+    is  only queried the first time the proxy is used,  and that is also
+    when  Http404  is  raised if  there  is  no  such  object.  As  with
+    *get_object_or_404*, *model* can also be a manager or a queryset.
+
+    This  is used by the detail and edit  view decorators but is exposed
+    because it can also be used by third-party view decorators.
+    """
+    return SimpleLazyObject(lambda: get_object_or_404(model, **lookup))
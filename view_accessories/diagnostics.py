@@ -0,0 +1,467 @@
+"""Diagnostics for decorated views.
+
+Slow requests
+-------------
+If  the  VIEW_ACCESSORIES_SLOW_REQUEST_THRESHOLD  setting is a number of
+seconds  then requests to  decorated views taking  longer than that  are
+logged,  as  a  warning  of the "view_accessories.slow_requests" logger,
+with  a structured  record  (the  *slow_request* attribute  of  the  log
+record) of:
+
+    "view": The dotted name of the view,
+    "decorators": The view's decorator chain, outermost first,
+    "method", "path": The request's method and path,
+    "args", "kwargs": The URL arguments, e.g. the lookup values,
+    "duration": The time taken by the view, in seconds,
+    "render_time": The time spent rendering templates, in seconds,
+    "queries": A list of {"alias", "sql", "duration"} or None.
+
+Recording  every SQL  statement is  not  free so  the  queries are  only
+captured  (with  an  execute  wrapper)   on  requests  that  were  armed
+beforehand:  a random VIEW_ACCESSORIES_SLOW_REQUEST_SAMPLE_RATE fraction
+(0     by    default)     of    all    requests,     and    the     next
+VIEW_ACCESSORIES_SLOW_REQUEST_ARM  requests  (5  by  default)  to a view
+after a slow,  uncaptured, request to it.  Other requests only pay for a
+clock  reading.  Intermittently slow views thus get their queries logged
+soon after their first slow request.
+
+Profiling
+---------
+If the VIEW_ACCESSORIES_PROFILE_DIR setting is a directory then requests
+to   decorated  views  can   be   profiled  with  cProfile:   a   random
+VIEW_ACCESSORIES_PROFILE_SAMPLE_RATE  fraction  (0 by default)  of them,
+and those with an X-View-Accessories-Profile header holding a token made
+by *profile_token* (e.g.  with "manage.py shell" on the server,  so that
+only  staff can  trigger  profiling).  The  profile  of each request  is
+written  to  a  file in  that directory  named  after the  view and  its
+decorator chain, e.g.::
+
+    myapp.views.book_detail.detail_view+template_view.1700000000.4242.7.prof
+
+in  the  format  given  by  the VIEW_ACCESSORIES_PROFILE_FORMAT setting:
+"pstats" (the default, to be read with the *pstats* module or tools such
+as snakeviz) or "collapsed", i.e. collapsed stacks for flamegraph.pl and
+compatible  tools.  cProfile does  not record whole stacks so the latter
+are  recorded by a profile function  in Python instead,  which slows the
+profiled request down more.
+
+Allocations
+-----------
+A random VIEW_ACCESSORIES_ALLOCATION_SAMPLE_RATE fraction (0 by default)
+of  requests to decorated views are traced with tracemalloc (on Python 3
+only):  the memory allocated during the request and not freed by its end
+(including the response) is its net retained memory. Each traced request
+is  logged,  as an info message  of  the  "view_accessories.allocations"
+logger, with a structured record (the *allocations* attribute of the log
+record) of:
+
+    "view": The dotted name of the view,
+    "decorators": The view's decorator chain, outermost first,
+    "retained": The net retained memory, in bytes,
+    "top": The VIEW_ACCESSORIES_ALLOCATION_TOP (10 by default) source
+           lines retaining the most memory, as {"file", "line", "size",
+           "count"} (size in bytes and count of memory blocks).
+
+tracemalloc  traces the whole process,  so in a multithreaded server the
+memory retained by requests running at the same time counts too, as does
+garbage in reference cycles that the garbage collector has not collected
+yet. If the VIEW_ACCESSORIES_ALLOCATION_COLLECT setting is true then the
+garbage  is collected at the end of each  traced request,  which takes a
+while. Tracing itself never fails a request: errors are logged instead.
+
+The totals per view are kept too (see *allocation_stats*).  A view whose
+requests keep retaining memory leaks. The "trace_allocations" management
+command replays requests to a URL, one at a time and collecting garbage,
+and reports them.
+"""
+from __future__ import unicode_literals
+
+import cProfile
+import gc
+import itertools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+
+from .db import execute_wrapper
+from .registry import decorator_chain
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+__all__ = ('watch', 'record_render_time', 'profile_token',
+           'allocation_stats', 'reset_allocation_stats')
+
+WATCH_ATTRIBUTE = '_view_accessories_watch'
+PROFILE_HEADER = 'HTTP_X_VIEW_ACCESSORIES_PROFILE'
+PROFILE_SALT = 'view_accessories.profile'
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('view_accessories.slow_requests')
+allocations_logger = logging.getLogger('view_accessories.allocations')
+
+_armed = {}
+_armed_lock = threading.Lock()
+_profile_counter = itertools.count()
+_clock = getattr(time, 'perf_counter', time.time)
+_allocations = {}
+_allocations_lock = threading.Lock()
+_tracers = 0  # traced requests running
+_started_tracing = False
+_tracing_lock = threading.Lock()
+
+
+def watch(view_func, name, request, args, kwargs, call):
+    """Return *call()*, logging the request if it is slow.
+
+    The request is also profiled, or its allocations traced, if it is to
+    be (see the module's docs).
+    This  is  called  by  *generic.view*  for every  request.  Only  the
+    outermost decorated view of a request is watched.
+    """
+    if hasattr(request, WATCH_ATTRIBUTE):
+        return call()
+    threshold = getattr(settings, 'VIEW_ACCESSORIES_SLOW_REQUEST_THRESHOLD',
+                        None)
+    profile = _should_profile(name, request)
+    trace = _should_trace()
+    if threshold is None and not profile and not trace:
+        return call()
+
+    capture = threshold is not None and _arm(name)
+    state = _Watch(capture)
+    if capture:
+        call = _capturing(state, call)
+    if trace:
+        call = _tracing(view_func, name, call)
+    if profile:
+        call = _profiling(view_func, name, call)
+    setattr(request, WATCH_ATTRIBUTE, state)
+    start = time.time()
+    try:
+        return call()
+    finally:
+        duration = time.time() - start
+        delattr(request, WATCH_ATTRIBUTE)
+        if threshold is not None and duration > threshold:
+            _log_slow_request(view_func, name, request, args, kwargs,
+                              duration, state)
+
+
+def record_render_time(request, seconds):
+    """Add *seconds* to the template render time of a watched *request*."""
+    state = getattr(request, WATCH_ATTRIBUTE, None)
+    if state is not None:
+        state.render_time += seconds
+
+
+def profile_token(view_name=None):
+    """Return a token to trigger the profiling of requests.
+
+    Requests  with  the token as their X-View-Accessories-Profile header
+    are profiled (if VIEW_ACCESSORIES_PROFILE_DIR is set) for as long as
+    the  token is valid:  VIEW_ACCESSORIES_PROFILE_TOKEN_MAX_AGE seconds
+    (an hour by default). If *view_name* (the dotted name of a view)  is
+    given then only requests to that view are profiled.
+    """
+    return signing.dumps(view_name, salt=PROFILE_SALT)
+
+
+def allocation_stats(top=None):
+    """Return the allocation totals of the views traced so far.
+
+    The  result is a dictionary whose  keys are the  views' dotted names
+    and   whose  values  are  dictionaries   of  the  number  of  traced
+    "requests", the total "retained" memory, in bytes, and the *top* (by
+    default VIEW_ACCESSORIES_ALLOCATION_TOP)  source lines retaining the
+    most  memory over all  those requests,  as  a list of  ("file:line",
+    bytes) pairs.
+    """
+    if top is None:
+        top = getattr(settings, 'VIEW_ACCESSORIES_ALLOCATION_TOP', 10)
+    result = {}
+    with _allocations_lock:
+        for name, totals in _allocations.items():
+            sites = sorted(totals['sites'].items(),
+                           key=lambda site: -abs(site[1]))
+            result[name] = {
+                'requests': totals['requests'],
+                'retained': totals['retained'],
+                'top': sites[:top],
+            }
+    return result
+
+
+def reset_allocation_stats():
+    """Forget the allocation totals of all views."""
+    with _allocations_lock:
+        _allocations.clear()
+
+
+class _Watch(object):
+    __slots__ = ('queries', 'render_time')
+
+    def __init__(self, capture):
+        self.queries = [] if capture else None
+        self.render_time = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.time()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'duration': time.time() - start,
+            })
+
+
+def _capturing(state, call):
+    def capturing():
+        with execute_wrapper(state.record_query):
+            return call()
+    return capturing
+
+
+def _profiling(view_func, name, call):
+    def profiling():
+        output = getattr(settings, 'VIEW_ACCESSORIES_PROFILE_FORMAT', 'pstats')
+        if output == 'pstats':
+            profiler = cProfile.Profile()
+        else:
+            profiler = _StackProfiler()
+        try:
+            return profiler.runcall(call)
+        finally:
+            _write_profile(profiler, view_func, name)
+    return profiling
+
+
+def _tracing(view_func, name, call):
+    def tracing():
+        # Tracing must never break the request
+        try:
+            _start_tracing()
+        except Exception:
+            logger.exception('Could not trace the allocations of %s', name)
+            return call()
+        try:
+            before = tracemalloc.take_snapshot()
+        except Exception:
+            logger.exception('Could not trace the allocations of %s', name)
+            _stop_tracing()
+            return call()
+        try:
+            return call()
+        finally:
+            try:
+                if getattr(settings, 'VIEW_ACCESSORIES_ALLOCATION_COLLECT',
+                           False):
+                    gc.collect()
+                after = tracemalloc.take_snapshot()
+                _record_allocations(view_func, name, before, after)
+            except Exception:
+                logger.exception('Could not trace the allocations of %s',
+                                 name)
+            finally:
+                _stop_tracing()
+    return tracing
+
+
+def _start_tracing():
+    """Start tracemalloc, unless already tracing, for a traced request."""
+    global _tracers, _started_tracing
+    with _tracing_lock:
+        if not _tracers:
+            _started_tracing = not tracemalloc.is_tracing()
+            if _started_tracing:
+                tracemalloc.start()
+        _tracers += 1
+
+
+def _stop_tracing():
+    """Stop tracemalloc after the last traced request, if we started it."""
+    global _tracers
+    with _tracing_lock:
+        _tracers -= 1
+        if not _tracers and _started_tracing:
+            tracemalloc.stop()
+
+
+def _should_trace():
+    """Return whether to trace the allocations of this request."""
+    if tracemalloc is None:
+        return False
+    rate = getattr(settings, 'VIEW_ACCESSORIES_ALLOCATION_SAMPLE_RATE', 0)
+    return bool(rate) and random.random() < rate
+
+
+def _record_allocations(view_func, name, before, after):
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__),
+              tracemalloc.Filter(False, __file__))
+    differences = after.filter_traces(ignore).compare_to(
+        before.filter_traces(ignore), 'lineno')
+    retained = sum(difference.size_diff for difference in differences)
+    top = getattr(settings, 'VIEW_ACCESSORIES_ALLOCATION_TOP', 10)
+    sites = []
+    for difference in differences[:top]:
+        frame = difference.traceback[0]
+        sites.append({
+            'file': frame.filename,
+            'line': frame.lineno,
+            'size': difference.size_diff,
+            'count': difference.count_diff,
+        })
+
+    with _allocations_lock:
+        totals = _allocations.setdefault(
+            name, {'requests': 0, 'retained': 0, 'sites': {}})
+        totals['requests'] += 1
+        totals['retained'] += retained
+        for difference in differences:
+            frame = difference.traceback[0]
+            site = '%s:%d' % (frame.filename, frame.lineno)
+            totals['sites'][site] = (totals['sites'].get(site, 0) +
+                                     difference.size_diff)
+
+    record = {
+        'view': name,
+        'decorators': decorator_chain(view_func),
+        'retained': retained,
+        'top': sites,
+    }
+    allocations_logger.info('Request to %s retained %d bytes', name,
+                            retained, extra={'allocations': record})
+
+
+def _should_profile(name, request):
+    """Return whether to profile this request to *name*."""
+    if not getattr(settings, 'VIEW_ACCESSORIES_PROFILE_DIR', None):
+        return False
+    rate = getattr(settings, 'VIEW_ACCESSORIES_PROFILE_SAMPLE_RATE', 0)
+    if rate and random.random() < rate:
+        return True
+    token = request.META.get(PROFILE_HEADER)
+    if not token:
+        return False
+    max_age = getattr(settings, 'VIEW_ACCESSORIES_PROFILE_TOKEN_MAX_AGE',
+                      3600)
+    try:
+        view_name = signing.loads(token, salt=PROFILE_SALT, max_age=max_age)
+    except signing.BadSignature:
+        logger.warning('Bad profiling token for %s', name)
+        return False
+    return view_name is None or view_name == name
+
+
+def _write_profile(profiler, view_func, name):
+    directory = settings.VIEW_ACCESSORIES_PROFILE_DIR
+    collapsed = isinstance(profiler, _StackProfiler)
+    chain = '+'.join(decorator_chain(view_func))
+    filename = '%s.%s.%d.%d.%d.%s' % (name, chain, time.time(), os.getpid(),
+                                      next(_profile_counter),
+                                      'collapsed' if collapsed else 'prof')
+    path = os.path.join(directory, filename)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        if collapsed:
+            profiler.dump_stacks(path, '%s [%s]' % (name, chain))
+        else:
+            profiler.dump_stats(path)
+    except (IOError, OSError):
+        logger.exception('Could not write the profile of %s to %s', name,
+                         path)
+    else:
+        logger.info('Wrote the profile of %s to %s', name, path)
+
+
+class _StackProfiler(object):
+    """Record the time spent in each call stack, for collapsed stacks."""
+    def __init__(self):
+        self.times = {}
+        self._stack = []
+
+    def runcall(self, func):
+        sys.setprofile(self._event)
+        try:
+            return func()
+        finally:
+            sys.setprofile(None)
+
+    def dump_stacks(self, path, root):
+        """Write the stacks, rooted at the frame *root*, to *path*."""
+        with open(path, 'w') as collapsed:
+            for stack, seconds in sorted(self.times.items()):
+                microseconds = int(seconds * 1e6)
+                if microseconds:
+                    collapsed.write('%s %d\n' % (
+                        ';'.join((root,) + stack), microseconds))
+
+    def _event(self, frame, event, arg):
+        now = _clock()
+        if event == 'call':
+            code = frame.f_code
+            self._stack.append([_frame(code.co_filename, code.co_firstlineno,
+                                       code.co_name), now, 0.0])
+        elif event == 'c_call':
+            self._stack.append(['<%s>' % arg.__name__, now, 0.0])
+        elif self._stack:  # a return from a call made while profiling
+            label, start, children = self._stack.pop()
+            elapsed = now - start
+            stack = tuple(entry[0] for entry in self._stack) + (label,)
+            self.times[stack] = self.times.get(stack, 0.0) + (
+                elapsed - children)
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+
+def _frame(filename, lineno, funcname):
+    label = '%s (%s:%d)' % (funcname, os.path.basename(filename), lineno)
+    return label.replace(';', ',')
+
+
+def _arm(name):
+    """Return whether to capture the queries of this request to *name*."""
+    rate = getattr(settings, 'VIEW_ACCESSORIES_SLOW_REQUEST_SAMPLE_RATE', 0)
+    if rate and random.random() < rate:
+        return True
+    if name not in _armed:  # the usual case, no need to lock
+        return False
+    with _armed_lock:
+        remaining = _armed.pop(name, 0)
+        if remaining > 1:
+            _armed[name] = remaining - 1
+        return remaining > 0
+
+
+def _log_slow_request(view_func, name, request, args, kwargs, duration,
+                      state):
+    if state.queries is None:
+        count = getattr(settings, 'VIEW_ACCESSORIES_SLOW_REQUEST_ARM', 5)
+        if count:
+            with _armed_lock:
+                _armed[name] = count
+
+    record = {
+        'view': name,
+        'decorators': decorator_chain(view_func),
+        'method': request.method,
+        'path': request.path,
+        'args': [repr(arg) for arg in args],
+        'kwargs': dict((key, repr(value)) for key, value in kwargs.items()),
+        'duration': duration,
+        'render_time': state.render_time,
+        'queries': state.queries,
+    }
+    slow_logger.warning('Slow request to %s: %.3f seconds', name, duration,
+                        extra={'slow_request': record})
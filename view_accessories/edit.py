@@ -2,11 +2,21 @@
 from functools import wraps
 
 from django.forms import models as model_forms
-from django.shortcuts import get_object_or_404, redirect
-from .generic import template_view, view
+from django.shortcuts import redirect
+from django.utils import six
+from django.utils.functional import SimpleLazyObject
 
+from .db import AUTO, db_for_write, lookup_queryset, save_form, stick
+from .detail import lazy_object_or_404
+from .generic import template_layer, view
+from .registry import register
 
-def form_view(form=None, success_url=None, methods=None):
+_form_classes = {}
+
+
+def form_view(form=None, success_url=None, methods=None, using=None,
+              max_concurrency=None, query_budget=None,
+              statement_timeout=None, route=None):
     """A form view.
 
     This decorator  takes one required  argument, *form* which  shall be
@@ -21,6 +31,10 @@ def form_view(form=None, success_url=None, methods=None):
     data, then the  view is executed, but the response  is redirected to
     *success_url*.
 
+    If *using* is given then the form is saved to that database (or,  if
+    "auto",  to the primary,  and the client then reads from the primary
+    for a while). See *view_accessories.db*.
+
     A quick example::
 
         from .forms import EntryForm
@@ -32,32 +46,19 @@ def form_view(form=None, success_url=None, methods=None):
                 process_data(form.cleaned_data)
     """
     def decorate(func):
-        @wraps(func)
-        def wrapper(request, *args, **kwargs):
-            if request.method == 'POST':
-                my_form = form(request.POST)
-            else:
-                my_form = form()
-
-            assert 'form' not in kwargs
-            kwargs['form'] = my_form
-
-            if request.method == 'POST':
-                valid = my_form.is_valid()
-                if valid and hasattr(form, 'save'):
-                    my_form.save()
-
-                response = view(func, methods=methods)(request, *args,
-                                                       **kwargs)
-                if success_url and valid:
-                    return redirect(success_url)
-                return response
-            return view(func, methods=methods)(request, *args, **kwargs)
-        return wrapper
+        wrapper = _form_wrapper(func, form, success_url, using)
+        myview = view(wrapper, methods=methods,
+                      max_concurrency=max_concurrency,
+                      query_budget=query_budget,
+                      statement_timeout=statement_timeout, route=route)
+        return register(myview, decorator='form_view', wrapped=func,
+                        form=form)
     return decorate
 
 
-def create_view(model, fields, success_url=None, methods=None):
+def create_view(model, fields, success_url=None, methods=None, using=None,
+                max_concurrency=None, query_budget=None,
+                statement_timeout=None, route=None):
     """A form_view for Models.
 
     This view  decorator works  much like  the *form_view*,  except that
@@ -68,7 +69,7 @@ def create_view(model, fields, success_url=None, methods=None):
     is POSTed  and is valid, then  the mode is saved  before calling the
     decorated view function.
 
-    *success_url* works just as in *form_view*.
+    *success_url* and *using* work just as in *form_view*.
 
     A quick example::
 
@@ -79,19 +80,29 @@ def create_view(model, fields, success_url=None, methods=None):
 
     """
     def decorate(func):
+        form_wrappers = []  # built on the first request, then reused
+
         @wraps(func)
         def wrapper(request, *args, **kwargs):
-            form_cls = model_forms.modelform_factory(model, fields=fields)
-
-            return form_view(form=form_cls, success_url=success_url,
-                             methods=methods)(func)(request, *args, **kwargs)
-        return wrapper
+            if not form_wrappers:
+                form_wrappers.append(_form_wrapper(
+                    func, model_form_class(model, fields), success_url,
+                    using))
+            return form_wrappers[0](request, *args, **kwargs)
+        myview = view(wrapper, methods=methods,
+                      max_concurrency=max_concurrency,
+                      query_budget=query_budget,
+                      statement_timeout=statement_timeout, route=route)
+        return register(myview, decorator='create_view', wrapped=func,
+                        model=model, fields=fields)
     return decorate
 
 
 def template_create_view(model, fields, template_name=None, content_type=None,
                          template_name_suffix='_create_form', success_url=None,
-                         methods=None):
+                         methods=None, context_processors=None, using=None,
+                         max_concurrency=None, query_budget=None,
+                         statement_timeout=None, route=None):
     """A create_view that renders a template.
 
     This is a  create_view decorated with a template view.  It takes the
@@ -105,26 +116,27 @@ def template_create_view(model, fields, template_name=None, content_type=None,
             pass
     """
     def decorate(func):
-        @wraps(func)
-        def wrapper(request, *args, **kwargs):
-            my_template_name = template_name
-            if not my_template_name:
-                my_template_name = '%s/%s%s.html' % (
-                    model._meta.app_label,
-                    model._meta.model_name,
-                    template_name_suffix)
-            myview = template_view(template_name=my_template_name,
-                                   content_type=content_type,
-                                   methods=methods)(func)
-            myview = create_view(model, fields, success_url=success_url,
-                                 methods=methods)(myview)
-            return myview(request, *args, **kwargs)
-        return wrapper
+        my_template_name = template_name
+        if not my_template_name:
+            my_template_name = '%s/%s%s.html' % (
+                model._meta.app_label,
+                model._meta.model_name,
+                template_name_suffix)
+        myview = template_layer(func, template_name=my_template_name,
+                                content_type=content_type,
+                                context_processors=context_processors)
+        return create_view(model, fields, success_url=success_url,
+                           methods=methods, using=using,
+                           max_concurrency=max_concurrency,
+                           query_budget=query_budget,
+                           statement_timeout=statement_timeout,
+                           route=route)(myview)
     return decorate
 
 
 def update_view(model, field='pk', kwarg='id', fields=None, success_url=None,
-                methods=None):
+                methods=None, using=None, shard=None, max_concurrency=None,
+                query_budget=None, statement_timeout=None, route=None):
     """A view to update a model.
 
     This decorator is a cross between a detail view and a form view. The
@@ -146,6 +158,11 @@ def update_view(model, field='pk', kwarg='id', fields=None, success_url=None,
     If  *field* is  specified, then  the model  will be  queried by  the
     specified field instead of the default primary key.
 
+    As with *detail_view* the model instance is passed lazily, and so is
+    the  form  of  a GET  request.  The  model  instance is  read as  in
+    *detail_view* and saved as in *form_view*, according to *using*,  or
+    to the database *shard* returns (see *detail_view*) if given.
+
     A quick example::
 
         @update_view(model=Widget, success_url='/')
@@ -162,32 +179,46 @@ def update_view(model, field='pk', kwarg='id', fields=None, success_url=None,
         @wraps(func)
         def wrapper(request, *args, **kwargs):
             lookup = kwargs.pop(kwarg)
-            obj = get_object_or_404(model, **{field: lookup})
-            obj_name = obj._meta.model_name
-            form_cls = model_forms.modelform_factory(model, fields=fields)
+            obj = lazy_object_or_404(
+                lookup_queryset(request, model, using, shard, lookup),
+                **{field: lookup})
+            obj_name = model._meta.model_name
+            form_cls = model_form_class(model, fields)
             if request.method == 'POST':
                 form = form_cls(request.POST, instance=obj)
                 if form.is_valid():
-                    form.save()
-                    obj = form.instance
+                    obj = save_form(form, _write_alias(request, using, shard,
+                                                       lookup))
             else:
-                form = form_cls(instance=obj)
+                # Built when first used, so that a view that doesn't use
+                # the form (or the instance) doesn't look the instance up
+                form = SimpleLazyObject(lambda: form_cls(instance=obj))
 
             kwargs['form'] = form
             kwargs[obj_name] = obj
 
-            response = view(methods=methods)(func)(request, *args, **kwargs)
-            if request.method == 'POST' and success_url and form.is_valid():
-                return redirect(success_url)
+            response = func(request, *args, **kwargs)
+            if request.method == 'POST' and form.is_valid():
+                if success_url:
+                    response = redirect(success_url)
+                if using == AUTO:
+                    stick(request, response)
             return response
-        return wrapper
+        myview = view(wrapper, methods=methods,
+                      max_concurrency=max_concurrency,
+                      query_budget=query_budget,
+                      statement_timeout=statement_timeout, route=route)
+        return register(myview, decorator='update_view', wrapped=func,
+                        model=model, field=field, fields=fields)
     return decorate
 
 
 def template_update_view(model, field='pk', kwarg='id', fields=None,
                          template_name=None, content_type=None,
                          template_name_suffix='_update_form', success_url=None,
-                         methods=None):
+                         methods=None, context_processors=None, using=None,
+                         shard=None, max_concurrency=None, query_budget=None,
+                         statement_timeout=None, route=None):
     """An update_view that renders a template.
 
     This is an update_view decorated with  a template view. It takes the
@@ -201,26 +232,28 @@ def template_update_view(model, field='pk', kwarg='id', fields=None,
             pass
     """
     def decorate(func):
-        @wraps(func)
-        def wrapper(request, *args, **kwargs):
-            my_template_name = template_name
-            if not my_template_name:
-                my_template_name = '%s/%s%s.html' % (
-                    model._meta.app_label,
-                    model._meta.model_name,
-                    template_name_suffix)
-            myview = template_view(template_name=my_template_name,
-                                   content_type=content_type,
-                                   methods=methods)(func)
-            myview = update_view(model=model, field=field, kwarg=kwarg,
-                                 fields=fields, success_url=success_url,
-                                 methods=methods)(myview)
-            return myview(request, *args, **kwargs)
-        return wrapper
+        my_template_name = template_name
+        if not my_template_name:
+            my_template_name = '%s/%s%s.html' % (
+                model._meta.app_label,
+                model._meta.model_name,
+                template_name_suffix)
+        myview = template_layer(func, template_name=my_template_name,
+                                content_type=content_type,
+                                context_processors=context_processors)
+        return update_view(model=model, field=field, kwarg=kwarg,
+                           fields=fields, success_url=success_url,
+                           methods=methods, using=using, shard=shard,
+                           max_concurrency=max_concurrency,
+                           query_budget=query_budget,
+                           statement_timeout=statement_timeout,
+                           route=route)(myview)
     return decorate
 
 
-def delete_view(model, field='pk', kwarg='id', success_url=None, methods=None):
+def delete_view(model, field='pk', kwarg='id', success_url=None, methods=None,
+                using=None, shard=None, max_concurrency=None,
+                query_budget=None, statement_timeout=None, route=None):
     """A view to delete a model.
 
     The  delete_view is  like the  detail_view,  except if  the view  is
@@ -243,6 +276,11 @@ def delete_view(model, field='pk', kwarg='id', success_url=None, methods=None):
     HTTP redirect  to the  success_url instead  of the  decorated view's
     response.
 
+    As with *detail_view* the model instance is passed lazily. The model
+    instance  is read as  in *detail_view* and deleted from the database
+    *form_view*  would save it  to,  according to  *using*,  or from the
+    database *shard* returns (see *detail_view*) if given.
+
     A quick example::
 
         @delete_view(model=Widget, success_url='/')
@@ -254,26 +292,37 @@ def delete_view(model, field='pk', kwarg='id', success_url=None, methods=None):
         @wraps(func)
         def wrapper(request, *args, **kwargs):
             lookup = kwargs.pop(kwarg)
-            obj = get_object_or_404(model, **{field: lookup})
-            obj_name = obj._meta.model_name
-            kwargs[obj_name] = obj
+            obj = lazy_object_or_404(
+                lookup_queryset(request, model, using, shard, lookup),
+                **{field: lookup})
+            kwargs[model._meta.model_name] = obj
 
-            response = view(methods=methods)(func)(request, *args, **kwargs)
+            response = func(request, *args, **kwargs)
 
             if request.method == 'POST':
                 # confirmed.  Delete
-                obj.delete()
+                obj.delete(using=_write_alias(request, using, shard, lookup))
                 if success_url:
-                    return redirect(success_url)
+                    response = redirect(success_url)
+                if using == AUTO:
+                    stick(request, response)
             return response
-        return wrapper
+        myview = view(wrapper, methods=methods,
+                      max_concurrency=max_concurrency,
+                      query_budget=query_budget,
+                      statement_timeout=statement_timeout, route=route)
+        return register(myview, decorator='delete_view', wrapped=func,
+                        model=model, field=field)
     return decorate
 
 
 def template_delete_view(model, field='pk', kwarg='id', template_name=None,
                          content_type=None,
                          template_name_suffix='_confirm_delete',
-                         success_url=None, methods=None):
+                         success_url=None, methods=None,
+                         context_processors=None, using=None, shard=None,
+                         max_concurrency=None, query_budget=None,
+                         statement_timeout=None, route=None):
     """An delete_view that renders a template.
 
     This is an delete_view decorated with  a template view. It takes the
@@ -289,20 +338,69 @@ def template_delete_view(model, field='pk', kwarg='id', template_name=None,
             pass
     """
     def decorate(func):
-        @wraps(func)
-        def wrapper(request, *args, **kwargs):
-            my_template_name = template_name
-            if not my_template_name:
-                my_template_name = '%s/%s%s.html' % (
-                    model._meta.app_label,
-                    model._meta.model_name,
-                    template_name_suffix)
-            myview = template_view(template_name=my_template_name,
-                                   content_type=content_type,
-                                   methods=methods)(func)
-            myview = delete_view(model=model, field=field, kwarg=kwarg,
-                                 success_url=success_url,
-                                 methods=methods)(myview)
-            return myview(request, *args, **kwargs)
-        return wrapper
+        my_template_name = template_name
+        if not my_template_name:
+            my_template_name = '%s/%s%s.html' % (
+                model._meta.app_label,
+                model._meta.model_name,
+                template_name_suffix)
+        myview = template_layer(func, template_name=my_template_name,
+                                content_type=content_type,
+                                context_processors=context_processors)
+        return delete_view(model=model, field=field, kwarg=kwarg,
+                           success_url=success_url, methods=methods,
+                           using=using, shard=shard,
+                           max_concurrency=max_concurrency,
+                           query_budget=query_budget,
+                           statement_timeout=statement_timeout,
+                           route=route)(myview)
     return decorate
+
+
+def model_form_class(model, fields):
+    """Return the ModelForm class for *model* and *fields*.
+
+    The class is made on the first call and cached,  rather than made for
+    every request.
+    """
+    if fields is None or isinstance(fields, six.string_types):
+        key = (model, fields)
+    else:
+        key = (model, tuple(fields))
+    form_cls = _form_classes.get(key)
+    if form_cls is None:
+        form_cls = _form_classes[key] = model_forms.modelform_factory(
+            model, fields=fields)
+    return form_cls
+
+
+def _form_wrapper(func, form, success_url, using):
+    @wraps(func)
+    def wrapper(request, *args, **kwargs):
+        if request.method == 'POST':
+            my_form = form(request.POST)
+        else:
+            my_form = form()
+
+        assert 'form' not in kwargs
+        kwargs['form'] = my_form
+
+        if request.method == 'POST':
+            valid = my_form.is_valid()
+            if valid and hasattr(form, 'save'):
+                save_form(my_form, db_for_write(request, using))
+
+            response = func(request, *args, **kwargs)
+            if success_url and valid:
+                response = redirect(success_url)
+            if valid and using == AUTO:
+                stick(request, response)
+            return response
+        return func(request, *args, **kwargs)
+    return wrapper
+
+
+def _write_alias(request, using, shard, lookup):
+    if shard is not None:
+        return shard(lookup)
+    return db_for_write(request, using)
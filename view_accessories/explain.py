@@ -0,0 +1,238 @@
+"""EXPLAIN the queries of the decorated list and detail views.
+
+Nothing  stops *detail_view(Book, field='title')* looking books up by a
+column  without an index,  or  *list_view(queryset=...)* sorting by one,
+and  neither shows until the table is big.  *explain_views()*  builds,
+for every decorated view, the queries its decorator would run:
+
+- the lookup of detail (and update and delete) views by their *field*;
+- the list of list views or, if paginated, the slice of the first page,
+  the COUNT (run when the view uses the page count) and, if they do not
+  *allow_empty*, the EXISTS query;
+
+and has the database EXPLAIN them (on SQLite, PostgreSQL and MySQL). It
+flags  lookup fields without an index,  sequential scans of tables  the
+query filters (unfiltered lists and counts have to read the whole table
+anyway)  and sorts that are not done with an index.  The "explain_views"
+management command reports them::
+
+    python manage.py explain_views --verbosity 2
+
+The  queries are built,  not run,  so this is safe on any database  but
+the  plans are only as good as its data and statistics:  run it against
+a copy of the production database.
+"""
+from __future__ import unicode_literals
+
+import datetime
+import re
+import uuid
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .db import execute_wrapper
+from .registry import decorator_chain, registered_views
+
+try:
+    from django.urls import get_resolver
+except ImportError:  # Django < 1.10
+    from django.core.urlresolvers import get_resolver
+
+__all__ = ('explain_views', 'explain')
+
+# Page size assumed for views taking it from the query string
+DEFAULT_PAGE_SIZE = 20
+
+# Tried, in order, as the value looked up by detail views
+_LOOKUP_VALUES = (1, 'x', datetime.datetime(2000, 1, 1), uuid.UUID(int=1))
+
+_sqlite_scan = re.compile(r'^SCAN (?:TABLE )?(\S+)')
+_postgresql_scan = re.compile(r'Seq Scan on (\S+)')
+
+
+class _Intercepted(Exception):
+    pass
+
+
+def explain_views(using=DEFAULT_DB_ALIAS):
+    """EXPLAIN the queries of the decorated views on the database *using*.
+
+    Returns  a list,  sorted by view name,  of dictionaries with the view
+    name  ("view"),  its "decorators" (see  *decorator_chain*)  and  its
+    "queries",  each  a  dictionary with the  query's "name"  ("lookup",
+    "list", "page", "count" or "exists") and the "sql", "params", "plan"
+    (a list of lines) and "problems" (a list of messages) of *explain*.
+    """
+    # Import (and so register) the views of the URLconf
+    get_resolver(None).reverse_dict
+
+    reports = []
+    for view_func, info in registered_views():
+        queries = []
+        for name, run in _view_queries(info, using):
+            query = explain(run, using)
+            if query is not None:
+                query['name'] = name
+                if name == 'lookup':
+                    query['problems'][:0] = _index_problems(
+                        info['model'], info['field'], using)
+                queries.append(query)
+        if queries:
+            reports.append({
+                'view': '%s.%s' % (view_func.__module__, view_func.__name__),
+                'decorators': decorator_chain(view_func),
+                'queries': queries,
+            })
+    reports.sort(key=lambda report: report['view'])
+    return reports
+
+
+def explain(run, using=DEFAULT_DB_ALIAS):
+    """EXPLAIN the first query the function *run* runs, without running it.
+
+    Returns  a  dictionary  of the query's "sql" and "params",  the query
+    "plan" (a list of lines) and the "problems" found in the plan,  or None
+    if *run* ran no query on the database *using*.
+    """
+    captured = []
+
+    def intercept(execute, sql, params, many, context):
+        if context['connection'].alias != using:
+            return execute(sql, params, many, context)
+        captured.append((sql, params))
+        raise _Intercepted
+
+    with execute_wrapper(intercept):
+        try:
+            run()
+        except _Intercepted:
+            pass
+    if not captured:
+        return None
+
+    sql, params = captured[0]
+    connection = connections[using]
+    explainer = _explainers.get(connection.vendor)
+    if explainer is None:
+        plan = ['EXPLAIN is not supported on %s' % connection.vendor]
+        problems = []
+    else:
+        with connection.cursor() as cursor:
+            plan, problems = explainer(cursor, sql, params)
+        if ' WHERE ' not in sql:
+            problems = [problem for problem in problems
+                        if not problem.startswith('Sequential scan')]
+    return {'sql': sql, 'params': params, 'plan': plan, 'problems': problems}
+
+
+def _view_queries(info, using):
+    """Yield the (name, function running it) of the queries of a view."""
+    model = info.get('model')
+    if 'field' in info:
+        queryset = model._default_manager.using(using)
+        lookup = _lookup(queryset, info['field'])
+        if lookup is not None:
+            yield 'lookup', lambda: queryset.get(**lookup)
+        return
+
+    if 'paginate' not in info:
+        return
+    if model is not None:
+        queryset = model._default_manager.using(using)
+    elif info.get('queryset') is not None:
+        queryset = info['queryset'].using(using)
+    else:
+        return
+    if not info.get('allow_empty', True):
+        yield 'exists', queryset.exists
+    if info['paginate']:
+        page_size = info.get('page_size')
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            page_size = DEFAULT_PAGE_SIZE
+        rows = page_size + info.get('paginate_orphans', 0) + 1
+        yield 'page', lambda: list(queryset[:rows])
+        yield 'count', queryset.count
+    else:
+        yield 'list', lambda: list(queryset)
+
+
+def _lookup(queryset, field):
+    """Return a lookup of *field* with a value the field accepts."""
+    for value in _LOOKUP_VALUES:
+        try:
+            queryset.filter(**{field: value}).query.sql_with_params()
+        except (TypeError, ValueError, ValidationError):
+            continue
+        return {field: value}
+    return None
+
+
+def _index_problems(model, field, using):
+    """Return the problems with the indexes for looking up *field*."""
+    if field == 'pk' or '__' in field:
+        return []
+    try:
+        column = model._meta.get_field(field).column
+    except FieldDoesNotExist:
+        return []
+    table = model._meta.db_table
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    for constraint in constraints.values():
+        if constraint['columns'] and constraint['columns'][0] == column and (
+                constraint['index'] or constraint['unique'] or
+                constraint['primary_key']):
+            return []
+    return ['No index on %s.%s, the lookup field' % (table, column)]
+
+
+def _explain_sqlite(cursor, sql, params):
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    plan = [row[-1] for row in cursor.fetchall()]
+    problems = []
+    for line in plan:
+        scan = _sqlite_scan.match(line)
+        if scan and ' INDEX ' not in line and 'PRIMARY KEY' not in line:
+            problems.append('Sequential scan of %s' % scan.group(1))
+        if 'TEMP B-TREE' in line and 'ORDER BY' in line:
+            problems.append('Sort without an index (%s)' % line)
+    return plan, problems
+
+
+def _explain_postgresql(cursor, sql, params):
+    cursor.execute('EXPLAIN ' + sql, params)
+    plan = [row[0] for row in cursor.fetchall()]
+    problems = []
+    for line in plan:
+        scan = _postgresql_scan.search(line)
+        if scan:
+            problems.append('Sequential scan of %s' % scan.group(1))
+        if line.strip().startswith('Sort Key:'):
+            problems.append('Sort without an index (%s)' % line.strip())
+    return plan, problems
+
+
+def _explain_mysql(cursor, sql, params):
+    cursor.execute('EXPLAIN ' + sql, params)
+    columns = [column[0] for column in cursor.description]
+    rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    plan = [', '.join('%s=%s' % (column, row[column]) for column in columns)
+            for row in rows]
+    problems = []
+    for row in rows:
+        if row.get('type') == 'ALL':
+            problems.append('Sequential scan of %s' % row.get('table'))
+        if 'Using filesort' in (row.get('Extra') or ''):
+            problems.append('Sort without an index (%s)' % row.get('table'))
+    return plan, problems
+
+
+_explainers = {
+    'sqlite': _explain_sqlite,
+    'postgresql': _explain_postgresql,
+    'mysql': _explain_mysql,
+}
@@ -8,18 +8,43 @@ consumer you write one view function and decorate it with a "view".
 """
 from __future__ import unicode_literals
 
+import threading
+import time
 from functools import wraps
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
 
 from django import http
+from django.db import close_old_connections
+from django.db.models.query import QuerySet
 from django.shortcuts import render
+from django.template import loader
+from django.utils import six
+from django.utils.functional import LazyObject
+from django.utils.module_loading import import_string
+
+from .cache import (cached_response, coalesce as coalesce_response,
+                    get_cached_response, headers_only, view_cache_key)
+from .diagnostics import record_render_time, watch
+from .limits import limiter_for, query_guard
+from .registry import register
 
 HTTP_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS',
                 'TRACE')
 
-__all__ = ('view', 'template_view', 'redirect_view', 'HTTP_METHODS')
+__all__ = ('view', 'template_view', 'template_layer', 'redirect_view',
+           'independent', 'ContextTimeout', 'HTTP_METHODS')
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ContextTimeout(Exception):
+    """Independent context values were not evaluated in time."""
 
 
-def view(func=None, methods=None):
+def view(func=None, methods=None, max_concurrency=None, query_budget=None,
+         statement_timeout=None, route=None):
     """Generic view decorator.
 
     This is  the base decorator  (think base  class for OOO).  All other
@@ -42,10 +67,40 @@ def view(func=None, methods=None):
 
     When used  on its  own this *view()*  decorator merely  createds the
     .accessories attribute with an empty dictionary.
+
+    The  decorated view is registered  (see the *registry* module)  with
+    its  allowed *methods* so that *middleware.MethodGateMiddleware* can
+    answer  OPTIONS and reject disallowed methods before the rest of the
+    middleware stack runs.
+
+    If  *max_concurrency* is given  then at most  that many requests run
+    the view at once in each process.  A few more wait briefly for their
+    turn  and the rest get a  "503 Service Unavailable"  response with a
+    Retry-After header.  It can also be a *limits.Limiter*,  to tune the
+    wait queue or share a limit between views.  *limits.stats()* returns
+    the counters of all limited views.
+
+    If  *query_budget* is given then the view may  run at most that many
+    database  queries per request and if  *statement_timeout*  is  given
+    then no query of the view may take longer than that many seconds.  A
+    view  breaking  either  limit raises *limits.QueryBudgetExceeded* or
+    *limits.StatementTimeout* (see *limits.query_guard*).
+
+    Slow  requests are logged,  and requests profiled,  as configured by
+    the settings described in the *diagnostics* module.
+
+    If *route* is given,  e.g. "widget/<int:id>/", then it is the view's
+    path  in the URLconf made by *routing.routes()*,  which resolves the
+    paths  of all  such views  with  a trie  instead  of trying  regular
+    expressions one by one.
     """
     methods = methods or HTTP_METHODS
 
     def decorate(func):
+        limiter = limiter_for(max_concurrency)
+        guarded = query_budget is not None or statement_timeout is not None
+        name = '%s.%s' % (func.__module__, func.__name__)
+
         @wraps(func)
         def wrapper(request, *args, **kwargs):
             if request.method == 'OPTIONS':
@@ -54,7 +109,28 @@ def view(func=None, methods=None):
             if request.method not in methods:
                 return http.HttpResponseNotAllowed(methods)
 
-            return func(request, *args, **kwargs)
+            return watch(wrapper, name, request, args, kwargs,
+                         lambda: admit(request, *args, **kwargs))
+
+        def admit(request, *args, **kwargs):
+            if limiter is None:
+                return call(request, *args, **kwargs)
+            if not limiter.acquire():
+                return limiter.reject()
+            try:
+                return call(request, *args, **kwargs)
+            finally:
+                limiter.release()
+
+        def call(request, *args, **kwargs):
+            if not guarded:
+                return func(request, *args, **kwargs)
+            with query_guard(name, query_budget, statement_timeout):
+                return func(request, *args, **kwargs)
+        register(wrapper, methods=tuple(methods), limiter=limiter,
+                 query_budget=query_budget,
+                 statement_timeout=statement_timeout, route=route,
+                 decorator='view', wrapped=func)
         return wrapper
 
     if func:
@@ -63,7 +139,11 @@ def view(func=None, methods=None):
 
 
 def template_view(func=None, template_name=None, content_type=None,
-                  methods=None):
+                  methods=None, max_workers=4, timeout=None, coalesce=False,
+                  cache_timeout=None, stale_while_revalidate=0,
+                  cache_alias='default', context_processors=None,
+                  max_concurrency=None, query_budget=None,
+                  statement_timeout=None, route=None):
     """Template view decorator.
 
     This  is analogous  to  Django's TemplateView.  It  takes 2  keyword
@@ -74,8 +154,9 @@ def template_view(func=None, template_name=None, content_type=None,
     "some_app/foo.html".  The  optional  *content_type* is  just  as  it
     sounds.
 
-    In  addition  it   accepts  the  *methods*  argument   as  all  view
-    decorators.
+    In   addition   it   accepts   the   *methods*,   *max_concurrency*,
+    *query_budget*,  *statement_timeout*  and  *route*  arguments as all
+    view decorators.
 
     The decorated  function shall return  a context dictionary  which is
     used  to render  the  template. If  the  decorated function  returns
@@ -88,25 +169,101 @@ def template_view(func=None, template_name=None, content_type=None,
         def about(request):
             return {'version': 2.0}
 
+    Context  values wrapped with *independent()* (querysets or callables
+    that  do not depend on each other)  are evaluated  concurrently in a
+    thread  pool of at most *max_workers* threads before the template is
+    rendered. Each worker thread has its own database connections, which
+    are  kept open between  values for as long as *CONN_MAX_AGE* allows,
+    like a request's.  If *timeout* (in seconds) is given and the values
+    are  not all evaluated in time,  *ContextTimeout* is raised.  Values
+    that time out are not interrupted: they keep running, and keep their
+    thread   of  the   pool   (shared  by  the   views  with  the   same
+    *max_workers*),  until they are  done.  Give a view whose values may
+    time out a *max_workers* of its own::
+
+        @template_view
+        def dashboard(request):
+            return {'widgets': independent(Widget.objects.all()),
+                    'gadgets': independent(Gadget.objects.all()),
+                    'stats': independent(compute_stats)}
+
+    If  *coalesce* is true then concurrent GET requests for the same URL
+    are coalesced: the first one calls the view and renders the template
+    while   the  others  wait  for,   and  share,   its  response   (see
+    *cache.coalesce*). If *coalesce* is the name of a cache backend then
+    that cache is also used to coalesce requests across processes.  Only
+    use this for pages whose output does not depend on who is requesting
+    them.
+
+    If  *cache_timeout* is given then responses to GET and HEAD requests
+    are cached,  in the *cache_alias* cache,  for that many seconds.  If
+    *stale_while_revalidate*  is also given then,  for that many seconds
+    after *cache_timeout*,  the stale response is still served while one
+    background thread renders a fresh one (see *cache.cached_response*).
+    The same caveat as for *coalesce* applies.
+
+    HEAD  requests are answered without  rendering the template.  If the
+    GET  response is cached then its headers,  including Content-Length,
+    ETag  and  Last-Modified,  are  returned.  Otherwise  the  decorated
+    function   is  still  called,   and   the  lazy  objects  (e.g.   of
+    *detail_view*)  among its arguments and context  are  evaluated,  so
+    that  it raises  Http404 as  a GET  would,  but its  context is  not
+    rendered.
+
+    By  default the  template  is rendered  with  all of the  configured
+    context processors (as with *django.shortcuts.render*). Some of them
+    (e.g.  auth and messages)  access the session and the database,  and
+    make  the response vary by cookie.  If *context_processors* is False
+    then  no context  processors are used and if it is a list of context
+    processors (or their dotted paths) then only those are used::
+
+        @template_view(context_processors=[
+            'django.template.context_processors.static'])
+        def about(request):
+            return {'version': 2.0}
     """
     def decorate(func):
-        @wraps(func)
-        def wrapper(request, *args, **kwargs):
-            response = view(func, methods=methods)(request, *args, **kwargs)
-            context = response if response is not None else kwargs
-            my_template_name = template_name or '%s/%s.html' % (
-                func.__module__.partition('.views')[0],
-                func.__name__
-            )
-            return render(request, my_template_name, context,
-                          content_type=content_type)
-        return wrapper
+        my_template_name = _template_name(func, template_name)
+        wrapper = _template_wrapper(
+            func, my_template_name, content_type, context_processors,
+            max_workers, timeout, coalesce, cache_timeout,
+            stale_while_revalidate, cache_alias)
+        myview = view(wrapper, methods=methods,
+                      max_concurrency=max_concurrency,
+                      query_budget=query_budget,
+                      statement_timeout=statement_timeout, route=route)
+        return register(myview, decorator='template_view', wrapped=func,
+                        template_name=my_template_name)
     if func:
         return decorate(func)
     return decorate
 
 
-def redirect_view(func=None, permanent=True, query_string=False, methods=None):
+def template_layer(func, template_name=None, content_type=None,
+                   context_processors=None):
+    """Return *func* rendering a template, for use inside a view.
+
+    This does what *template_view* does with the same arguments,  but is
+    not  a  view  of its  own:  the  view it  is used  in (e.g.  the one
+    *template_detail_view* makes)  checks the method, applies the limits
+    and watches the request,  once for both.  The layer is registered as
+    an  inner  layer  (see  *registry.registered_views*)   so  that  the
+    decorator chain of that view still ends with "template_view".
+
+    This  is used by the template variants of the list,  detail and edit
+    view  decorators but  is exposed  because  it can  also  be used  by
+    third-party view decorators.
+    """
+    my_template_name = _template_name(func, template_name)
+    wrapper = _template_wrapper(func, my_template_name, content_type,
+                                context_processors)
+    return register(wrapper, decorator='template_view', wrapped=func,
+                    template_name=my_template_name, inner=True)
+
+
+def redirect_view(func=None, permanent=True, query_string=False, methods=None,
+                  max_concurrency=None, query_budget=None,
+                  statement_timeout=None, route=None):
     """Redirect view decorator.
 
     This is analogous  to Django's RedirectView, but instead  the url to
@@ -118,8 +275,9 @@ def redirect_view(func=None, permanent=True, query_string=False, methods=None):
     and *query_string*  which, if True  takes the QUERY_STRING  from the
     request and appends it to the redirect *url*.
 
-    In  addition  it   accepts  the  *methods*  argument   as  all  view
-    decorators.
+    In   addition   it   accepts   the   *methods*,   *max_concurrency*,
+    *query_budget*,  *statement_timeout*  and  *route*  arguments as all
+    view decorators.
 
     The simple example::
 
@@ -131,7 +289,7 @@ def redirect_view(func=None, permanent=True, query_string=False, methods=None):
     def decorate(func):
         @wraps(func)
         def wrapper(request, *args, **kwargs):
-            url = view(func, methods=methods)(request, *args, **kwargs)
+            url = func(request, *args, **kwargs)
             if not url:
                 return http.HttpResponseGone()
 
@@ -143,16 +301,186 @@ def redirect_view(func=None, permanent=True, query_string=False, methods=None):
             if permanent:
                 return http.HttpResponsePermanentRedirect(proper_url)
             return http.HttpResponseRedirect(proper_url)
-        return wrapper
+        myview = view(wrapper, methods=methods,
+                      max_concurrency=max_concurrency,
+                      query_budget=query_budget,
+                      statement_timeout=statement_timeout, route=route)
+        return register(myview, decorator='redirect_view', wrapped=func)
 
     if func:
         return decorate(func)
     return decorate
 
 
+def independent(value):
+    """Mark a template context *value* as independent.
+
+    *value* is either a queryset or a callable taking no arguments.  The
+    *template_view*  decorator  evaluates independent values in a thread
+    pool  so that several unrelated  queries run concurrently instead of
+    one after another.
+    """
+    return _Independent(value)
+
+
 def options(request, methods):
     """Return an HttpResponse of methods allowed."""
     response = http.HttpResponse()
     response['Allow'] = ', '.join(methods)
     response['Content-Length'] = '0'
     return response
+
+
+class _Independent(object):
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _resolve_independent(context, max_workers, timeout):
+    """Return *context* with its independent values evaluated."""
+    keys = [key for key, value in context.items()
+            if isinstance(value, _Independent)]
+    if not keys:
+        return context
+
+    context = dict(context)
+    if len(keys) == 1 and timeout is None:
+        context[keys[0]] = _evaluate(context[keys[0]].value)
+        return context
+
+    pool = _get_pool(max_workers)
+    results = [(key, pool.apply_async(_evaluate_in_thread,
+                                      (context[key].value,)))
+               for key in keys]
+    deadline = None if timeout is None else time.time() + timeout
+    for key, result in results:
+        try:
+            if deadline is None:
+                context[key] = result.get()
+            else:
+                context[key] = result.get(max(deadline - time.time(), 0))
+        except TimeoutError:
+            raise ContextTimeout(
+                'Context value %r not evaluated in %s seconds' % (key,
+                                                                  timeout))
+    return context
+
+
+def _resolve_lazy(values):
+    """Evaluate the lazy objects (e.g. of *detail_view*) among *values*."""
+    for value in values:
+        if isinstance(value, LazyObject):
+            value.__class__  # raises any Http404 or PermissionDenied
+
+
+def _evaluate(value):
+    if callable(value):
+        value = value()
+    if isinstance(value, QuerySet):
+        len(value)  # fill the result cache
+    return value
+
+
+def _evaluate_in_thread(value):
+    # Like at the end of a request: connections past their CONN_MAX_AGE
+    # are closed, the others are kept for the next value of this thread
+    try:
+        return _evaluate(value)
+    finally:
+        close_old_connections()
+
+
+def _template_name(func, template_name):
+    return template_name or '%s/%s.html' % (
+        func.__module__.partition('.views')[0],
+        func.__name__
+    )
+
+
+def _template_wrapper(func, template_name, content_type=None,
+                      context_processors=None, max_workers=4, timeout=None,
+                      coalesce=False, cache_timeout=None,
+                      stale_while_revalidate=0, cache_alias='default'):
+    key_prefix = '%s.%s' % (func.__module__, func.__name__)
+    processors = context_processors
+    if processors:
+        processors = [import_string(processor)
+                      if isinstance(processor, six.string_types)
+                      else processor for processor in processors]
+
+    @wraps(func)
+    def wrapper(request, *args, **kwargs):
+        if request.method == 'HEAD':
+            return head_response(request, *args, **kwargs)
+
+        if request.method != 'GET' or not (
+                coalesce or cache_timeout is not None):
+            return render_response(request, *args, **kwargs)
+
+        key = view_cache_key(request, key_prefix)
+
+        def compute():
+            if coalesce:
+                return coalesce_response(
+                    key,
+                    lambda: render_response(request, *args, **kwargs),
+                    cache_alias=None if coalesce is True else coalesce)
+            return render_response(request, *args, **kwargs)
+
+        if cache_timeout is None:
+            return compute()
+        return cached_response(key, compute, cache_alias, cache_timeout,
+                               stale_while_revalidate)
+
+    def head_response(request, *args, **kwargs):
+        if cache_timeout is not None:
+            response = get_cached_response(
+                view_cache_key(request, key_prefix, method='GET'),
+                cache_alias)
+            if response is not None:
+                return headers_only(response)
+
+        # Call the view for its side effects (and Http404s) but don't
+        # render the template. Without a body there is no
+        # Content-Length to send so the response is streamed.
+        context = func(request, *args, **kwargs)
+        _resolve_lazy(kwargs.values())
+        if context is not None:
+            _resolve_lazy(context.values())
+        return http.StreamingHttpResponse((), content_type=content_type)
+
+    def render_response(request, *args, **kwargs):
+        response = func(request, *args, **kwargs)
+        context = response if response is not None else kwargs
+        context = _resolve_independent(context, max_workers, timeout)
+        start = time.time()
+        if processors is None:
+            response = render(request, template_name, context,
+                              content_type=content_type)
+        else:
+            response = http.HttpResponse(
+                _render_template(template_name, context, request,
+                                 processors or ()),
+                content_type=content_type)
+        record_render_time(request, time.time() - start)
+        return response
+    return wrapper
+
+
+def _render_template(template_name, context, request, processors):
+    """Render *template_name* using only the given context *processors*."""
+    full_context = {}
+    for processor in processors:
+        full_context.update(processor(request))
+    full_context.update(context)
+    return loader.get_template(template_name).render(full_context)
+
+
+def _get_pool(size):
+    with _pools_lock:
+        pool = _pools.get(size)
+        if pool is None:
+            pool = _pools[size] = ThreadPool(size)
+        return pool
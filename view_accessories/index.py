@@ -0,0 +1,160 @@
+"""Lookup indexes: the primary keys of objects by a lookup field.
+
+*detail_view(Book,  field='slug')* looks books up by their slug on every
+request,  often a long (or unindexed)  string column.  With *index=True*
+(or  a *LookupIndex*)  the  decorator remembers the  primary key of each
+slug  it looks  up and  afterwards looks the book up by its primary key,
+which pairs well with caching objects by primary key::
+
+    @detail_view(Book, field='slug', index=True)
+    def book_detail(request, book):
+        ...
+
+The  index is built lazily,  as slugs are looked up,  and kept in memory
+(in each process, at most *max_size* entries,  least recently used first
+out)  or, with *cache_alias*, in a cache shared by all processes. Saving
+or  deleting a book updates its entry,  and  since the lookup by primary
+key also checks the slug,  an entry gone stale otherwise (e.g.  a book's
+slug changed by *QuerySet.update()*) is just noticed and replaced on its
+next use.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+from django.utils.encoding import force_bytes, force_text
+
+__all__ = ('LookupIndex',)
+
+DEFAULT_MAX_SIZE = 10000
+
+
+class LookupIndex(object):
+    """An index of the primary keys of *model* objects by their *field*.
+
+    *field* is the field,  or lookup (e.g. "slug__iexact"),  the objects
+    are  looked up by,  other than the primary key.  Entries are kept in
+    memory,  at most *max_size* of them, or if *cache_alias* is given in
+    the cache backend by that name, for *timeout* seconds (the backend's
+    default if None).
+
+    Entries  are updated  when  objects  are saved  or  deleted,  unless
+    *field* is a lookup spanning relations or using a lookup type.
+    """
+    def __init__(self, model, field, max_size=DEFAULT_MAX_SIZE,
+                 cache_alias=None, timeout=None):
+        self.model = model
+        self.field = field
+        self.max_size = max_size
+        self.cache_alias = cache_alias
+        self.timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if field == 'pk' or field == model._meta.pk.name:
+            raise ImproperlyConfigured(
+                'A LookupIndex is for lookups by fields other than the '
+                'primary key')
+        if '__' not in field:
+            self._attname = model._meta.get_field(field).attname
+            post_save.connect(self._saved, sender=model)
+            post_delete.connect(self._deleted, sender=model)
+
+    def get(self, queryset, value):
+        """Return the object of *queryset* whose field is *value*.
+
+        If  the index  has the object's  primary key then  the object is
+        looked  up by  both  its primary  key  and *value*.  Raises  the
+        model's   DoesNotExist  if  there  is   no   such   object,   as
+        *QuerySet.get()*.
+        """
+        key = self._key(value)
+        pk = self._get(key)
+        if pk is not None:
+            try:
+                return queryset.get(pk=pk, **{self.field: value})
+            except queryset.model.DoesNotExist:
+                self._delete(key)
+        obj = queryset.get(**{self.field: value})
+        self._set(key, obj.pk)
+        return obj
+
+    def get_or_404(self, queryset, value):
+        """Return *get(queryset, value)* but raise Http404 if not found."""
+        try:
+            return self.get(queryset, value)
+        except queryset.model.DoesNotExist:
+            raise Http404('No %s matches the given query.' %
+                          queryset.model._meta.object_name)
+
+    def pk_for(self, value, using=DEFAULT_DB_ALIAS):
+        """Return the primary key of the object whose field is *value*.
+
+        Returns None if there is no such object in the database *using*.
+        Unlike  *get* this trusts the index,  so the primary  key may be
+        stale if the object's field was changed other than by *save()*.
+        """
+        key = self._key(value)
+        pk = self._get(key)
+        if pk is None:
+            pk = self.model._default_manager.using(using).filter(
+                **{self.field: value}).values_list('pk', flat=True).first()
+            if pk is not None:
+                self._set(key, pk)
+        return pk
+
+    def clear(self):
+        """Forget the entries kept in memory (but not those in a cache)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, value):
+        if self.cache_alias is None:
+            return force_text(value)
+        meta = self.model._meta
+        return 'view_accessories.index.%s.%s.%s.%s' % (
+            meta.app_label, meta.model_name, self.field,
+            hashlib.md5(force_bytes(value)).hexdigest())
+
+    def _get(self, key):
+        if self.cache_alias is not None:
+            return caches[self.cache_alias].get(key)
+        with self._lock:
+            pk = self._entries.pop(key, None)
+            if pk is not None:
+                self._entries[key] = pk  # now the most recently used
+        return pk
+
+    def _set(self, key, pk):
+        if self.cache_alias is not None:
+            caches[self.cache_alias].set(key, pk, self.timeout)
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = pk
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _delete(self, key):
+        if self.cache_alias is not None:
+            caches[self.cache_alias].delete(key)
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _saved(self, sender, instance, **kwargs):
+        self._set(self._key(getattr(instance, self._attname)), instance.pk)
+
+    def _deleted(self, sender, instance, **kwargs):
+        self._delete(self._key(getattr(instance, self._attname)))
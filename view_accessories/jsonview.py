@@ -0,0 +1,228 @@
+"""JSON view decorators.
+
+These  are *list_view* and *detail_view* for JSON endpoints:  instead of
+the decorated view building an HttpResponse it (usually) returns nothing
+and the decorator serialises the objects itself.
+"""
+from __future__ import unicode_literals
+
+from functools import wraps
+from itertools import chain, islice
+
+from django import http
+from django.http.response import HttpResponseBase
+from django.core.serializers.json import DjangoJSONEncoder
+from django.shortcuts import get_object_or_404
+from django.utils.encoding import force_bytes
+
+from .db import lookup_queryset
+from .generic import view
+from .list import list_view
+from .registry import register
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__all__ = ('json_list_view', 'json_detail_view', 'encode')
+
+CONTENT_TYPE = 'application/json'
+
+_default = DjangoJSONEncoder().default
+_stdlib_encode = DjangoJSONEncoder(separators=(',', ':')).encode
+
+
+def encode(obj):
+    """Encode *obj* as JSON and return the bytes.
+
+    This is the default encoder of the JSON view decorators. It uses the
+    (much  faster)  orjson library  if it is installed and Python's json
+    module otherwise.  Either way dates,  times,  decimals and UUIDs are
+    encoded  as with Django's DjangoJSONEncoder (orjson is told to leave
+    dates  and times  to it),  so the output  does not depend on whether
+    orjson is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return force_bytes(_stdlib_encode(obj))
+
+
+def json_list_view(model=None, queryset=None, fields=None, paginate=False,
+                   page_size='page_size', paginate_orphans=0,
+                   page_kwarg='page', allow_empty=True, encoder=None,
+                   chunk_size=500, methods=None, using=None, shard=None,
+                   shards=None, shard_kwarg=None, max_concurrency=None,
+                   query_budget=None, statement_timeout=None, route=None):
+    """A list view that returns JSON.
+
+    This works like *list_view* (and takes the same *model*, *queryset*,
+    pagination,  *methods*,  *using*  and  sharding  arguments)  but the
+    queryset  is a *values()* queryset of the given *fields* (all fields
+    if not given) so that no model instances are built.
+
+    If  the decorated view  returns None then  the decorator returns the
+    JSON list of objects.  If paginating,  the JSON is instead an object
+    with the keys "objects" (the objects on the page) and "pagination"::
+
+        {"objects": [...],
+         "pagination": {"page": 2, "has_next": true, "has_previous": true,
+                        "next_page": 3, "previous_page": 1}}
+
+    The  pagination data deliberately does  not include the total  count
+    (see *list.Pagination*). If the decorated view returns anything else
+    then  that is  returned as  JSON instead  (or as  is,  if  it is  an
+    HttpResponse).
+
+    Lists  of more than  *chunk_size*  objects are encoded and  streamed
+    *chunk_size*  objects at a time.  The list's query is  run,  and its
+    first   chunk  fetched,   by  the   view  itself,   so  within   its
+    *query_budget*,  *statement_timeout* and *max_concurrency*,  but the
+    rest of the rows are fetched (from the query's results)  and encoded
+    while  the  response  is  streamed,  after the  view  has  returned.
+    *encoder*  is a function that takes  an object and  returns its JSON
+    encoding (see *encode*, the default).
+
+    A quick example::
+
+        @json_list_view(model=Widget, fields=['id', 'text'], paginate=True,
+                        page_size=100)
+        def widgets_json(request, widgets, pagination):
+            pass
+    """
+    my_encoder = encoder or encode
+
+    def decorate(func):
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            response = func(request, *args, **kwargs)
+            if isinstance(response, HttpResponseBase):
+                return response
+            if response is not None:
+                return _json_response(my_encoder(response))
+
+            pagination = kwargs.get('pagination')
+            if pagination is None:
+                qs = kwargs[str(
+                    (model or queryset.model)._meta.verbose_name_plural)]
+                # Run the query here, within the view's limits, rather
+                # than while the response is streamed
+                rows = qs.iterator()
+                first = list(islice(rows, chunk_size + 1))
+                if len(first) <= chunk_size:
+                    return _json_response(my_encoder(first))
+                return _stream_list(chain(first, rows), my_encoder,
+                                    chunk_size)
+
+            objects = pagination.objects
+            meta = {
+                'page': pagination.number,
+                'has_next': pagination.has_next,
+                'has_previous': pagination.has_previous,
+                'next_page': (pagination.number + 1
+                              if pagination.has_next else None),
+                'previous_page': (pagination.number - 1
+                                  if pagination.has_previous else None),
+            }
+            if len(objects) <= chunk_size:
+                return _json_response(my_encoder({'objects': objects,
+                                                  'pagination': meta}))
+            return _stream_list(objects, my_encoder, chunk_size,
+                                prefix=b'{"pagination":' +
+                                force_bytes(my_encoder(meta)) +
+                                b',"objects":',
+                                suffix=b'}')
+
+        myview = list_view(model=model, queryset=queryset, paginate=paginate,
+                           page_size=page_size,
+                           paginate_orphans=paginate_orphans,
+                           page_kwarg=page_kwarg, allow_empty=allow_empty,
+                           methods=methods, values=fields or (),
+                           using=using, shard=shard, shards=shards,
+                           shard_kwarg=shard_kwarg,
+                           max_concurrency=max_concurrency,
+                           query_budget=query_budget,
+                           statement_timeout=statement_timeout,
+                           route=route)(wrapper)
+        return register(myview, decorator='json_list_view', wrapped=func)
+    return decorate
+
+
+def json_detail_view(model, field='pk', kwarg='id', fields=None, encoder=None,
+                     methods=None, using=None, shard=None,
+                     max_concurrency=None, query_budget=None,
+                     statement_timeout=None, route=None):
+    """A detail view that returns JSON.
+
+    This works like *detail_view* (and takes the same *model*,  *field*,
+    *kwarg*,  *methods*,  *using* and *shard* arguments)  but the object
+    passed  to the decorated view is a dictionary of  the given *fields*
+    (all fields if not given) of the model instance.
+
+    If  the decorated view  returns None then  the decorator returns the
+    JSON  object.  If it returns anything else then that  is returned as
+    JSON instead (or as is,  if it is an HttpResponse).  *encoder* is as
+    in *json_list_view*.
+
+    A quick example::
+
+        @json_detail_view(Widget, fields=['id', 'text'])
+        def widget_json(request, widget):
+            pass
+    """
+    my_encoder = encoder or encode
+
+    def decorate(func):
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            lookup = kwargs.pop(kwarg)
+            obj = get_object_or_404(
+                lookup_queryset(request, model, using, shard,
+                                lookup).values(*(fields or ())),
+                **{field: lookup})
+            kwargs[model._meta.model_name] = obj
+
+            response = func(request, *args, **kwargs)
+            if isinstance(response, HttpResponseBase):
+                return response
+            return _json_response(my_encoder(
+                obj if response is None else response))
+        myview = view(wrapper, methods=methods,
+                      max_concurrency=max_concurrency,
+                      query_budget=query_budget,
+                      statement_timeout=statement_timeout, route=route)
+        return register(myview, decorator='json_detail_view', wrapped=func,
+                        model=model, field=field)
+    return decorate
+
+
+def _json_response(content):
+    return http.HttpResponse(content, content_type=CONTENT_TYPE)
+
+
+def _stream_list(rows, encoder, chunk_size, prefix=b'', suffix=b''):
+    return http.StreamingHttpResponse(
+        _iter_list(rows, encoder, chunk_size, prefix, suffix),
+        content_type=CONTENT_TYPE)
+
+
+def _iter_list(rows, encoder, chunk_size, prefix, suffix):
+    """Yield the JSON list of *rows* encoding *chunk_size* rows at a time."""
+    yield prefix + b'['
+    separator = b''
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield separator + _encode_items(chunk, encoder)
+            separator = b','
+            chunk = []
+    if chunk:
+        yield separator + _encode_items(chunk, encoder)
+    yield b']' + suffix
+
+
+def _encode_items(chunk, encoder):
+    """Return the JSON of the list *chunk* without the enclosing brackets."""
+    return force_bytes(encoder(chunk)).strip()[1:-1]
@@ -0,0 +1,255 @@
+"""Admission control for views.
+
+A  view decorated with *max_concurrency* runs at most that many times at
+once  in each process.  Requests arriving when all slots are taken wait,
+in  a short bounded queue,  for a slot to free up.  Requests that do not
+get  a slot in time (or find the queue full)  are shed with a  fast "503
+Service  Unavailable" and a  Retry-After header instead  of tying up yet
+another  worker thread,  so that one slow view cannot starve the rest of
+the site.
+
+Views  decorated with *query_budget*  may run at most that many database
+queries  per request and views decorated  with  *statement_timeout*  may
+spend at most that many seconds in any one query (see *query_guard*), so
+that a bad filter cannot tie up a shared database with a runaway scan.
+"""
+from __future__ import unicode_literals
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django import http
+from django.db import DatabaseError
+
+from .db import execute_wrapper
+from .registry import registered_views
+
+__all__ = ('Limiter', 'limiter_for', 'stats', 'query_guard',
+           'QueryBudgetExceeded', 'StatementTimeout')
+
+# Backends that can time out statements themselves: (set, reset) SQL
+SESSION_TIMEOUTS = {
+    'postgresql': ('SET statement_timeout = %d',
+                   'SET statement_timeout TO DEFAULT'),
+    'mysql': ('SET SESSION max_execution_time = %d',
+              'SET SESSION max_execution_time = DEFAULT'),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """A view ran more queries than its *query_budget*."""
+
+
+class StatementTimeout(Exception):
+    """A query of a view ran longer than its *statement_timeout*."""
+
+
+class Limiter(object):
+    """Limit the concurrent executions of a view.
+
+    At most *max_concurrency* callers hold a slot at once. Up to *queue*
+    more (*max_concurrency* by default)  wait at most *wait* seconds for
+    one.  The rest are  rejected and told  to retry after  *retry_after*
+    seconds.
+
+    A  Limiter can be  passed as the  *max_concurrency* argument of  the
+    view decorators instead of a number to change those defaults,  or to
+    share one limit between several views.
+
+    The  counters  *admitted*,  *queued*,  *rejected*  and  *peak*  (the
+    highest   number  of  concurrent  executions  seen)   are  kept  for
+    observability (see *stats*).
+    """
+    def __init__(self, max_concurrency, queue=None, wait=0.5, retry_after=1):
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be at least 1')
+        self.max_concurrency = max_concurrency
+        self.queue = max_concurrency if queue is None else queue
+        self.wait = wait
+        self.retry_after = retry_after
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Take a slot, waiting for one if need be. Return False if shed."""
+        with self._condition:
+            if self.running >= self.max_concurrency:
+                if self.waiting >= self.queue:
+                    self.rejected += 1
+                    return False
+                self.waiting += 1
+                self.queued += 1
+                try:
+                    if not self._wait_for_slot():
+                        self.rejected += 1
+                        return False
+                finally:
+                    self.waiting -= 1
+            self.running += 1
+            self.admitted += 1
+            self.peak = max(self.peak, self.running)
+            return True
+
+    def release(self):
+        """Give back a slot taken with *acquire*."""
+        with self._condition:
+            self.running -= 1
+            self._condition.notify()
+
+    def reject(self):
+        """Return the response to a request that was shed."""
+        response = http.HttpResponse('Service Unavailable', status=503,
+                                     content_type='text/plain')
+        response['Retry-After'] = str(self.retry_after)
+        return response
+
+    def stats(self):
+        """Return a dictionary of the limits and counters."""
+        with self._condition:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'queue': self.queue,
+                'running': self.running,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'peak': self.peak,
+            }
+
+    def _wait_for_slot(self):
+        deadline = time.time() + self.wait
+        while self.running >= self.max_concurrency:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            self._condition.wait(remaining)
+        return True
+
+
+def limiter_for(max_concurrency):
+    """Return the Limiter for a *max_concurrency* argument (or None)."""
+    if max_concurrency is None or isinstance(max_concurrency, Limiter):
+        return max_concurrency
+    return Limiter(max_concurrency)
+
+
+def stats():
+    """Return the Limiter stats of all limited views.
+
+    The  result is a dictionary whose keys are the  views' dotted names,
+    e.g.  for exporting  to a monitoring  system or showing  on a status
+    page.
+    """
+    result = {}
+    for view_func, info in registered_views():
+        limiter = info.get('limiter')
+        if limiter is not None:
+            name = '%s.%s' % (view_func.__module__, view_func.__name__)
+            result[name] = limiter.stats()
+    return result
+
+
+@contextmanager
+def query_guard(name, query_budget=None, statement_timeout=None):
+    """Enforce a query budget and statement timeout on this thread.
+
+    Within  the block at most *query_budget* queries may be  run (on all
+    databases)  and no query may take  longer  than  *statement_timeout*
+    seconds.  Breaking either limit raises *QueryBudgetExceeded* (before
+    the  query is run)  or *StatementTimeout* and  logs an error  naming
+    *name* (usually the dotted name of the view).
+
+    The  timeout is enforced  by the database  itself on PostgreSQL  and
+    MySQL  (where  it  only  applies  to SELECTs).  SQLite  queries  are
+    interrupted  by a timer thread.  On other backends the query is left
+    to  finish but  StatementTimeout is raised  after it if  it was  too
+    slow.
+    """
+    state = {'queries': 0, 'timeouts': set()}
+
+    def guard(execute, sql, params, many, context):
+        state['queries'] += 1
+        if query_budget is not None and state['queries'] > query_budget:
+            logger.error('%s exceeded its query budget of %s queries',
+                         name, query_budget)
+            raise QueryBudgetExceeded(
+                '%s exceeded its query budget of %s queries' % (
+                    name, query_budget))
+        if statement_timeout is None:
+            return execute(sql, params, many, context)
+        return _execute_with_timeout(execute, sql, params, many, context,
+                                     name, statement_timeout,
+                                     state['timeouts'])
+
+    try:
+        with execute_wrapper(guard):
+            yield
+    finally:
+        for connection in state['timeouts']:
+            try:
+                _set_session_timeout(connection, None)
+            except DatabaseError:
+                # e.g. the timeout aborted the transaction, which also
+                # undoes the SET
+                logger.warning('Could not reset the statement timeout of %s',
+                               connection.alias, exc_info=True)
+
+
+def _execute_with_timeout(execute, sql, params, many, context, name, timeout,
+                          session_timeouts):
+    connection = context['connection']
+    timer = None
+    if connection.vendor in SESSION_TIMEOUTS:
+        if connection not in session_timeouts:
+            _set_session_timeout(connection, timeout)
+            session_timeouts.add(connection)
+    elif connection.vendor == 'sqlite':
+        timer = threading.Timer(timeout, connection.connection.interrupt)
+        timer.daemon = True
+        timer.start()
+
+    start = time.time()
+    try:
+        result = execute(sql, params, many, context)
+    except DatabaseError:
+        if time.time() - start < timeout:
+            raise
+        _timed_out(name, timeout, sql)
+    finally:
+        if timer is not None:
+            timer.cancel()
+    if time.time() - start >= timeout:
+        _timed_out(name, timeout, sql)
+    return result
+
+
+def _set_session_timeout(connection, timeout):
+    if connection.connection is None:  # closed
+        return
+    set_sql, reset_sql = SESSION_TIMEOUTS[connection.vendor]
+    # The raw DB-API cursor, so as not to go through the guard again
+    cursor = connection.connection.cursor()
+    try:
+        if timeout is None:
+            cursor.execute(reset_sql)
+        else:
+            cursor.execute(set_sql % int(timeout * 1000))
+    finally:
+        cursor.close()
+
+
+def _timed_out(name, timeout, sql):
+    logger.error('%s: query ran longer than %s seconds: %s', name, timeout,
+                 sql)
+    raise StatementTimeout('%s: query ran longer than %s seconds' % (
+        name, timeout))
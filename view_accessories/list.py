@@ -3,19 +3,30 @@ from __future__ import unicode_literals
 from functools import wraps
 
 from django.core.exceptions import ImproperlyConfigured
-from django.core.paginator import InvalidPage, Paginator
+from django.core.paginator import EmptyPage, InvalidPage, Page, Paginator
 from django.http import Http404
 from django.utils.translation import ugettext as _
 
-from .generic import template_view, view
+from .cache import coalesce as coalesce_response, view_cache_key
+from .db import read_queryset, shard_queryset
+from .generic import template_layer, view
+from .registry import register
 
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
 
-__all__ = ('list_view', 'template_list_view', 'paginate_queryset')
+
+__all__ = ('list_view', 'template_list_view', 'paginate_queryset',
+           'Pagination')
 
 
 def list_view(model=None, queryset=None, paginate=False, page_size='page_size',
               paginate_orphans=0, page_kwarg='page', allow_empty=True,
-              methods=None):
+              methods=None, values=None, values_list=None, using=None,
+              shard=None, shards=None, shard_kwarg=None, max_concurrency=None,
+              query_budget=None, statement_timeout=None, route=None):
     """A list view.
 
     Note  unlike  Django's ListView  this  does  not return  a  rendered
@@ -30,12 +41,29 @@ def list_view(model=None, queryset=None, paginate=False, page_size='page_size',
     then the decorator, instead of  calling the decorated function, will
     raise an EmptyPage exception.
 
+    If  *values* (or *values_list*)  is a  list of field  names then the
+    queryset is a *values()* (or *values_list()*) queryset of just those
+    fields,  so that the  view gets dictionaries (or tuples)  instead of
+    model  instances,  which are much cheaper to build when all the view
+    needs is a few columns.
+
+    If  *using* is given then the  queryset uses that  database (or,  if
+    "auto",  a replica for safe requests and the primary otherwise). See
+    *view_accessories.db*.
+
+    If  *shard* is given and the  view is called  with the *shard_kwarg*
+    keyword argument then the queryset uses the database *shard* returns
+    for its value (see *detail_view*).  Without a shard key the queryset
+    is fanned out across the *shards* databases, by default those of the
+    VIEW_ACCESSORIES_SHARDS   setting,   and  the  results  merged  (see
+    *db.MergedQuerySet*).
+
     Pagination
     ----------
     This decorator supports pagination using Django's built-in Paginator
     class. If *paginate* is true, then the decorated view will be passed
-    a  keyword argument  "pagination", the  value of  which is  a Python
-    dictionary with the following key/value pairs:
+    a keyword argument "pagination", the value of which is a *Pagination*
+    that can be used as a dictionary with the following key/value pairs:
 
         "paginator": The actual Paginator object.
         "page": The paginator page for this request,
@@ -60,12 +88,14 @@ def list_view(model=None, queryset=None, paginate=False, page_size='page_size',
     the  "page" will  be the  second page.  The default  *page_kwarg* is
     "page".
 
-    In  addition  it   accepts  the  *methods*  argument   as  all  view
-    decorators.
+    In   addition   it   accepts   the   *methods*,   *max_concurrency*,
+    *query_budget*,  *statement_timeout*  and  *route*  arguments as all
+    view decorators.
 
     A quick example::
 
-        @list_view(model=Widget, paginate=True, page_size=5)
+        @list_view(model=Widget, paginate=True, page_size=5,
+                   values=['text'])
         def my_view(request, widgets, pagination):
             page_widgets = pagination['objects']
             response = http.HttpResponse(json.dumps(page_widgets))
@@ -75,7 +105,9 @@ def list_view(model=None, queryset=None, paginate=False, page_size='page_size',
     def decorate(func):
         @wraps(func)
         def wrapper(request, *args, **kwargs):
-            qs = _get_qs_or_404(model, queryset, allow_empty)
+            qs = _get_qs_or_404(request, model, queryset, allow_empty, using,
+                                shard, shards, kwargs.get(shard_kwarg))
+            qs = _project(qs, values, values_list)
             name = str(qs.model._meta.verbose_name_plural)
             assert name not in kwargs
             kwargs[name] = qs
@@ -91,8 +123,16 @@ def list_view(model=None, queryset=None, paginate=False, page_size='page_size',
                 )
                 kwargs['pagination'] = pagination
 
-            return view(methods=methods)(func)(request, *args, **kwargs)
-        return wrapper
+            return func(request, *args, **kwargs)
+        myview = view(wrapper, methods=methods,
+                      max_concurrency=max_concurrency,
+                      query_budget=query_budget,
+                      statement_timeout=statement_timeout, route=route)
+        return register(myview, decorator='list_view', wrapped=func,
+                        model=model, queryset=queryset, paginate=paginate,
+                        page_size=page_size,
+                        paginate_orphans=paginate_orphans,
+                        allow_empty=allow_empty)
     return decorate
 
 
@@ -100,7 +140,11 @@ def template_list_view(model=None, queryset=None, allow_empty=True,
                        template_name=None, paginate=False,
                        page_size='page_size', paginate_orphans=0,
                        page_kwarg='page', content_type=None,
-                       template_name_suffix='_list', methods=None):
+                       template_name_suffix='_list', methods=None,
+                       coalesce=False, context_processors=None, values=None,
+                       values_list=None, using=None, shard=None, shards=None,
+                       shard_kwarg=None, max_concurrency=None,
+                       query_budget=None, statement_timeout=None, route=None):
     """A list_view that renders a template.
 
     This   is  probably   the   view  decorator   that   you  want.   It
@@ -113,12 +157,15 @@ def template_list_view(model=None, queryset=None, allow_empty=True,
     *template_name_suffix* is  passed instead, it will  default to, e.g.
     **some_app/book_customsuffix.html**.
 
-    The *model* and *queryset* arguments are the same as in *list_view*.
-    as  are the  pagination  arguments. The  *content_type* argument  is
-    self-explanatory (same as *generic.template_view*).
+    The *model* and *queryset* arguments are the same as in *list_view*,
+    as are the pagination, *values*, *values_list*, *using* and sharding
+    arguments.  The *content_type* argument is self-explanatory (same as
+    *generic.template_view*).
 
-    In  addition  it   accepts  the  *methods*  argument   as  all  view
-    decorators.
+    In   addition   it   accepts   the   *methods*,   *max_concurrency*,
+    *query_budget*,  *statement_timeout*  and  *route*  arguments as all
+    view   decorators   and   the  *coalesce*  and  *context_processors*
+    arguments of *generic.template_view*.
 
     A quick example::
 
@@ -130,9 +177,32 @@ def template_list_view(model=None, queryset=None, allow_empty=True,
                     'next_page': pagination['page'].has_next()}
     """
     def decorate(func):
+        key_prefix = '%s.%s' % (func.__module__, func.__name__)
+        list_model = model if model is not None else getattr(
+            queryset, 'model', None)
+        my_template_name = template_name
+        if not my_template_name and list_model is not None:
+            my_template_name = '%s/%s%s.html' % (
+                list_model._meta.app_label,
+                list_model._meta.model_name,
+                template_name_suffix)
+        render_template = template_layer(
+            func, template_name=my_template_name, content_type=content_type,
+            context_processors=context_processors)
+
         @wraps(func)
         def wrapper(request, *args, **kwargs):
-            qs = _get_qs_or_404(model, queryset, allow_empty)
+            if coalesce and request.method == 'GET':
+                return coalesce_response(
+                    view_cache_key(request, key_prefix),
+                    lambda: render_response(request, *args, **kwargs),
+                    cache_alias=None if coalesce is True else coalesce)
+            return render_response(request, *args, **kwargs)
+
+        def render_response(request, *args, **kwargs):
+            qs = _get_qs_or_404(request, model, queryset, allow_empty, using,
+                                shard, shards, kwargs.get(shard_kwarg))
+            qs = _project(qs, values, values_list)
             name = str(qs.model._meta.verbose_name_plural)
             assert name not in kwargs
             kwargs[name] = qs
@@ -148,31 +218,31 @@ def template_list_view(model=None, queryset=None, allow_empty=True,
                 )
                 kwargs['pagination'] = pagination
 
-            my_template_name = template_name
-            if not my_template_name:
-                my_template_name = '%s/%s%s.html' % (
-                    qs.model._meta.app_label,
-                    qs.model._meta.model_name,
-                    template_name_suffix)
-
-            return template_view(
-                template_name=my_template_name,
-                content_type=content_type,
-                methods=methods)(func)(request, *args, **kwargs)
-
-        return wrapper
+            return render_template(request, *args, **kwargs)
+
+        myview = view(wrapper, methods=methods,
+                      max_concurrency=max_concurrency,
+                      query_budget=query_budget,
+                      statement_timeout=statement_timeout, route=route)
+        return register(myview, decorator='template_list_view', wrapped=func,
+                        model=model, queryset=queryset, paginate=paginate,
+                        page_size=page_size,
+                        paginate_orphans=paginate_orphans,
+                        allow_empty=allow_empty)
     return decorate
 
 
 def paginate_queryset(request, queryset, page_kwarg, per_page, orphans=0,
-                      allow_empty_first_page=True, **kwargs):
-    """Paginate the request and return a dict of pagination info.
+                      allow_empty_first_page=True, values=None,
+                      values_list=None, using=None, **kwargs):
+    """Paginate the request and return a *Pagination*.
 
     This function is used by *list_view* and *template_list_view* but is
     exposed because  it can also  be used on  its own or  by third-party
     view decorators.
 
-    Return a Python dictionary with following key/value pairs:
+    The returned *Pagination* can be used as a Python dictionary with the
+    following key/value pairs:
 
         "paginator": The actual Paginator object.
         "page": The paginator page for this request,
@@ -200,6 +270,8 @@ def paginate_queryset(request, queryset, page_kwarg, per_page, orphans=0,
     function  will instead  raise  an Http404  exception,  else it  will
     return an empty first page.
 
+    *values*, *values_list* and *using* are as in *list_view*.
+
     *kwargs* are additional  keyword arguments to pass  to the Paginator
     on instantiation.
     """
@@ -208,6 +280,8 @@ def paginate_queryset(request, queryset, page_kwarg, per_page, orphans=0,
     except ValueError:
         per_page = int(request.GET[per_page])
 
+    queryset = _project(read_queryset(request, queryset, using), values,
+                        values_list)
     paginator = Paginator(queryset, per_page, orphans=orphans,
                           allow_empty_first_page=allow_empty_first_page,
                           **kwargs)
@@ -223,30 +297,142 @@ def paginate_queryset(request, queryset, page_kwarg, per_page, orphans=0,
                 _("Page is not 'last', nor can it be converted to an int."))
 
     try:
-        page = paginator.page(page_number)
-        return {
-            'paginator': paginator,
-            'page': page,
-            'objects': page.object_list,
-            'has_other_pages': page.has_other_pages(),
-        }
+        return Pagination(paginator, page_number)
     except InvalidPage as exception:
         raise Http404(
             _('Invalid page %s: %s' % (page_number, str(exception))))
 
 
-def _get_qs_or_404(model, queryset, allow_empty):
+class Pagination(object):
+    """The result of *paginate_queryset*.
+
+    Only  the objects  on the page  (plus those needed  to tell  whether
+    there is a next page) are fetched. The total *count* and *num_pages*
+    are  only computed,  by a COUNT  query,  when  they  (or the  Django
+    *page*)  are accessed,  so views only  showing  next/previous  links
+    never count the objects.
+
+    For  compatibility a Pagination  can also be  used as a  (read-only)
+    dictionary  with  the  keys  "paginator",   "page",   "objects"  and
+    "has_other_pages".  It is registered as  a *Mapping*,  rather than a
+    subclass of one,  because on Python 2 that would give every instance
+    a __dict__ despite the __slots__.
+    """
+    __slots__ = ('paginator', 'number', 'objects', 'has_next', '_page')
+
+    _keys = ('paginator', 'page', 'objects', 'has_other_pages')
+
+    def __init__(self, paginator, number):
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+
+        per_page = paginator.per_page
+        orphans = paginator.orphans
+        bottom = (number - 1) * per_page
+        rows = list(paginator.object_list[bottom:bottom + per_page +
+                                          orphans + 1])
+
+        if not rows:
+            if number > 1 or not paginator.allow_empty_first_page:
+                raise EmptyPage(_('That page contains no results'))
+        elif number > 1 and len(rows) <= orphans:
+            # Django would have put these orphans on the previous page
+            raise EmptyPage(_('That page contains no results'))
+
+        self.paginator = paginator
+        self.number = number
+        self.has_next = len(rows) > per_page + orphans
+        self.objects = rows[:per_page] if self.has_next else rows
+        self._page = None
+
+    @property
+    def page(self):
+        """The Django Page object for this page."""
+        if self._page is None:
+            self._page = Page(self.objects, self.number, self.paginator)
+        return self._page
+
+    @property
+    def count(self):
+        return self.paginator.count
+
+    @property
+    def num_pages(self):
+        return self.paginator.num_pages
+
+    @property
+    def has_previous(self):
+        return self.number > 1
+
+    @property
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def get(self, key, default=None):
+        if key not in self._keys:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return list(self._keys)
+
+    def values(self):
+        return [getattr(self, key) for key in self._keys]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self._keys]
+
+    def __repr__(self):
+        return '<Pagination page %s>' % self.number
+
+
+Mapping.register(Pagination)
+
+
+def _get_qs_or_404(request, model, queryset, allow_empty, using, shard=None,
+                   shards=None, shard_key=None):
     if model:
         qs = model._default_manager.all()
-    elif queryset:
+    elif queryset is not None:
+        # Not "elif queryset", which would evaluate (and cache the results
+        # of) a queryset shared by all requests
         qs = queryset
     else:
         raise ImproperlyConfigured("Must define 'queryset' or 'model'")
 
     if hasattr(qs, '_clone'):
         qs = qs._clone()
+    if shard is not None:
+        qs = shard_queryset(qs, shard, shard_key, shards)
+    else:
+        qs = read_queryset(request, qs, using)
 
     if not (allow_empty or qs.exists()):
         raise Http404('Empty list')
 
     return qs
+
+
+def _project(queryset, values, values_list):
+    if values is not None and values_list is not None:
+        raise ImproperlyConfigured(
+            "Cannot define both 'values' and 'values_list'")
+    if values is not None:
+        return queryset.values(*values)
+    if values_list is not None:
+        return queryset.values_list(*values_list)
+    return queryset
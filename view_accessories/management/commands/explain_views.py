@@ -0,0 +1,41 @@
+"""EXPLAIN the queries of the decorated views and report their problems."""
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from view_accessories.explain import explain_views
+
+
+class Command(BaseCommand):
+    help = ('EXPLAIN the queries the decorated list and detail views run '
+            '(the lookup, the page and the count) and report sequential '
+            'scans, lookup fields without an index and sorts without an '
+            'index. Use --verbosity 2 to see the queries and their plans.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='The database to EXPLAIN the queries on '
+                            '("default" by default)')
+        parser.add_argument('--fail', action='store_true',
+                            help='Exit with an error if there are problems')
+
+    def handle(self, *args, **options):
+        reports = explain_views(options['database'])
+        verbosity = options['verbosity']
+        problems = 0
+        for report in reports:
+            self.stdout.write('%s [%s]' % (report['view'],
+                                           ', '.join(report['decorators'])))
+            for query in report['queries']:
+                if verbosity >= 2:
+                    self.stdout.write('  %s: %s %r' % (
+                        query['name'], query['sql'], tuple(query['params'])))
+                    for line in query['plan']:
+                        self.stdout.write('      %s' % line)
+                for problem in query['problems']:
+                    problems += 1
+                    self.stdout.write('  %s: %s' % (query['name'], problem))
+        self.stdout.write('%d problems in %d views' % (problems, len(reports)))
+        if problems and options['fail']:
+            raise CommandError('The queries of the views have problems')
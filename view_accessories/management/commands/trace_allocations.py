@@ -0,0 +1,60 @@
+"""Replay requests to a URL and report the memory its view retains."""
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from view_accessories import diagnostics
+
+
+class Command(BaseCommand):
+    help = ('Replay requests to a URL of decorated views, tracing their '
+            'allocations with tracemalloc, and report the memory they '
+            'retain. Requests go to the configured database(s).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The URL path, e.g. /widgets/')
+        parser.add_argument('--method', default='GET',
+                            help='The request method (GET by default)')
+        parser.add_argument('--requests', type=int, default=10,
+                            help='How many requests to trace (10)')
+        parser.add_argument('--warmup', type=int, default=1,
+                            help='How many untraced requests to make first, '
+                            'to fill caches and such (1)')
+        parser.add_argument('--top', type=int, default=10,
+                            help='How many allocation sites to report (10)')
+
+    def handle(self, *args, **options):
+        if diagnostics.tracemalloc is None:
+            raise CommandError('Tracing allocations needs tracemalloc '
+                               '(Python 3.4 or later)')
+        client = Client()
+        allowed_hosts = list(settings.ALLOWED_HOSTS) + ['testserver']
+        with override_settings(ALLOWED_HOSTS=allowed_hosts):
+            for _ in range(options['warmup']):
+                self._request(client, options)
+
+            diagnostics.reset_allocation_stats()
+            with override_settings(VIEW_ACCESSORIES_ALLOCATION_SAMPLE_RATE=1,
+                                   VIEW_ACCESSORIES_ALLOCATION_COLLECT=True):
+                for _ in range(options['requests']):
+                    self._request(client, options)
+
+        stats = diagnostics.allocation_stats(top=options['top'])
+        if not stats:
+            raise CommandError('%s is not a decorated view' % options['path'])
+        for name, totals in sorted(stats.items()):
+            self.stdout.write(
+                '%s: %d requests retained %d bytes (%d per request)' % (
+                    name, totals['requests'], totals['retained'],
+                    totals['retained'] // totals['requests']))
+            for site, size in totals['top']:
+                self.stdout.write('    %10d  %s' % (size, site))
+
+    def _request(self, client, options):
+        response = client.generic(options['method'], options['path'])
+        if response.status_code >= 400:
+            raise CommandError('%s %s returned %d' % (
+                options['method'], options['path'], response.status_code))
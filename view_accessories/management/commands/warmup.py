@@ -0,0 +1,25 @@
+"""Warm up the decorated views and report what was done."""
+from __future__ import unicode_literals
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from view_accessories.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = ('Load the templates, form classes and model metadata of all '
+            'decorated views, as view_accessories.warmup.warmup() does '
+            'before a server forks, and report any problems.')
+
+    def handle(self, *args, **options):
+        start = time.time()
+        result = warmup()
+        self.stdout.write(
+            'Warmed up %d views: %d templates, %d form classes and %d '
+            'models in %.3f seconds' % (
+                result['views'], result['templates'], result['forms'],
+                result['models'], time.time() - start))
+        for problem in result['problems']:
+            self.stderr.write(problem)
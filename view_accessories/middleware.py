@@ -0,0 +1,60 @@
+"""Middleware for Django View Accessories."""
+from __future__ import unicode_literals
+
+from django import http
+from django.core.urlresolvers import Resolver404, resolve
+
+from .generic import options
+from .registry import lookup, methods_allowed_by_all
+
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:  # Django < 1.10
+    MiddlewareMixin = object
+
+__all__ = ('MethodGateMiddleware',)
+
+
+class MethodGateMiddleware(MiddlewareMixin):
+    """Answer OPTIONS and reject disallowed methods early.
+
+    Decorated  views register their  allowed  *methods*  when  they  are
+    decorated.  This middleware resolves the  request's URL and,  if  it
+    resolves  to a decorated view,  answers OPTIONS requests and returns
+    HTTP  405 for disallowed methods itself,  exactly as the view would,
+    but  without running the  rest  of the middleware  stack  (sessions,
+    authentication,  CSRF,  ...).  It  should  therefore  be  the  first
+    middleware::
+
+        MIDDLEWARE_CLASSES = (
+            'view_accessories.middleware.MethodGateMiddleware',
+            'django.contrib.sessions.middleware.SessionMiddleware',
+            ...
+        )
+
+    Resolving the URL here means resolving it twice,  so it is only done
+    when  some decorated view  does not allow  the request's method (and
+    for OPTIONS).  E.g.  GET requests are let through untouched unless a
+    view only allows other methods.
+    """
+    def process_request(self, request):
+        if (request.method != 'OPTIONS' and
+                request.method in methods_allowed_by_all()):
+            return None  # whatever the view, it allows the request
+
+        try:
+            match = resolve(request.path_info,
+                            getattr(request, 'urlconf', None))
+        except Resolver404:
+            return None
+
+        info = lookup(match.func)
+        if info is None:
+            return None
+
+        methods = info['methods']
+        if request.method == 'OPTIONS':
+            return options(request, methods)
+        if request.method not in methods:
+            return http.HttpResponseNotAllowed(methods)
+        return None
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Redirect',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('source', models.CharField(help_text='The path redirected, e.g. "/old/page/", or ending in "/*" all paths under it, e.g. "/old/*".', unique=True, max_length=255)),
+                ('target', models.CharField(help_text='The URL redirected to, ending in "*" for the rest of the path of a "/*" source, or empty for "410 Gone".', max_length=255, blank=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+"""Models of django-view-accessories.
+
+The  package needs no models itself:  *Redirect* is the default table of
+the *redirects.redirect_table_view* decorator.
+"""
+from __future__ import unicode_literals
+
+from django.db import models
+from django.utils.encoding import python_2_unicode_compatible
+
+
+@python_2_unicode_compatible
+class Redirect(models.Model):
+    source = models.CharField(
+        max_length=255, unique=True,
+        help_text='The path redirected, e.g. "/old/page/", or ending in '
+        '"/*" all paths under it, e.g. "/old/*".')
+    target = models.CharField(
+        max_length=255, blank=True,
+        help_text='The URL redirected to, ending in "*" for the rest of '
+        'the path of a "/*" source, or empty for "410 Gone".')
+
+    def __str__(self):
+        return '%s -> %s' % (self.source, self.target or '(gone)')
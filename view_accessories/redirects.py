@@ -0,0 +1,252 @@
+"""Redirect tables: many redirects served by one view.
+
+*generic.redirect_view*  needs a decorated function per redirect.  Sites
+with  thousands of legacy URLs instead keep them  in a table (by default
+*models.Redirect*, which needs "view_accessories" in INSTALLED_APPS) and
+serve  them all with one *redirect_table_view*,  e.g.  at the end of the
+URLconf::
+
+    @redirect_table_view
+    def legacy_redirects(request, target):
+        return target
+
+    urlpatterns += [url(r'^', legacy_redirects)]
+
+The  table is  loaded into memory,  exact sources into  a dictionary and
+wildcard sources (ending in "/*") into a trie of their path segments, so
+that  a redirect is  resolved without querying  the database.  Saving or
+deleting a redirect changes the table's version, kept in the cache, once
+the change is committed, and every process reloads its copy when it sees
+the version change.  Call *redirects_changed()* after changing the table
+in bulk (e.g. with *QuerySet.update()* or a data migration).
+
+The  cache must  be shared by  all processes (e.g.  Memcached or Redis):
+with  a cache of each process's  own,  such as  the default local-memory
+cache, the other processes never see the changes.
+"""
+from __future__ import unicode_literals
+
+import threading
+import time
+import uuid
+from functools import wraps
+
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+
+from .generic import redirect_view
+from .registry import register
+
+try:
+    from django.db.transaction import on_commit
+except ImportError:  # Django < 1.9
+    def on_commit(func, using=None):
+        func()
+
+__all__ = ('redirect_table_view', 'RedirectTable', 'redirects_changed')
+
+WILDCARD = '/*'
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+def redirect_table_view(func=None, model=None, source_field='source',
+                        target_field='target', permanent=True,
+                        query_string=False, cache_alias='default',
+                        check_interval=1, methods=None, max_concurrency=None,
+                        query_budget=None, statement_timeout=None, route=None):
+    """A redirect view for the redirects of a table.
+
+    The decorated view is called with the keyword argument "target", the
+    URL  the  request's path redirects to (see *RedirectTable.resolve*),
+    and  returns  the  URL  to  redirect to,  as  with  *redirect_view*.
+    Requests  for paths  not in the table get  a 404 without calling the
+    view.
+
+    *model*  is the table (*models.Redirect* by default)  and its fields
+    *source_field*  and *target_field* hold the paths redirected and the
+    URLs  they redirect  to  (e.g.  "old_path" and  "new_path"  for  the
+    Redirect  model  of *django.contrib.redirects*).  The version of the
+    table  is kept in the cache *cache_alias* and checked  at most every
+    *check_interval* seconds (see *RedirectTable*).
+
+    *permanent*  and *query_string* are as in *redirect_view*:  an empty
+    target  gives "410  Gone".  In  addition it accepts  the  *methods*,
+    *max_concurrency*,  *query_budget*,  *statement_timeout* and *route*
+    arguments as all view decorators.
+    """
+    def decorate(func):
+        table = RedirectTable(model, source_field, target_field, cache_alias,
+                              check_interval)
+
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            target = table.resolve(request.path)
+            if target is None:
+                raise Http404('No redirect for %s' % request.path)
+            kwargs['target'] = target
+            return func(request, *args, **kwargs)
+        myview = redirect_view(permanent=permanent, query_string=query_string,
+                               methods=methods,
+                               max_concurrency=max_concurrency,
+                               query_budget=query_budget,
+                               statement_timeout=statement_timeout,
+                               route=route)(wrapper)
+        return register(myview, decorator='redirect_table_view', wrapped=func,
+                        model=table.model, redirect_table=table)
+
+    if func:
+        return decorate(func)
+    return decorate
+
+
+def redirects_changed(model=None, cache_alias='default'):
+    """Make the *RedirectTable*s of *model* (in all processes) reload.
+
+    Call it once the changes to the table are committed.
+    """
+    caches[cache_alias].set(_version_key(_model(model)), uuid.uuid4().hex,
+                            None)
+
+
+class RedirectTable(object):
+    """The redirects of *model*, loaded into memory.
+
+    See *redirect_table_view* for the arguments.  The table is loaded on
+    first use and reloaded when its version, in the cache *cache_alias*,
+    changes.  That is checked at  most  every  *check_interval*  seconds
+    (always if 0) and straight away after a redirect is saved or deleted
+    in this process.
+    """
+    def __init__(self, model=None, source_field='source',
+                 target_field='target', cache_alias='default',
+                 check_interval=1):
+        self.model = _model(model)
+        self.source_field = source_field
+        self.target_field = target_field
+        self.cache_alias = cache_alias
+        self.check_interval = check_interval
+        self._rules = None
+        self._version = None
+        self._checked = float('-inf')
+        self._lock = threading.Lock()
+
+        post_save.connect(self._changed, sender=self.model)
+        post_delete.connect(self._changed, sender=self.model)
+
+    def resolve(self, path):
+        """Return the target of *path*, or None if it is not redirected.
+
+        An  exact  source  wins  over  wildcard sources,  and  a  longer
+        wildcard  source over a shorter one.  A target ending in "*" has
+        the  "*" replaced by the rest of the  path,  e.g.  a "/old/*" to
+        "/new/*" redirect takes "/old/a/b" to "/new/a/b".
+        """
+        exact, root = self._current()
+        target = exact.get(path)
+        if target is not None:
+            return target
+        return _match(root, path)
+
+    def load(self):
+        """Load the redirects from the database."""
+        # Before loading, so that changes made while loading are not missed
+        version = self._shared_version()
+        exact = {}
+        root = _Node()
+        rows = self.model._default_manager.values_list(self.source_field,
+                                                       self.target_field)
+        for source, target in rows.iterator():
+            if source.endswith(WILDCARD):
+                _insert(root, source[:-1], target)
+            else:
+                exact[source] = target
+        self._rules = (exact, root)
+        self._version = version
+
+    def __len__(self):
+        exact, root = self._current()
+        return len(exact) + root.count()
+
+    def _current(self):
+        if (self._rules is None or
+                _clock() - self._checked >= self.check_interval):
+            with self._lock:
+                if (self._rules is None or
+                        _clock() - self._checked >= self.check_interval):
+                    if (self._rules is None or
+                            self._version != self._shared_version()):
+                        self.load()
+                    self._checked = _clock()
+        return self._rules
+
+    def _shared_version(self):
+        cache = caches[self.cache_alias]
+        key = _version_key(self.model)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            version = cache.get(key)
+        return version
+
+    def _changed(self, sender, using=DEFAULT_DB_ALIAS, **kwargs):
+        # Not before the change is committed, or other processes could
+        # reload the old redirects under the new version
+        on_commit(self._bump_version, using=using)
+
+    def _bump_version(self):
+        redirects_changed(self.model, self.cache_alias)
+        self._checked = float('-inf')
+
+
+class _Node(object):
+    """A node of the trie of wildcard sources, by path segment."""
+    __slots__ = ('children', 'target')
+
+    def __init__(self):
+        self.children = {}
+        self.target = None
+
+    def count(self):
+        return (self.target is not None) + sum(
+            child.count() for child in self.children.values())
+
+
+def _insert(root, prefix, target):
+    node = root
+    for segment in prefix.split('/')[:-1]:
+        node = node.children.setdefault(segment, _Node())
+    node.target = target
+
+
+def _match(root, path):
+    """Return the target of the longest wildcard source matching *path*."""
+    segments = path.split('/')
+    node = root
+    best = None
+    for depth, segment in enumerate(segments[:-1]):
+        node = node.children.get(segment)
+        if node is None:
+            break
+        if node.target is not None:
+            best = node.target, depth + 1
+    if best is None:
+        return None
+    target, depth = best
+    if target.endswith('*'):
+        return target[:-1] + '/'.join(segments[depth:])
+    return target
+
+
+def _model(model):
+    if model is None:
+        from .models import Redirect
+        return Redirect
+    return model
+
+
+def _version_key(model):
+    return 'view_accessories.redirects.%s.%s.version' % (
+        model._meta.app_label, model._meta.model_name)
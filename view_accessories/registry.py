@@ -0,0 +1,100 @@
+"""Registry of decorated views.
+
+Every  view decorated with a django-view-accessories decorator registers
+itself here,  at decoration (i.e.  import) time,  with information about
+how  it was decorated.  This lets other parts of the package (and tools)
+find out about decorated views without calling them.
+"""
+from __future__ import unicode_literals
+
+import weakref
+
+__all__ = ('register', 'lookup', 'registered_views', 'decorator_chain',
+           'methods_allowed_by_all')
+
+_views = weakref.WeakKeyDictionary()
+_version = 0
+_allowed = (None, None)  # (version, methods) of methods_allowed_by_all()
+
+
+def register(view_func, **info):
+    """Register *view_func*, updating its registered *info* dictionary.
+
+    Returns *view_func*. Decorators register the name of the *decorator*
+    and  the function they *wrapped* (see *decorator_chain*),  what they
+    load  on their first request (see *warmup*):  their *template_name*,
+    *model*,  *queryset*, *form* or ModelForm *fields*,  and the queries
+    they run (see *explain*): the lookup *field* of detail views and the
+    *paginate*,   *page_size*,   *paginate_orphans*  and   *allow_empty*
+    arguments of list views.  The layers of a view that are not views of
+    their own (e.g. *generic.template_layer*) register as *inner*.
+    """
+    global _version
+    _views.setdefault(view_func, {}).update(info)
+    _version += 1
+    return view_func
+
+
+def lookup(view_func):
+    """Return the info registered for *view_func* or None.
+
+    Functions wrapped by  other (e.g. Django's) decorators are looked up
+    through their *__wrapped__* attribute when they have one.
+    """
+    while view_func is not None:
+        try:
+            info = _views.get(view_func)
+        except TypeError:  # not weakly referenceable
+            return None
+        if info is not None:
+            return info
+        view_func = getattr(view_func, '__wrapped__', None)
+    return None
+
+
+def registered_views(inner=False):
+    """Return a list of (view function, info) pairs of registered views.
+
+    The inner layers of views are left out, unless *inner* is true.
+    """
+    return [(view_func, info) for view_func, info in list(_views.items())
+            if inner or not info.get('inner')]
+
+
+def methods_allowed_by_all():
+    """Return the frozenset of the HTTP methods all views allow.
+
+    These  are  the methods  allowed  by every  registered view  with  a
+    *methods* list (all of them if there are none).  The set is computed
+    again only after another view has been registered.
+    """
+    global _allowed
+    version, methods = _allowed
+    if version != _version:
+        version = _version
+        methods = None
+        for info in list(_views.values()):
+            if 'methods' in info:
+                if methods is None:
+                    methods = frozenset(info['methods'])
+                else:
+                    methods = methods.intersection(info['methods'])
+        if methods is None:
+            from .generic import HTTP_METHODS
+            methods = frozenset(HTTP_METHODS)
+        _allowed = (version, methods)
+    return methods
+
+
+def decorator_chain(view_func):
+    """Return the names of the decorators of *view_func*, outermost first.
+
+    E.g.  a *template_view*  stacked  on  top of a  *detail_view*  gives
+    ['template_view', 'detail_view'].
+    """
+    chain = []
+    info = lookup(view_func)
+    while info is not None and 'decorator' in info:
+        chain.append(info['decorator'])
+        info = lookup(info.get('wrapped'))
+    return chain
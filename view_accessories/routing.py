@@ -0,0 +1,313 @@
+"""A URL router for decorated views.
+
+Django's URL resolver tries the URL patterns one after another,  so with
+thousands of them resolving a path takes a while. Instead views can give
+their path to their decorator::
+
+    @template_detail_view(Widget, route='widget/<int:id>/')
+    def widget_detail(request, widget):
+        pass
+
+and  the URLconf include  them all with *routes()*,  which compiles them
+into a trie of path segments::
+
+    from view_accessories.routing import routes
+
+    urlpatterns = [
+        url(r'^admin/', include(admin.site.urls)),
+    ] + routes('myapp.views')
+
+A path is then resolved in a dictionary lookup per segment, however many
+routes  there are.  Routes  are written as  Django's *path()* routes:  a
+"<converter:name>"  part matches  (part  of)  a segment and  passes  the
+converted  value to the view as the keyword argument *name*.  The "int",
+"str"  (the default),  "slug",  "uuid" and "path" (the rest of the path,
+slashes and all)  converters are built in;  see *register_converter* for
+others.  A static  segment wins over a converter,  in any  order,  and a
+converter  over "path".  Routes can be  reversed by the  dotted name  of
+their view, e.g. reverse('myapp.views.widget_detail', kwargs={'id': 1}).
+"""
+from __future__ import unicode_literals
+
+import re
+import uuid
+from importlib import import_module
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.encoding import force_text
+from django.utils.functional import cached_property
+
+from .registry import registered_views
+
+try:
+    from django.urls import ResolverMatch, Resolver404, URLResolver
+    from django.urls import re_path as _url
+    from django.urls.resolvers import RegexPattern
+except ImportError:  # Django < 2.0
+    from django.conf.urls import url as _url
+    from django.core.urlresolvers import (RegexURLResolver as URLResolver,
+                                          ResolverMatch, Resolver404)
+    RegexPattern = None
+
+__all__ = ('routes', 'register_converter', 'Router', 'TrieResolver')
+
+_parameter = re.compile(r'<(?:(?P<converter>[^>:]+):)?(?P<parameter>\w+)>')
+
+
+class IntConverter(object):
+    regex = '[0-9]+'
+
+    def to_python(self, value):
+        return int(value)
+
+
+class StringConverter(object):
+    regex = '[^/]+'
+
+    def to_python(self, value):
+        return value
+
+
+class SlugConverter(StringConverter):
+    regex = '[-a-zA-Z0-9_]+'
+
+
+class UUIDConverter(object):
+    regex = '[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+
+    def to_python(self, value):
+        return uuid.UUID(value)
+
+
+class PathConverter(StringConverter):
+    regex = '.+'
+
+
+_converters = {
+    'int': IntConverter(),
+    'str': StringConverter(),
+    'slug': SlugConverter(),
+    'uuid': UUIDConverter(),
+    'path': PathConverter(),
+}
+
+
+def register_converter(converter, type_name):
+    """Register the *converter* class for "<type_name:...>" in routes.
+
+    As  with Django's *register_converter*,  the converter has a *regex*
+    attribute  matching the values  and  a  *to_python()*  method  which
+    converts them, or raises ValueError if a value does not match.
+    """
+    _converters[type_name] = converter()
+
+
+def routes(*modules):
+    """Return the URL patterns of the views with a route.
+
+    These  are the views of the modules *modules* (all imported views if
+    none are given), which are imported first.  A view further decorated
+    in its module (e.g.  by *login_required*) is routed to as decorated.
+    The list can be used as (or added to) a URLconf's *urlpatterns*.
+    """
+    for module in modules:
+        import_module(module)
+    router = Router()
+    for view_func, info in sorted(registered_views(), key=_route_key):
+        if not info.get('route'):
+            continue
+        module = view_func.__module__
+        if modules and module not in modules:
+            continue
+        # The view as the module has it, with any decorators after ours
+        view = getattr(import_module(module), view_func.__name__, view_func)
+        router.add(info['route'], view,
+                   '%s.%s' % (module, view_func.__name__))
+    return router.urls
+
+
+class Router(object):
+    """A trie of routes, by path segment."""
+    def __init__(self):
+        self._root = _Node()
+        self._routes = []
+
+    def add(self, route, view, name=None):
+        """Route paths matching *route* to *view*, named *name*."""
+        node = self._root
+        segments = route.split('/')
+        for number, segment in enumerate(segments):
+            if '<' not in segment:
+                node = node.static.setdefault(segment, _Node())
+                continue
+            if _is_path(segment):
+                tail = '/'.join(segments[number:])
+                regex, converters = _compile(tail)
+                node.tails.append((regex, converters, _Node()))
+                node = node.tails[-1][2]
+                break
+            for dynamic in node.dynamic:
+                if dynamic[0] == segment:
+                    node = dynamic[3]
+                    break
+            else:
+                regex, converters = _compile(segment)
+                node.dynamic.append((segment, regex, converters, _Node()))
+                node = node.dynamic[-1][3]
+        if node.endpoint is not None:
+            raise ImproperlyConfigured('Both %s and %s have the route %r' % (
+                node.endpoint[1], name, route))
+        node.endpoint = (view, name)
+        self._routes.append((route, view, name))
+
+    def match(self, path):
+        """Return the (view, keyword arguments, name) of *path* or None.
+
+        *path*  is relative  to  where the  routes  are included in  the
+        URLconf, e.g. "widget/1/" (without a leading slash) at the root.
+        """
+        found = _match(self._root, path.split('/'), 0, {})
+        if found is None:
+            return None
+        (view, name), kwargs = found
+        return view, kwargs, name
+
+    @cached_property
+    def urls(self):
+        """The URL patterns of the routes, a list of one *TrieResolver*."""
+        return [TrieResolver(self)]
+
+    def url_patterns(self):
+        """Return a Django URL pattern for each route, to reverse them."""
+        return [_url(_regex(route), view, name=name)
+                for route, view, name in self._routes]
+
+
+class TrieResolver(URLResolver):
+    """A URL resolver resolving paths with a *Router*.
+
+    It  reverses URLs as  Django's,  with a  regular expression for each
+    route, built when first needed.
+    """
+    def __init__(self, router):
+        if RegexPattern is None:
+            URLResolver.__init__(self, r'^', [])
+        else:
+            URLResolver.__init__(self, RegexPattern(r'^'), [])
+        self.router = router
+
+    @cached_property
+    def url_patterns(self):
+        return self.router.url_patterns()
+
+    def resolve(self, path):
+        path = force_text(path)  # may be a reverse_lazy object
+        found = self.router.match(path)
+        if found is None:
+            raise Resolver404({'tried': [], 'path': path})
+        view, kwargs, name = found
+        return _resolver_match(view, kwargs, name)
+
+
+class _Node(object):
+    __slots__ = ('static', 'dynamic', 'tails', 'endpoint')
+
+    def __init__(self):
+        self.static = {}
+        self.dynamic = []  # (segment, regex, converters, node)
+        self.tails = []  # (regex, converters, node) for "path" converters
+        self.endpoint = None  # (view, name)
+
+
+def _match(node, segments, number, kwargs):
+    """Return the (endpoint, kwargs) of the path *segments* or None."""
+    if number == len(segments):
+        if node.endpoint is None:
+            return None
+        return node.endpoint, kwargs
+
+    child = node.static.get(segments[number])
+    if child is not None:
+        found = _match(child, segments, number + 1, kwargs)
+        if found is not None:
+            return found
+
+    for _, regex, converters, child in node.dynamic:
+        values = _convert(regex, converters, segments[number])
+        if values is not None:
+            values.update(kwargs)
+            found = _match(child, segments, number + 1, values)
+            if found is not None:
+                return found
+
+    if node.tails:
+        tail = '/'.join(segments[number:])
+        for regex, converters, child in node.tails:
+            values = _convert(regex, converters, tail)
+            if values is not None and child.endpoint is not None:
+                values.update(kwargs)
+                return child.endpoint, values
+    return None
+
+
+def _convert(regex, converters, text):
+    match = regex.match(text)
+    if match is None:
+        return None
+    values = match.groupdict()
+    try:
+        for name, converter in converters:
+            values[name] = converter.to_python(values[name])
+    except ValueError:
+        return None
+    return values
+
+
+def _compile(part):
+    """Return the regex matching the route *part* and its converters."""
+    pattern, converters = _pattern(part)
+    return re.compile(r'\A%s\Z' % pattern), converters
+
+
+def _regex(route):
+    """Return the Django URL pattern regex of *route*."""
+    return '^%s$' % _pattern(route)[0]
+
+
+def _pattern(part):
+    pieces = []
+    converters = []
+    position = 0
+    for match in _parameter.finditer(part):
+        pieces.append(re.escape(part[position:match.start()]))
+        name = match.group('parameter')
+        type_name = match.group('converter') or 'str'
+        try:
+            converter = _converters[type_name]
+        except KeyError:
+            raise ImproperlyConfigured(
+                'Unknown converter %r in the route %r' % (type_name, part))
+        pieces.append('(?P<%s>%s)' % (name, converter.regex))
+        converters.append((name, converter))
+        position = match.end()
+    pieces.append(re.escape(part[position:]))
+    return ''.join(pieces), converters
+
+
+def _is_path(segment):
+    return any(match.group('converter') == 'path'
+               for match in _parameter.finditer(segment))
+
+
+def _route_key(item):
+    view_func, info = item
+    return info.get('route') or '', view_func.__module__, view_func.__name__
+
+
+if django.VERSION >= (2, 2):
+    def _resolver_match(view, kwargs, name):
+        return ResolverMatch(view, (), kwargs, name, route='')
+else:
+    def _resolver_match(view, kwargs, name):
+        return ResolverMatch(view, (), kwargs, name)
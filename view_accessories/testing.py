@@ -0,0 +1,154 @@
+"""Test helpers for the queries views run.
+
+*assert_max_queries*  fails a test if a block of code  runs more queries
+than expected,  and *QuerySnapshot* fails it if the queries' shapes (see
+*query_shape*)  change from those recorded before,  so that  regressions
+such as an extra COUNT or EXISTS query are caught::
+
+    from view_accessories.testing import QuerySnapshot, assert_max_queries
+
+    snapshot = QuerySnapshot('tests/snapshots/queries.json')
+
+    class BookViews(TestCase):
+        def test_book_list(self):
+            with assert_max_queries(2) as queries:
+                self.client.get('/books/')
+            snapshot.assert_matches('book_list', queries)
+
+A  snapshot missing  from the  file fails the test too,  so that no test
+passes  without checking anything.  To  record the snapshots (the  first
+time,  or again  after a  deliberate  change)  run  the  tests with  the
+VIEW_ACCESSORIES_UPDATE_SNAPSHOTS environment variable set.
+"""
+from __future__ import unicode_literals
+
+import difflib
+import io
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+from .db import execute_wrapper
+
+__all__ = ('capture_queries', 'query_shape', 'assert_max_queries',
+           'QuerySnapshot')
+
+UPDATE_VARIABLE = 'VIEW_ACCESSORIES_UPDATE_SNAPSHOTS'
+
+_placeholders = re.compile(r'\((?:%s, )+%s\)')
+_whitespace = re.compile(r'\s+')
+
+
+@contextmanager
+def capture_queries():
+    """Capture the queries run on this thread within the block.
+
+    Yields  a list which,  after the block,  holds a dictionary for each
+    query  run (on any database)  with its "alias",  "sql" and "params".
+    Unlike Django's *connection.queries* this works with DEBUG off.
+    """
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        queries.append({
+            'alias': context['connection'].alias,
+            'sql': sql,
+            'params': params,
+        })
+        return execute(sql, params, many, context)
+
+    with execute_wrapper(record):
+        yield queries
+
+
+def query_shape(sql):
+    """Return the shape of the query *sql*.
+
+    That  is the SQL with its  whitespace normalised and  lists of query
+    parameters, e.g. "IN (%s, %s, %s)", collapsed to "(...)", so that it
+    does not depend on the parameters.
+    """
+    return _placeholders.sub('(...)', _whitespace.sub(' ', sql).strip())
+
+
+@contextmanager
+def assert_max_queries(count):
+    """Assert that the block runs at most *count* queries.
+
+    Yields the list of queries, as *capture_queries*.  An AssertionError
+    listing them is raised if there were too many.
+    """
+    with capture_queries() as queries:
+        yield queries
+    if len(queries) > count:
+        raise AssertionError('%d queries run, at most %d expected:\n%s' % (
+            len(queries), count, _format(queries)))
+
+
+class QuerySnapshot(object):
+    """The query shapes of named blocks of code, recorded in a JSON file.
+
+    *path* is the file, which is created if need be. If *update* is true
+    (by  default,  if the  VIEW_ACCESSORIES_UPDATE_SNAPSHOTS environment
+    variable is set)  then the snapshots are recorded (again) instead of
+    compared. Otherwise a missing snapshot is a failure.
+    """
+    def __init__(self, path, update=None):
+        self.path = path
+        if update is None:
+            update = bool(os.environ.get(UPDATE_VARIABLE))
+        self.update = update
+        self._lock = threading.Lock()
+
+    def assert_matches(self, name, queries):
+        """Assert that the shapes of *queries* match the snapshot *name*.
+
+        *queries*  is a list of queries as yielded by *capture_queries*,
+        each  recorded as "alias:  shape".  An AssertionError showing  a
+        diff is raised if they do not match, or listing them if there is
+        no such snapshot.
+        """
+        shapes = ['%s: %s' % (query['alias'], query_shape(query['sql']))
+                  for query in queries]
+        with self._lock:
+            snapshots = self._load()
+            if self.update:
+                snapshots[name] = shapes
+                self._save(snapshots)
+                return
+        expected = snapshots.get(name)
+        if expected is None:
+            raise AssertionError(
+                'There is no snapshot of the queries of %s in %s (set %s to '
+                'record it):\n%s' % (name, self.path, UPDATE_VARIABLE,
+                                     '\n'.join(shapes)))
+        if shapes != expected:
+            diff = difflib.unified_diff(expected, shapes, 'recorded', 'run',
+                                        lineterm='')
+            raise AssertionError(
+                'The queries of %s do not match the snapshot in %s (set %s '
+                'to record them again):\n%s' % (name, self.path,
+                                                UPDATE_VARIABLE,
+                                                '\n'.join(diff)))
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with io.open(self.path, encoding='utf-8') as snapshot_file:
+            return json.load(snapshot_file)
+
+    def _save(self, snapshots):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        content = json.dumps(snapshots, indent=2, sort_keys=True,
+                             separators=(',', ': '), ensure_ascii=False)
+        with io.open(self.path, 'w', encoding='utf-8') as snapshot_file:
+            snapshot_file.write(content + '\n')
+
+
+def _format(queries):
+    return '\n'.join('%d. %s: %s' % (number, query['alias'], query['sql'])
+                     for number, query in enumerate(queries, 1))
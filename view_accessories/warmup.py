@@ -0,0 +1,118 @@
+"""Warm up the decorated views before serving requests.
+
+A  fresh worker  process does  a lot  of work on its first requests:  it
+imports the views and compiles the URL patterns,  loads and compiles the
+templates,  builds the ModelForm classes of the edit views and loads the
+translations of model names. *warmup()* does all that up front for every
+decorated view.  Call it where the WSGI application is created, e.g.  in
+wsgi.py::
+
+    application = get_wsgi_application()
+
+    from view_accessories.warmup import warmup
+    warmup(freeze=True)
+
+With  a server  that  loads the application  before forking its  workers
+(e.g.  gunicorn --preload) the workers then share the warmed-up objects,
+copy-on-write,  and serve their  first requests as  fast as later  ones.
+Templates  are only kept compiled if the cached template  loader is used
+(the default for Django 1.11+ with DEBUG off).
+
+The  "warmup" management command runs it and reports what it did and any
+problems, such as missing templates.
+"""
+from __future__ import unicode_literals
+
+import gc
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.utils import translation
+from django.utils.encoding import force_text
+
+from .edit import model_form_class
+from .registry import registered_views
+
+try:
+    from django.urls import get_resolver
+except ImportError:  # Django < 1.10
+    from django.core.urlresolvers import get_resolver
+
+__all__ = ('warmup',)
+
+logger = logging.getLogger(__name__)
+
+
+def warmup(freeze=False):
+    """Load what the decorated views would load on their first requests.
+
+    Returns a dictionary of the number of "views", "templates",  "forms"
+    (ModelForm  classes)  and "models" warmed  up and of the  "problems"
+    found, a list of messages which are also logged as warnings.
+
+    If *freeze* is true then, on Python 3.7+,  the objects loaded so far
+    are  moved out of  the garbage collector's way (see *gc.freeze*)  so
+    that  collections in the workers do  not copy the  memory pages they
+    share.
+    """
+    # Compile the URL patterns, importing (and so registering) the views
+    get_resolver(None).reverse_dict
+
+    templates = set()
+    models = set()
+    forms = set()
+    views = registered_views()
+    # The inner layers of views (e.g. their templates) load things too
+    for view_func, info in registered_views(inner=True):
+        if info.get('template_name'):
+            templates.add(info['template_name'])
+        model = info.get('model')
+        if model is None and info.get('queryset') is not None:
+            model = info['queryset'].model
+        if model is None:
+            continue
+        models.add(model)
+        if 'fields' in info:
+            fields = info['fields']
+            if isinstance(fields, list):
+                fields = tuple(fields)
+            forms.add((model, fields))
+
+    problems = []
+    for template_name in sorted(templates):
+        try:
+            get_template(template_name)
+        except (TemplateDoesNotExist, TemplateSyntaxError) as error:
+            problems.append('Template %s: %r' % (template_name, error))
+    for model in models:
+        _warm_model(model)
+    for model, fields in forms:
+        try:
+            model_form_class(model, fields)
+        except ImproperlyConfigured as error:
+            problems.append('Form for %s.%s: %s' % (
+                model._meta.app_label, model._meta.object_name, error))
+
+    for problem in problems:
+        logger.warning('Could not warm up: %s', problem)
+    if freeze and hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+    return {
+        'views': len(views),
+        'templates': len(templates),
+        'forms': len(forms),
+        'models': len(models),
+        'problems': problems,
+    }
+
+
+def _warm_model(model):
+    meta = model._meta
+    meta.get_fields()
+    with translation.override(settings.LANGUAGE_CODE):
+        force_text(meta.verbose_name)
+        force_text(meta.verbose_name_plural)